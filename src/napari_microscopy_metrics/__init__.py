@@ -4,12 +4,32 @@ except ImportError:
     __version__ = "unknown"
 
 
-from ._reader import napari_get_reader
-from ._sample_data import make_sample_data
-from ._widget import (
-    Microscopy_Metrics_QWidget,
-)
-from ._writer import write_multiple, write_single_image
+# the attributes are imported when first used, napari imports the package
+# to discover the plugin and to sniff files, which must not load the readers'
+# dependencies nor the analysis libraries
+_LAZY_ATTRIBUTES = {
+    "napari_get_reader": "._reader",
+    "make_sample_data": "._sample_data",
+    "write_multiple": "._writer",
+    "write_single_image": "._writer",
+    # the widget imports Qt and napari, it is only imported when napari asks
+    # for it so that the batch can run on machines without a display
+    "Microscopy_Metrics_QWidget": "._widget",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
 
 
 __all__ = (
@@ -66,14 +66,21 @@ class AcquisitionToolPage(QWidget):
     def onLayerChanged(self):
         """A method called when changing active layer.
         It updates scale informations in detection widget if the new active layer is an image and updates label with the shape of the new active image.
+        When the image was opened with pixel sizes in its metadata, they are used as scale parameters.
         """
+        # the lazy array helpers import the analysis library, which opening the plugin does not need
+        from napari_microscopy_metrics._lazy import layerData
+
         currentLayer = self.viewer.layers.selection.active
         if currentLayer is None or not isinstance(
             currentLayer, napari.layers.Image
         ):
             return
-        image = currentLayer.data
+        image = layerData(currentLayer)
         shape = image.shape
         self.labelShape.setText(
             f"Selected image shape : {shape[2]} x {shape[1]} x {shape[0]} px"
         )
+        pixelSize = currentLayer.metadata.get("pixel_size")
+        if pixelSize is not None and any(size is not None for size in pixelSize):
+            self.pixelSizeWidget.setPixelSize(pixelSize)
@@ -0,0 +1,1050 @@
+import os
+import json
+import shutil
+import time
+import queue
+import fnmatch
+import multiprocessing
+import numpy as np
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from microscopy_metrics.fitting import Fitting
+from microscopy_metrics.metrics import Metrics
+from microscopy_metrics.report_generator import ReportGenerator
+from microscopy_metrics.thresholdTools.threshold_tool import Threshold
+from microscopy_metrics.detectionTools.detection_tool import DetectionTool
+from microscopy_metrics.resolutionTools.theoretical_resolution import TheoreticalResolution
+
+from napari_microscopy_metrics._config import CONFIG_FILE_NAME, AnalysisConfig
+from napari_microscopy_metrics._lazy import ChunkedDetection, isLazyArray
+from napari_microscopy_metrics._memory import PROCESS_MEMORY, MemoryScheduler, estimateWorkingSet, getMemoryBudget
+from napari_microscopy_metrics._prefetch import PREFETCH_DEPTH, ImagePrefetcher
+from napari_microscopy_metrics._reader import (
+    OME_ZARR_EXTENSION,
+    TIFF_EXTENSIONS,
+    get_multiscales,
+    ome_zarr_reader_function,
+    open_tiff,
+)
+from napari_microscopy_metrics._timing import StageTimer
+
+# registers the "Parquet" and "SQLite index" reports in ReportGenerator
+from napari_microscopy_metrics._report_parquet import ReportParquet  # noqa: F401
+from napari_microscopy_metrics._results_index import ReportIndex  # noqa: F401
+
+
+IMAGE_EXTENSIONS = (".npy",) + TIFF_EXTENSIONS + (OME_ZARR_EXTENSION,)
+# statuses of the images which do not need to be analysed again with the same parameters
+FINISHED_STATUSES = ("done", "no beads")
+# seconds between two readings of the progress events sent by the workers
+EVENT_INTERVAL = 0.2
+# suffix of the result folders, which are not scanned for images
+RESULT_SUFFIX = "_analysis"
+# threads reading the headers of the images found by a scan, the reads wait on the disk rather than on the CPU
+SNIFF_THREADS = 16
+# keys of the batch parameters, as given by the getAnalysisConfig method of the main widget
+PARAMETER_KEYS = AnalysisConfig.getKeys()
+
+# parameters of the analysis sent to each worker process by the pool initializer
+_workerParameters = None
+_workerOutputRoot = None
+_workerThreads = 1
+_workerEvents = None
+_workerCancellation = None
+
+
+def listImages(folder):
+    """Lists the images of a folder which can be analysed in batch.
+
+    Args:
+        folder (str): Path of the folder.
+
+    Returns:
+        list: Sorted paths of the numpy, TIFF and OME-Zarr images of the folder.
+    """
+    return sorted(
+        os.path.join(folder, name)
+        for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def matchesPatterns(relativePath, include=None, exclude=None):
+    """Checks a path against include and exclude glob patterns, each pattern being matched against the path and against the name.
+
+    Args:
+        relativePath (str): The path relative to the scanned folder, with "/" separators.
+        include (list, optional): Patterns of which one must match. Defaults to None, matching every path.
+        exclude (list, optional): Patterns of which none must match. Defaults to None.
+
+    Returns:
+        bool: True if the path is included and not excluded.
+    """
+    name = relativePath.rsplit("/", 1)[-1]
+
+    def matches(patterns):
+        return any(fnmatch.fnmatch(relativePath, pattern) or fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+    return (not include or matches(include)) and not (exclude and matches(exclude))
+
+
+def scanImages(folder, include=None, exclude=None, recursive=True):
+    """Lists the images of a folder and of its subfolders, reading each folder once with os.scandir without querying the files.
+    Hidden entries and the result folders of the analyses are skipped, OME-Zarr folders are images rather than subfolders.
+
+    Args:
+        folder (str): Path of the folder.
+        include (list, optional): Glob patterns of the images to keep, e.g. ["*.tif"] or ["plate1/*"]. Defaults to None, keeping all of them.
+        exclude (list, optional): Glob patterns of the images and subfolders to skip. Defaults to None.
+        recursive (bool, optional): Whether to scan the subfolders. Defaults to True.
+
+    Returns:
+        list: Sorted paths of the numpy, TIFF and OME-Zarr images found.
+    """
+    images = []
+    folders = [folder]
+    while folders:
+        current = folders.pop()
+        try:
+            with os.scandir(current) as iterator:
+                entries = list(iterator)
+        except OSError:
+            if current == folder:
+                raise
+            # unreadable subfolder
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            relativePath = os.path.relpath(entry.path, folder).replace(os.sep, "/")
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                if matchesPatterns(relativePath, include, exclude):
+                    images.append(entry.path)
+            elif (
+                recursive
+                and entry.is_dir(follow_symlinks=False)
+                and not entry.name.endswith(RESULT_SUFFIX)
+                and matchesPatterns(relativePath, exclude=exclude)
+            ):
+                folders.append(entry.path)
+    return sorted(images)
+
+
+def readImageHeader(path):
+    """Reads the shape and type of an image from its header, without reading its voxels.
+
+    Args:
+        path (str): Path of a numpy, TIFF or OME-Zarr image.
+
+    Returns:
+        tuple: The shape, without its singleton axes, and the np.dtype of the image.
+    """
+    if path.lower().endswith(TIFF_EXTENSIONS):
+        import tifffile
+
+        with tifffile.TiffFile(path) as tif:
+            series = tif.series[0]
+            shape, dtype = series.shape, series.dtype
+    elif path.rstrip("/\\").lower().endswith(OME_ZARR_EXTENSION):
+        image = loadImage(path)
+        shape, dtype = image.shape, image.dtype
+    else:
+        with open(path, "rb") as file:
+            version = np.lib.format.read_magic(file)
+            if version == (1, 0):
+                shape, _, dtype = np.lib.format.read_array_header_1_0(file)
+            else:
+                shape, _, dtype = np.lib.format.read_array_header_2_0(file)
+    return tuple(size for size in shape if size != 1), np.dtype(dtype)
+
+
+def checkImageHeader(path):
+    """Checks from its header that an image can be analysed.
+
+    Args:
+        path (str): Path of the image.
+
+    Returns:
+        str: The reason why the image is rejected, None if it is a 3D image of numbers.
+    """
+    try:
+        shape, dtype = readImageHeader(path)
+    except (OSError, ValueError, KeyError) as error:
+        return f"Unreadable: {type(error).__name__}: {error}"
+    if len(shape) != 3:
+        return f"Not a 3D image, shape {shape}"
+    if not (np.issubdtype(dtype, np.integer) or np.issubdtype(dtype, np.floating)):
+        return f"Unsupported voxel type {dtype}"
+    return None
+
+
+def sniffImages(paths, threads=SNIFF_THREADS):
+    """Reads the headers of images in parallel threads to reject those which cannot be analysed before the batch starts.
+
+    Args:
+        paths (list): Paths of the images.
+        threads (int, optional): Number of headers read at the same time. Defaults to SNIFF_THREADS.
+
+    Returns:
+        tuple: The paths of the accepted images, in the given order, and the reason of each rejected image, by path.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+        reasons = list(executor.map(checkImageHeader, paths))
+    accepted = [path for path, reason in zip(paths, reasons) if reason is None]
+    rejected = {path: reason for path, reason in zip(paths, reasons) if reason is not None}
+    return accepted, rejected
+
+
+def findImages(folder, include=None, exclude=None, recursive=True, threads=SNIFF_THREADS):
+    """Plans a batch: scans a folder for images, see scanImages, and rejects the images which cannot be analysed from their headers, see sniffImages.
+
+    Args:
+        folder (str): Path of the folder.
+        include (list, optional): Glob patterns of the images to keep. Defaults to None, keeping all of them.
+        exclude (list, optional): Glob patterns of the images and subfolders to skip. Defaults to None.
+        recursive (bool, optional): Whether to scan the subfolders. Defaults to True.
+        threads (int, optional): Number of headers read at the same time. Defaults to SNIFF_THREADS.
+
+    Returns:
+        tuple: The sorted paths of the images to analyse, and the reason of each rejected image, by path.
+    """
+    return sniffImages(scanImages(folder, include, exclude, recursive), threads)
+
+
+def loadImage(path):
+    """Opens an image without loading it in memory.
+
+    Args:
+        path (str): Path of a numpy, TIFF or OME-Zarr image.
+
+    Returns:
+        array-like: The full resolution (Z)YX image, memory-mapped or lazy.
+    """
+    if path.lower().endswith(TIFF_EXTENSIONS):
+        return open_tiff(path)[0]
+    if path.rstrip("/\\").lower().endswith(OME_ZARR_EXTENSION):
+        if get_multiscales(path) is None:
+            raise ValueError(f"Not an OME-Zarr image: {path}")
+        data = ome_zarr_reader_function(path)[0][0]
+        return data[0] if isinstance(data, list) else data
+    return np.squeeze(np.load(path, mmap_mode="r"))
+
+
+def canLoadImage(path):
+    """Tells whether loadImage can open a path: a numpy or TIFF file, or an OME-Zarr folder.
+
+    Args:
+        path (str): Path of the image.
+
+    Returns:
+        bool: True if the path can be given to loadImage.
+    """
+    name = path.rstrip("/\\").lower()
+    if os.path.isdir(path):
+        return name.endswith(OME_ZARR_EXTENSION)
+    return os.path.isfile(path) and name.endswith(IMAGE_EXTENSIONS) and not name.endswith(OME_ZARR_EXTENSION)
+
+
+def estimateMemory(path, parameters):
+    """Estimates the peak memory used to analyse an image, from its shape and type read without loading it.
+
+    Args:
+        path (str): Path of the image.
+        parameters (dict): The batch parameters.
+
+    Returns:
+        int: The estimated memory in bytes, see estimateWorkingSet.
+    """
+    try:
+        image = loadImage(path)
+    except (OSError, ValueError, KeyError):
+        # unreadable images fail at once in the analysis, without using memory
+        return PROCESS_MEMORY
+    return estimateWorkingSet(image.shape, image.dtype, isLazyArray(image), parameters)
+
+
+def getOutputDir(path, outputRoot=None):
+    """Gives the folder where the results of an image are saved, named as in the interactive analysis.
+
+    Args:
+        path (str): Path of the image.
+        outputRoot (str, optional): Folder in which the result folders are created. Defaults to the folder of the image.
+
+    Returns:
+        str: Path of the result folder of the image.
+    """
+    name = os.path.basename(os.path.normpath(path))
+    for extension in IMAGE_EXTENSIONS:
+        if name.lower().endswith(extension):
+            name = name[: -len(extension)]
+            break
+    if outputRoot is None:
+        outputRoot = os.path.dirname(os.path.abspath(path))
+    return os.path.join(outputRoot, f"{name}{RESULT_SUFFIX}")
+
+
+def saveParameters(path, parameters):
+    """Saves the batch parameters in a JSON file, which can be given to the command line batch.
+
+    Args:
+        path (str): Path of the parameter file.
+        parameters (dict): The batch parameters, or their AnalysisConfig.
+    """
+    if isinstance(parameters, AnalysisConfig):
+        parameters = parameters.toParameters()
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(parameters, file, indent=4, default=str)
+
+
+def loadParameters(path):
+    """Reads the batch parameters saved by saveParameters.
+
+    Args:
+        path (str): Path of the parameter file.
+
+    Raises:
+        ValueError: If parameters are missing from the file.
+
+    Returns:
+        dict: The batch parameters.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        parameters = json.load(file)
+    missing = [key for key in AnalysisConfig.getRequiredKeys() if key not in parameters]
+    if missing:
+        raise ValueError(f"Missing batch parameters in {path}: {', '.join(missing)}")
+    return parameters
+
+
+def hashParameters(parameters):
+    """Gives a hash identifying the parameters of an analysis.
+
+    Args:
+        parameters (dict): The batch parameters, or their AnalysisConfig.
+
+    Returns:
+        str: The SHA-256 of the parameters, independent of the order of their keys, see AnalysisConfig.hash.
+    """
+    return AnalysisConfig.fromParameters(parameters).hash
+
+
+def getImageSignature(path):
+    """Gives the size and modification time of an image, to detect the images modified since their analysis.
+    The size of an OME-Zarr image is the total size of its files, its modification time the latest one.
+
+    Args:
+        path (str): Path of the image.
+
+    Returns:
+        tuple: The size in bytes and the modification time in nanoseconds.
+    """
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    size, mtime = 0, os.stat(path).st_mtime_ns
+    for folder, _, names in os.walk(path):
+        for name in names:
+            stat = os.stat(os.path.join(folder, name))
+            size += stat.st_size
+            mtime = max(mtime, stat.st_mtime_ns)
+    return size, mtime
+
+
+class BatchManifest(object):
+    """Manifest of a batch, recording for each image its size, modification time, the hash of the parameters and the status of its analysis.
+    Each result is appended as one JSON line as soon as it is known, so that the manifest stays valid if the batch is interrupted; the last line of an image wins.
+
+    Attributes:
+        _path (str): Path of the manifest file.
+        _entries (dict): The last entry of each image, by absolute path.
+        _truncated (bool): Whether the last line of the file was truncated.
+    """
+
+    fileName = "batch_manifest.jsonl"
+
+    def __init__(self, path):
+        self._path = path
+        self._entries = {}
+        self.load()
+
+    def load(self):
+        """Reads the entries of the manifest file, ignoring a line truncated by an interruption."""
+        self._entries = {}
+        self._truncated = False
+        if not os.path.isfile(self._path):
+            return
+        with open(self._path, "r", encoding="utf-8") as file:
+            for line in file:
+                self._truncated = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._entries[entry["path"]] = entry
+
+    def getEntry(self, path):
+        """Gives the last entry of an image.
+
+        Args:
+            path (str): Path of the image.
+
+        Returns:
+            dict: The entry, None if the image was never analysed.
+        """
+        return self._entries.get(os.path.abspath(path))
+
+    def isRecorded(self, path, parameterHash, statuses=FINISHED_STATUSES):
+        """Checks whether an image was analysed with the same parameters, ending with one of the given statuses, and was not modified since.
+
+        Args:
+            path (str): Path of the image.
+            parameterHash (str): Hash of the parameters of the batch.
+            statuses (tuple, optional): The accepted statuses. Defaults to FINISHED_STATUSES.
+
+        Returns:
+            bool: True if the last analysis of the image matches.
+        """
+        entry = self.getEntry(path)
+        if entry is None or entry["status"] not in statuses or entry["parameterHash"] != parameterHash:
+            return False
+        if entry["status"] in FINISHED_STATUSES and not os.path.isdir(entry["outputDir"]):
+            return False
+        try:
+            return [entry["size"], entry["mtime"]] == list(getImageSignature(path))
+        except OSError:
+            return False
+
+    def isFinished(self, path, parameterHash):
+        """Checks whether an image was analysed with the same parameters and was not modified since.
+
+        Args:
+            path (str): Path of the image.
+            parameterHash (str): Hash of the parameters of the batch.
+
+        Returns:
+            bool: True if the analysis of the image can be skipped.
+        """
+        return self.isRecorded(path, parameterHash)
+
+    def getPendingImages(self, paths, parameterHash):
+        """Gives the images which still have to be analysed.
+
+        Args:
+            paths (list): Paths of the images of the batch.
+            parameterHash (str): Hash of the parameters of the batch.
+
+        Returns:
+            list: Paths of the images which are new, modified, failed or analysed with other parameters.
+        """
+        return [path for path in paths if not self.isFinished(path, parameterHash)]
+
+    def record(self, result, parameterHash):
+        """Appends the result of the analysis of an image to the manifest.
+
+        Args:
+            result (dict): Summary of the analysis, as given by runBatch.
+            parameterHash (str): Hash of the parameters of the batch.
+        """
+        path = os.path.abspath(result["path"])
+        try:
+            size, mtime = getImageSignature(path)
+        except OSError:
+            size, mtime = None, None
+        entry = {
+            "path": path,
+            "size": size,
+            "mtime": mtime,
+            "parameterHash": parameterHash,
+            "status": result["status"],
+            "outputDir": os.path.abspath(result["outputDir"]),
+        }
+        if "error" in result:
+            entry["error"] = result["error"]
+        self._entries[path] = entry
+        with open(self._path, "a", encoding="utf-8") as file:
+            # a line truncated by an interruption is ended before appending
+            file.write(("\n" if self._truncated else "") + json.dumps(entry) + "\n")
+        self._truncated = False
+
+
+def createDetection(image, config):
+    """Creates the detection tool of an image with the configuration of the analysis.
+
+    Args:
+        image (array-like): The image to analyse.
+        config (AnalysisConfig): The configuration of the analysis.
+
+    Returns:
+        ChunkedDetection: The configured detection.
+    """
+    detection = ChunkedDetection()
+    # lazy and memory-mapped images are read tile by tile, in-memory arrays are copied as the library modifies the bead crops in place
+    detection._image = image if isLazyArray(image) else np.array(image)
+    detection._detectionTool = DetectionTool.getInstance(config.detectionMethod)
+    if hasattr(detection._detectionTool, "_minDistance"):
+        detection._detectionTool._minDistance = config.minDistance
+    if hasattr(detection._detectionTool, "_sigma"):
+        detection._detectionTool._sigma = config.Sigma
+    detection._detectionTool._thresholdTool = Threshold.getInstance(config.thresholdMethod)
+    if hasattr(detection._detectionTool._thresholdTool, "_relThreshold"):
+        detection._detectionTool._thresholdTool._relThreshold = config.relThreshold
+    detection._beadSize = config.TheoreticalBeadSize
+    detection._rejectionDistance = config.ZRejectionMargin
+    detection._cropFactor = config.cropFactor
+    detection._thresholdIntensity = config.thresholdIntensity
+    detection._prominenceRel = config.prominenceDoublePass
+    detection._pixelSize = list(config.pixelSize)
+    detection._cropContainer = config.cropContainer
+    return detection
+
+
+def createMetrics(imageAnalyzer, config):
+    """Creates the metrics tool of an analysed image with the configuration of the analysis.
+
+    Args:
+        imageAnalyzer (ImageAnalyzer): The result of the detection.
+        config (AnalysisConfig): The configuration of the analysis.
+
+    Returns:
+        Metrics: The configured metrics tool.
+    """
+    metrics = Metrics()
+    metrics._imageAnalyzer = imageAnalyzer
+    metrics._ringInnerDistance = config.annulusInnerDistance
+    metrics._ringThickness = config.annulusThickness
+    resolutionTool = TheoreticalResolution.getInstance(config.MicroscopeType)
+    resolutionTool._numericalAperture = config.numericalAperture
+    resolutionTool._emissionWavelength = config.emissionWavelength / 1000
+    resolutionTool._refractiveIndex = config.refractionIndex
+    resolutionTool._excitationWavelength = config.excitationWavelength / 1000
+    metrics._TheoreticalResolutionTool = resolutionTool
+    return metrics
+
+
+class BatchFitting(Fitting):
+    """Fitting whose number of threads is set by the batch, so that parallel worker processes do not each start a thread per core.
+
+    Attributes:
+        _threads (int): Number of beads fitted at the same time.
+    """
+
+    def __init__(self, threads=1):
+        super().__init__()
+        self._threads = max(1, threads)
+
+    def computeFitting(self):
+        """Fits the beads which were not rejected with a pool of _threads threads, then rejects the poor fits and averages the results as Fitting does."""
+        beads = self._imageAnalyzer._beadAnalyzer
+        with ThreadPoolExecutor(max_workers=self._threads) as executor:
+            futures = [
+                executor.submit(self.runFitting, index)
+                for index, bead in enumerate(beads)
+                if bead._rejected == False and bead._roi is not None
+            ]
+            for future in as_completed(futures):
+                future.result()
+        for bead in beads:
+            if bead._rejected == False and bead._roi is not None:
+                if bead._fitTool is None:
+                    bead._rejected = True
+                    bead._rejectionDesc = "Fitting failed"
+                elif np.mean(bead._fitTool.determinations[:3]) < self._thresholdRSquared:
+                    bead._rejected = True
+                    bead._rejectionDesc = "R² below threshold"
+        keptBeads = [bead for bead in beads if bead._rejected == False and bead._roi is not None]
+        for bead in keptBeads:
+            for axis in range(3):
+                self._imageAnalyzer._meanDetermination[axis] += bead._fitTool.determinations[axis] / len(keptBeads)
+                self._imageAnalyzer._meanFWHM[axis] += bead._fitTool.fwhms[axis] / len(keptBeads)
+                self._imageAnalyzer._meanUncertainty[axis] += bead._fitTool.uncertainties[axis] / len(keptBeads)
+
+
+def getThreads(workers):
+    """Gives the number of fitting threads of each worker, sharing the threads the library would use for a single image.
+
+    Args:
+        workers (int): Number of images analysed at the same time.
+
+    Returns:
+        int: Number of threads of each worker, at least 1.
+    """
+    return max(1, int((os.cpu_count() or 1) * 0.75) // max(1, workers))
+
+
+def createFitting(imageAnalyzer, config, threads=1):
+    """Creates the fitting tool of an analysed image with the configuration of the analysis.
+
+    Args:
+        imageAnalyzer (ImageAnalyzer): The result of the detection.
+        config (AnalysisConfig): The configuration of the analysis.
+        threads (int, optional): Number of beads fitted at the same time. Defaults to 1.
+
+    Returns:
+        BatchFitting: The configured fitting tool.
+    """
+    fitting = BatchFitting(threads)
+    fitting._imageAnalyzer = imageAnalyzer
+    fitting.fitType = config.FitType
+    fitting._prominenceRel = config.prominenceRel
+    fitting._thresholdRSquared = config.thresholdRSquared
+    return fitting
+
+
+def analyzeImage(path, parameters, outputRoot=None, threads=1):
+    """Runs the whole analysis of an image, as the Run analysis button does, without any viewer.
+    The duration of each stage is written in the result folder, see StageTimer.
+
+    Args:
+        path (str): Path of the image.
+        parameters (dict): The batch parameters, or their AnalysisConfig.
+        outputRoot (str, optional): Folder in which the result folder is created. Defaults to the folder of the image.
+        threads (int, optional): Number of beads fitted at the same time. Defaults to 1.
+
+    Yields:
+        dict: Description of the current step of the analysis.
+
+    Returns:
+        dict: Summary of the analysis of the image.
+    """
+    config = AnalysisConfig.fromParameters(parameters)
+    outputDir = getOutputDir(path, outputRoot)
+    result = {"path": path, "outputDir": outputDir, "beads": 0, "validBeads": 0, "status": "done"}
+    yield {"desc": "Loading image..."}
+    timer = StageTimer()
+    with timer.stage("loading"):
+        image = loadImage(path)
+    if os.path.exists(outputDir):
+        shutil.rmtree(outputDir)
+    os.makedirs(outputDir)
+    timer.outputDir = outputDir
+    try:
+        yield from _runStages(image, config, outputDir, threads, result, timer)
+    finally:
+        # the stages run until a failure are reported as well
+        timer.save()
+    return result
+
+
+def _runStages(image, config, outputDir, threads, result, timer):
+    """Runs the stages of analyzeImage after the loading of the image, each one timed by timer."""
+    config.save(os.path.join(outputDir, CONFIG_FILE_NAME))
+    detection = createDetection(image, config)
+    with timer.stage("detection"):
+        yield from detection.run(outputDir, cropPsf=False)
+    imageAnalyzer = detection._imageAnalyzer
+    imageAnalyzer._path = outputDir
+    beads = imageAnalyzer._beadAnalyzer
+    result["beads"] = len(beads)
+
+    def keptBeads():
+        """Counts the beads kept so far, the beads entering the next stage."""
+        return len([bead for bead in beads if not bead._rejected and bead._roi is not None])
+
+    if len([bead for bead in beads if not bead._rejected]) == 0:
+        result["status"] = "no beads"
+        return
+    metrics = createMetrics(imageAnalyzer, config)
+    with timer.stage("prefitting", keptBeads):
+        yield from metrics.runPrefittingMetrics()
+    with timer.stage("mesh saving", keptBeads):
+        for bead in beads:
+            if bead._rejected == False and bead._roi is not None and bead._metricTool.meshBuilder is not None:
+                bead._metricTool.meshBuilder.saveMesh(
+                    os.path.join(detection.getActivePath(bead._id, outputDir), f"bead_{bead._id}_mesh.obj")
+                )
+    yield {"desc": "Gaussian fitting..."}
+    fitting = createFitting(imageAnalyzer, config, threads)
+    with timer.stage("fitting", keptBeads):
+        fitting.computeFitting()
+    with timer.stage("final metrics", keptBeads):
+        yield from metrics.runMetrics()
+    yield {"desc": "Generating figures..."}
+    with timer.stage("figures", keptBeads):
+        detection.cropPsf(outputDir)
+        detection.GlobalCropPsf(outputDir)
+        metrics.GenerateHeatmap(outputDir)
+        fitting.displayFitting(outputDir)
+    for report in config.listReports:
+        yield {"desc": f"Generating {report}..."}
+        with timer.stage(f"report {report}", keptBeads):
+            generator = ReportGenerator.getInstance(report)
+            generator._inputDir = outputDir
+            generator._imagePath = result["path"]
+            generator._imageAnalyzer = imageAnalyzer
+            generator._detectionDatas = config.getReportDatas("detectionDatas")
+            generator._thresholdDatas = config.getReportDatas("thresholdDatas")
+            generator._roiDatas = config.getReportDatas("roiDatas")
+            generator._fittingDatas = config.getReportDatas("fittingDatas")
+            generator._microscopeDatas = config.getReportDatas("microscopeDatas")
+            generator.generateReport(outputDir)
+    result["validBeads"] = keptBeads()
+    result["meanFWHM"] = [float(value) for value in imageAnalyzer._meanFWHM]
+    result["meanSBR"] = float(imageAnalyzer._meanSBR) if imageAnalyzer._meanSBR is not None else None
+
+
+class BatchCancelled(Exception):
+    """Raised in the analysis of an image when the batch is aborted."""
+
+
+class BatchCancellation(object):
+    """Cancellation token of a batch, shared with its worker processes.
+    Stopping lets the images being analysed finish and skips the others, aborting also interrupts the images being analysed at their next step.
+
+    Attributes:
+        _stop (multiprocessing.Event): Set when the batch is stopped.
+        _abort (multiprocessing.Event): Set when the batch is aborted.
+    """
+
+    def __init__(self):
+        context = multiprocessing.get_context("spawn")
+        self._stop = context.Event()
+        self._abort = context.Event()
+
+    def stop(self):
+        """Requests the batch to stop once the images being analysed are finished."""
+        self._stop.set()
+
+    def abort(self):
+        """Requests the batch to stop, interrupting the images being analysed."""
+        self._stop.set()
+        self._abort.set()
+
+    @property
+    def stopRequested(self):
+        """bool: Whether the batch was stopped or aborted."""
+        return self._stop.is_set()
+
+    @property
+    def abortRequested(self):
+        """bool: Whether the batch was aborted."""
+        return self._abort.is_set()
+
+
+def iterAnalysis(path, parameters, outputRoot=None, threads=1, cancellation=None):
+    """Runs the analysis of an image until the end, catching its errors so that a failing image does not stop the batch.
+
+    Args:
+        path (str): Path of the image.
+        parameters (dict): The batch parameters.
+        outputRoot (str, optional): Folder in which the result folder is created. Defaults to the folder of the image.
+        threads (int, optional): Number of beads fitted at the same time. Defaults to 1.
+        cancellation (BatchCancellation, optional): Token checked at each step, the analysis is interrupted when the batch is aborted. Defaults to None.
+
+    Yields:
+        dict: A "stage" event for each step of the analysis, then a "finished" event holding the summary of the analysis,
+            with its duration in seconds, with status "failed" and the error message if it failed,
+            and with status "cancelled" if it was interrupted, its partial results being removed.
+    """
+    start = time.perf_counter()
+    analysis = analyzeImage(path, parameters, outputRoot, threads)
+    try:
+        while True:
+            step = next(analysis)
+            if cancellation is not None and cancellation.abortRequested:
+                analysis.close()
+                raise BatchCancelled()
+            yield {"event": "stage", "path": path, "desc": step["desc"]}
+    except StopIteration as stop:
+        result = stop.value
+    except BatchCancelled:
+        result = {"path": path, "outputDir": getOutputDir(path, outputRoot), "status": "cancelled"}
+        shutil.rmtree(result["outputDir"], ignore_errors=True)
+    except Exception as error:  # noqa: BLE001 - any error of the analysis fails this image only, the batch goes on
+        result = {"path": path, "outputDir": getOutputDir(path, outputRoot), "status": "failed", "error": f"{type(error).__name__}: {error}"}
+    result["duration"] = time.perf_counter() - start
+    yield {"event": "finished", "path": path, "result": result}
+
+
+def runAnalysis(path, parameters, outputRoot=None, threads=1):
+    """Runs the analysis of an image until the end, as iterAnalysis does.
+
+    Args:
+        path (str): Path of the image.
+        parameters (dict): The batch parameters.
+        outputRoot (str, optional): Folder in which the result folder is created. Defaults to the folder of the image.
+        threads (int, optional): Number of beads fitted at the same time. Defaults to 1.
+
+    Returns:
+        dict: Summary of the analysis.
+    """
+    result = None
+    for event in iterAnalysis(path, parameters, outputRoot, threads):
+        if event["event"] == "finished":
+            result = event["result"]
+    return result
+
+
+def _initWorker(parameters, outputRoot, threads, events, cancellation):
+    """Receives the batch parameters, the queue of progress events and the cancellation token once per worker process."""
+    global _workerParameters, _workerOutputRoot, _workerThreads, _workerEvents, _workerCancellation
+    import matplotlib
+
+    # figures are only saved to files by the workers
+    matplotlib.use("Agg")
+    _workerParameters = parameters
+    _workerOutputRoot = outputRoot
+    _workerThreads = threads
+    _workerEvents = events
+    _workerCancellation = cancellation
+
+
+def _analyzeInWorker(path):
+    for event in iterAnalysis(path, _workerParameters, _workerOutputRoot, _workerThreads, _workerCancellation):
+        if event["event"] == "stage":
+            _workerEvents.put(event)
+    return event["result"]
+
+
+def _drainEvents(events):
+    """Gives the progress events sent by the workers so far."""
+    while True:
+        try:
+            yield events.get_nowait()
+        except queue.Empty:
+            return
+
+
+def runBatchEvents(
+    paths,
+    parameters,
+    workers=1,
+    outputRoot=None,
+    manifest=None,
+    resume=True,
+    cancellation=None,
+    memoryBudget=None,
+    prefetch=PREFETCH_DEPTH,
+):
+    """Analyses several images, in parallel processes when several workers are requested, giving the progress of each image.
+    The parameters are sent once to each worker process, the workers send the steps of their analysis through a queue.
+    An image is only given to a free worker when its estimated memory fits in the memory budget left by the running images, see MemoryScheduler.
+    The next queued images are read in a background thread while the current ones are analysed, see ImagePrefetcher.
+    When a manifest is given, each result is recorded in it and, when resuming, the images already analysed with the same parameters are skipped.
+    When the batch is cancelled, the images which were not started are given a "cancelled" event and are not recorded in the manifest.
+    When a worker process dies, the images being analysed in parallel are failed and the queued ones are analysed by a new pool of workers.
+
+    Args:
+        paths (list): Paths of the images to analyse.
+        parameters (dict): The batch parameters.
+        workers (int, optional): Number of images analysed at the same time. Defaults to 1, which analyses the images in the calling process.
+        outputRoot (str, optional): Folder in which the result folders are created. Defaults to the folder of each image.
+        manifest (BatchManifest, optional): Manifest of the batch. Defaults to None.
+        resume (bool, optional): Whether to skip the images finished according to the manifest. Defaults to True.
+        cancellation (BatchCancellation, optional): Token used to stop or abort the batch. Defaults to None.
+        memoryBudget (int, optional): Memory in bytes the parallel workers may use together. Defaults to a part of the available memory, see getMemoryBudget.
+        prefetch (int, optional): Number of queued images read ahead of the analysis, 0 to disable the prefetching. Defaults to PREFETCH_DEPTH.
+
+    Yields:
+        dict: The "stage" events of the images being analysed, the "finished" event of each image, in the order they finish,
+            and the "cancelled" event of each image skipped because the batch was stopped.
+    """
+    # the parameters are checked, hashed and sent to the workers once
+    parameters = AnalysisConfig.fromParameters(parameters)
+    if manifest is not None:
+        parameterHash = parameters.hash
+        if resume:
+            paths = manifest.getPendingImages(paths, parameterHash)
+        for event in runBatchEvents(paths, parameters, workers, outputRoot, cancellation=cancellation, memoryBudget=memoryBudget, prefetch=prefetch):
+            if event["event"] == "finished":
+                manifest.record(event["result"], parameterHash)
+            yield event
+        return
+    if workers <= 1 or len(paths) <= 1:
+        with ImagePrefetcher(prefetch) as prefetcher:
+            for index, path in enumerate(paths):
+                if cancellation is not None and cancellation.stopRequested:
+                    yield {"event": "cancelled", "path": path}
+                    continue
+                prefetcher.update(paths[index + 1 :])
+                yield from iterAnalysis(path, parameters, outputRoot, getThreads(1), cancellation)
+        return
+    # processes are spawned rather than forked, forking a process running Qt is unsafe
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    workers = min(workers, len(paths))
+    scheduler = MemoryScheduler(getMemoryBudget() if memoryBudget is None else memoryBudget)
+    queued = [(path, estimateMemory(path, parameters)) for path in paths]
+    with ImagePrefetcher(prefetch) as prefetcher:
+        # a worker process killed, e.g. by the system running out of memory, breaks its pool: the images left are given to a new pool
+        broken = True
+        while broken and queued and not (cancellation is not None and cancellation.stopRequested):
+            broken = yield from _runWorkerPool(queued, workers, context, events, scheduler, prefetcher, parameters, outputRoot, cancellation)
+        for path, _ in queued:
+            yield {"event": "cancelled", "path": path}
+
+
+def _runWorkerPool(queued, workers, context, events, scheduler, prefetcher, parameters, outputRoot, cancellation):
+    """Analyses the queued images in a pool of worker processes, see runBatchEvents, until they are all analysed, the batch is stopped or the pool is broken.
+    When a worker process dies, the images being analysed by the pool are failed and the pool stops taking images.
+
+    Yields:
+        dict: The events of runBatchEvents.
+
+    Returns:
+        bool: True if the pool was broken by a worker process dying.
+    """
+    broken = False
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=_initWorker,
+        initargs=(parameters, outputRoot, getThreads(workers), events, cancellation),
+    ) as executor:
+        # images are submitted one at a time when a worker is free and memory is left, so that the queued ones can still be cancelled
+        pending = {}
+        while True:
+            while not broken and len(pending) < workers and not (cancellation is not None and cancellation.stopRequested):
+                path = scheduler.admit(queued)
+                if path is None:
+                    break
+                pending[executor.submit(_analyzeInWorker, path)] = (path, time.perf_counter())
+            # the images most likely to be admitted next
+            prefetcher.update([path for path, _ in queued])
+            if not pending:
+                break
+            done, _ = wait(pending, timeout=EVENT_INTERVAL, return_when=FIRST_COMPLETED)
+            yield from _drainEvents(events)
+            for future in done:
+                path, start = pending.pop(future)
+                scheduler.release(path)
+                try:
+                    result = future.result()
+                except BrokenProcessPool as error:
+                    # the process which died cannot be told apart, every image of the pool is failed and is analysed again when the batch is resumed
+                    broken = True
+                    result = {
+                        "path": path,
+                        "outputDir": getOutputDir(path, outputRoot),
+                        "status": "failed",
+                        "error": f"{type(error).__name__}: a worker process terminated abruptly, e.g. killed when running out of memory",
+                        "duration": time.perf_counter() - start,
+                    }
+                yield {"event": "finished", "path": result["path"], "result": result}
+    return broken
+
+
+def runBatch(
+    paths,
+    parameters,
+    workers=1,
+    outputRoot=None,
+    manifest=None,
+    resume=True,
+    cancellation=None,
+    memoryBudget=None,
+):
+    """Analyses several images as runBatchEvents does, giving only their results.
+
+    Args:
+        paths (list): Paths of the images to analyse.
+        parameters (dict): The batch parameters.
+        workers (int, optional): Number of images analysed at the same time. Defaults to 1.
+        outputRoot (str, optional): Folder in which the result folders are created. Defaults to the folder of each image.
+        manifest (BatchManifest, optional): Manifest of the batch. Defaults to None.
+        resume (bool, optional): Whether to skip the images finished according to the manifest. Defaults to True.
+        cancellation (BatchCancellation, optional): Token used to stop or abort the batch. Defaults to None.
+        memoryBudget (int, optional): Memory in bytes the parallel workers may use together. Defaults to a part of the available memory.
+
+    Yields:
+        dict: Summary of the analysis of each image, in the order they finish.
+    """
+    for event in runBatchEvents(paths, parameters, workers, outputRoot, manifest, resume, cancellation, memoryBudget):
+        if event["event"] == "finished":
+            yield event["result"]
+
+
+class BatchProgress(object):
+    """Progress of a batch, built from the events of runBatchEvents: status and step of each image, and throughput of the batch.
+
+    Attributes:
+        _images (dict): For each image path, its status, step, number of beads and duration.
+        _start (float): Time at which the batch started.
+        _finished (int): Number of images finished.
+        _beads (int): Number of beads detected in the finished images.
+        _cancelled (int): Number of images skipped because the batch was stopped.
+    """
+
+    def __init__(self, paths, start=None):
+        self._images = {path: {"status": "queued", "stage": "", "beads": None, "duration": None} for path in paths}
+        self._start = time.monotonic() if start is None else start
+        self._finished = 0
+        self._beads = 0
+        self._cancelled = 0
+
+    @property
+    def paths(self):
+        """list: The paths of the images of the batch."""
+        return list(self._images)
+
+    @property
+    def finished(self):
+        """int: The number of images finished."""
+        return self._finished
+
+    def getImage(self, path):
+        """Gives the progress of an image.
+
+        Args:
+            path (str): Path of the image.
+
+        Returns:
+            dict: The status, step, number of beads and duration of the image.
+        """
+        return self._images[path]
+
+    def update(self, event):
+        """Updates the progress with an event of runBatchEvents.
+
+        Args:
+            event (dict): The event.
+
+        Returns:
+            dict: The progress of the image of the event.
+        """
+        image = self._images.setdefault(event["path"], {"status": "queued", "stage": "", "beads": None, "duration": None})
+        if event["event"] == "stage":
+            # the steps sent by a worker can arrive after the end of its image
+            if image["status"] in ("queued", "running"):
+                image["status"] = "running"
+                image["stage"] = event["desc"]
+        elif event["event"] == "finished":
+            result = event["result"]
+            image["status"] = result["status"]
+            image["stage"] = result.get("error", "")
+            image["beads"] = result.get("beads")
+            image["duration"] = result.get("duration")
+            self._finished += 1
+            self._beads += result.get("beads") or 0
+        elif event["event"] == "queued":
+            image["status"] = "queued"
+            image["stage"] = ""
+        elif event["event"] == "cancelled":
+            image["status"] = "cancelled"
+            image["stage"] = ""
+            self._cancelled += 1
+        return image
+
+    def getElapsed(self, now=None):
+        """Gives the time elapsed since the start of the batch, in seconds."""
+        return (time.monotonic() if now is None else now) - self._start
+
+    def getThroughput(self, now=None):
+        """Gives the throughput of the batch and the estimated time until its end.
+
+        Args:
+            now (float, optional): Current time, as given by time.monotonic. Defaults to now.
+
+        Returns:
+            dict: The images analysed per minute, beads detected per second and remaining seconds, None while no image is finished.
+        """
+        elapsed = self.getElapsed(now)
+        if self._finished == 0 or elapsed <= 0:
+            return {"imagesPerMinute": None, "beadsPerSecond": None, "eta": None}
+        remaining = len(self._images) - self._finished - self._cancelled
+        return {
+            "imagesPerMinute": self._finished * 60 / elapsed,
+            "beadsPerSecond": self._beads / elapsed,
+            "eta": remaining * elapsed / self._finished,
+        }
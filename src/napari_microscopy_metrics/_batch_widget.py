@@ -11,19 +11,47 @@ from qtpy.QtWidgets import (
     QGroupBox,
     QSizePolicy,
     QHBoxLayout,
+    QSpinBox,
+    QDoubleSpinBox,
+    QCheckBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QAbstractItemView,
+    QFileDialog,
+    QLineEdit,
+    QGridLayout,
 )
 from qtpy.QtCore import Qt
 from qtpy.QtGui import QFont, QIcon
 
+from napari_microscopy_metrics._batch import (
+    BatchCancellation,
+    BatchManifest,
+    BatchProgress,
+    findImages,
+    hashParameters,
+    runBatchEvents,
+    saveParameters,
+)
+from napari_microscopy_metrics._watch import watchFolder
+
 
 class BatchWidget(QWidget):
     """A Napari widget for batch processing with improved styling and UX."""
 
+    PROGRESS_COLUMNS = ["Image", "Status", "Step", "Beads", "Time (s)"]
+
     def __init__(self, viewer: "napari.viewer.Viewer", parent=None):
         super().__init__()
         self.viewer = viewer
         self._parent = parent
         self.Path = None
+        self.worker = None
+        self.progress = None
+        self.progressRows = {}
+        self.cancellation = None
+        self.watching = False
         self._init_ui()
         self._setup_connections()
 
@@ -50,7 +78,7 @@ class BatchWidget(QWidget):
         warning_layout = QVBoxLayout()
 
         self.warning_label = QLabel(
-            "Warning: Batch processing will overwrite existing results in the output folder.\n"
+            "Warning: Batch processing will overwrite the existing results of the images it analyzes.\n"
             "Advice: Run the analysis on a single image first to check parameters and results."
         )
         self.warning_label.setWordWrap(True)
@@ -76,6 +104,58 @@ class BatchWidget(QWidget):
         path_group.setLayout(path_layout)
         main_layout.addWidget(path_group)
 
+        scan_group = QGroupBox("Images")
+        scan_layout = QGridLayout()
+        self.recursive_checkbox = QCheckBox("Include subfolders")
+        self.recursive_checkbox.setToolTip(
+            "Also analyze the images of the subfolders, except the result folders of previous analyses."
+        )
+        scan_layout.addWidget(self.recursive_checkbox, 0, 0, 1, 2)
+        scan_layout.addWidget(QLabel("Include"), 1, 0)
+        self.include_edit = QLineEdit()
+        self.include_edit.setPlaceholderText("e.g. *.tif, plate1/*")
+        self.include_edit.setToolTip("Comma-separated patterns of the images to analyze, all images if empty.")
+        scan_layout.addWidget(self.include_edit, 1, 1)
+        scan_layout.addWidget(QLabel("Exclude"), 2, 0)
+        self.exclude_edit = QLineEdit()
+        self.exclude_edit.setPlaceholderText("e.g. calibration/*")
+        self.exclude_edit.setToolTip("Comma-separated patterns of the images and subfolders to skip.")
+        scan_layout.addWidget(self.exclude_edit, 2, 1)
+        scan_group.setLayout(scan_layout)
+        main_layout.addWidget(scan_group)
+
+        workers_group = QGroupBox("Parallel processing")
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("Parallel workers"))
+        self.workers_spinbox = QSpinBox()
+        self.workers_spinbox.setRange(1, os.cpu_count() or 1)
+        self.workers_spinbox.setValue(min(4, os.cpu_count() or 1))
+        self.workers_spinbox.setToolTip(
+            "Number of images analyzed at the same time, each one in its own process.\n"
+            "Fewer images run at the same time when they do not fit in the memory budget."
+        )
+        workers_layout.addWidget(self.workers_spinbox)
+        workers_layout.addWidget(QLabel("Memory budget (GB)"))
+        self.memory_spinbox = QDoubleSpinBox()
+        self.memory_spinbox.setRange(0, 4096)
+        self.memory_spinbox.setDecimals(1)
+        self.memory_spinbox.setSpecialValueText("Auto")
+        self.memory_spinbox.setToolTip(
+            "Memory the parallel workers may use together, estimated from the size of each image.\n"
+            "Large images wait for memory while small ones keep the other workers busy.\n"
+            "Auto uses 80% of the memory available when the batch starts."
+        )
+        workers_layout.addWidget(self.memory_spinbox)
+        self.resume_checkbox = QCheckBox("Skip images already analyzed")
+        self.resume_checkbox.setChecked(True)
+        self.resume_checkbox.setToolTip(
+            "Skip the images analyzed successfully with the same parameters and not modified since,\n"
+            "as recorded in the batch manifest of the folder."
+        )
+        workers_layout.addWidget(self.resume_checkbox)
+        workers_group.setLayout(workers_layout)
+        main_layout.addWidget(workers_group)
+
         action_layout = QHBoxLayout()
 
         self.run_batch_button = QPushButton("Run Batch Processing")
@@ -103,8 +183,61 @@ class BatchWidget(QWidget):
         self.run_batch_button.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         action_layout.addWidget(self.run_batch_button)
 
+        self.stop_batch_button = QPushButton("Stop")
+        self.stop_batch_button.setToolTip(
+            "Stop the batch once the images being analyzed are finished.\n"
+            "Click again to interrupt them as well."
+        )
+        self.stop_batch_button.setStyleSheet(
+            """
+            QPushButton {
+                background-color: #B22222;
+                color: white;
+                border: none;
+                padding: 8px 16px;
+                font-size: 14px;
+                border-radius: 4px;
+            }
+            QPushButton:disabled {
+                background-color: #aaaaaa;
+            }
+            """
+        )
+        self.stop_batch_button.setEnabled(False)
+        action_layout.addWidget(self.stop_batch_button)
+
+        self.watch_button = QPushButton("Watch Folder")
+        self.watch_button.setCheckable(True)
+        self.watch_button.setToolTip(
+            "Analyze the new and modified images of the folder as soon as they are completely written,\n"
+            "until the button is released. Images noticed but not analyzed yet are kept for the next watch."
+        )
+        action_layout.addWidget(self.watch_button)
+
+        self.export_parameters_button = QPushButton("Export parameters")
+        self.export_parameters_button.setToolTip(
+            "Save the parameters of the analysis in a JSON file,\n"
+            "to run the batch without napari with: microscopy-metrics-batch FOLDER --parameters FILE"
+        )
+        action_layout.addWidget(self.export_parameters_button)
+
         main_layout.addLayout(action_layout)
 
+        progress_group = QGroupBox("Progress")
+        progress_layout = QVBoxLayout()
+        self.throughput_label = QLabel("No batch running")
+        self.throughput_label.setWordWrap(True)
+        progress_layout.addWidget(self.throughput_label)
+        self.progress_table = QTableWidget(0, len(self.PROGRESS_COLUMNS))
+        self.progress_table.setHorizontalHeaderLabels(self.PROGRESS_COLUMNS)
+        self.progress_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.progress_table.horizontalHeader().setStretchLastSection(True)
+        self.progress_table.verticalHeader().setVisible(False)
+        self.progress_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        progress_layout.addWidget(self.progress_table)
+        progress_group.setLayout(progress_layout)
+        main_layout.addWidget(progress_group)
+
         self.setLayout(main_layout)
 
         self.setStyleSheet(
@@ -129,6 +262,9 @@ class BatchWidget(QWidget):
         self.viewer.layers.selection.events.active.connect(self._on_layer_changed)
         self.copy_path_button.clicked.connect(self._copy_path_to_clipboard)
         self.run_batch_button.clicked.connect(self._run_batch_processing)
+        self.stop_batch_button.clicked.connect(self._stop_batch_processing)
+        self.export_parameters_button.clicked.connect(self._export_parameters)
+        self.watch_button.toggled.connect(self._toggle_watch)
         self._on_layer_changed()
 
     def _on_layer_changed(self):
@@ -158,40 +294,249 @@ class BatchWidget(QWidget):
             self.copy_path_button.setToolTip(f"Copied: {self.Path}")
             show_info(f"Path copied to clipboard: {self.Path}")
 
-    def _run_batch_processing(self):
-        """Run batch processing on all images in the selected folder."""
+    def _export_parameters(self):
+        """Save the parameters of the analysis in a JSON file for the command line batch."""
+        defaultPath = os.path.join(self.Path, "batch_parameters.json") if self.Path else "batch_parameters.json"
+        path, _ = QFileDialog.getSaveFileName(self, "Export batch parameters", defaultPath, "JSON files (*.json)")
+        if not path:
+            return
+        saveParameters(path, self._parent.getAnalysisConfig())
+        show_info(f"Batch parameters saved to: {path}")
+
+    def _toggle_watch(self, checked):
+        """Start watching the selected folder, or stop watching it once the images being analyzed are finished."""
+        if not checked:
+            if self.cancellation is not None:
+                self.cancellation.stop()
+            self.watch_button.setEnabled(False)
+            self.watch_button.setText("Stopping...")
+            return
         if not self.Path:
-            show_info("No folder selected for batch processing.")
+            show_info("No folder selected to watch.")
+            self.watch_button.blockSignals(True)
+            self.watch_button.setChecked(False)
+            self.watch_button.blockSignals(False)
             return
+        parameters = self._parent.getAnalysisConfig()
+        self.watching = True
+        self.cancellation = BatchCancellation()
+        self.run_batch_button.setEnabled(False)
+        self.watch_button.setText("Watching...")
+        self.initProgress([])
+        show_info(f"Watching folder: {self.Path}")
         self.worker = create_worker(
-            self.analyzeBatch, _progress={"desc": "Analyzing batch..."}
+            watchFolder,
+            self.Path,
+            parameters,
+            self.workers_spinbox.value(),
+            cancellation=self.cancellation,
+            memoryBudget=self.getMemoryBudget(),
+            _progress={"desc": "Watching folder..."},
         )
+        self.worker.yielded.connect(self.onBatchEvent)
         self.worker.finished.connect(self.batchProcessingFinished)
         self.worker.errored.connect(self.batchProcessingError)
         self.worker.start()
 
-    def analyzeBatch(self):
+    def _run_batch_processing(self):
         """Run batch processing on all images in the selected folder."""
         if not self.Path:
             show_info("No folder selected for batch processing.")
             return
+        # widgets are only read here, in the main thread, the folder is scanned by the worker
+        parameters = self._parent.getAnalysisConfig()
+        manifest = BatchManifest(os.path.join(self.Path, BatchManifest.fileName))
         self.run_batch_button.setEnabled(False)
         self.run_batch_button.setText("Processing...")
-        batchAnalyzer = self._parent.generateBatchAnalyzer(self.Path)
-        if batchAnalyzer is not None:
-            show_info(f"Batch processing started for folder: {self.Path}")
-            batchAnalyzer.analyze()
+        self.watch_button.setEnabled(False)
+        self.watching = False
+        self.cancellation = BatchCancellation()
+        self.stop_batch_button.setText("Stop")
+        self.stop_batch_button.setEnabled(True)
+        show_info(f"Batch processing started for folder: {self.Path}")
+        self.initProgress([])
+        self.worker = create_worker(
+            self.analyzeBatch,
+            self.Path,
+            self.getPatterns(self.include_edit),
+            self.getPatterns(self.exclude_edit),
+            self.recursive_checkbox.isChecked(),
+            parameters,
+            self.workers_spinbox.value(),
+            manifest,
+            self.resume_checkbox.isChecked(),
+            self.cancellation,
+            self.getMemoryBudget(),
+            _progress={"total": 0, "desc": "Looking for images..."},
+        )
+        self.worker.yielded.connect(self.onBatchEvent)
+        self.worker.finished.connect(self.batchProcessingFinished)
+        self.worker.errored.connect(self.batchProcessingError)
+        self.worker.start()
+
+    @staticmethod
+    def getPatterns(edit):
+        """Give the comma-separated glob patterns of a line edit, None if it is empty."""
+        patterns = [pattern.strip() for pattern in edit.text().split(",") if pattern.strip()]
+        return patterns or None
+
+    def getMemoryBudget(self):
+        """Give the memory budget set by the user in bytes, None for the automatic budget."""
+        value = self.memory_spinbox.value()
+        return int(value * 2**30) if value > 0 else None
+
+    def analyzeBatch(self, folder, include, exclude, recursive, parameters, workers, manifest, resume, cancellation, memoryBudget=None):
+        """Find the images of the folder, then analyze those which were not analyzed yet, in parallel worker processes.
+        Scanning the folder, reading the image headers and checking the manifest can take minutes on large folders, they are done in the worker.
+
+        Args:
+            folder (str): The folder of the batch.
+            include (list): Glob patterns of the images to analyze, None for all the images.
+            exclude (list): Glob patterns of the files and folders to skip, None to skip nothing.
+            recursive (bool): Whether to scan the subfolders.
+            parameters (AnalysisConfig): The configuration given by the main widget.
+            workers (int): Number of images analyzed at the same time.
+            manifest (BatchManifest): Manifest of the folder, recording the result of each image.
+            resume (bool): Whether to skip the images already analyzed with the same parameters.
+            cancellation (BatchCancellation): Token set by the Stop button.
+            memoryBudget (int, optional): Memory in bytes the workers may use together. Defaults to the automatic budget.
+
+        Yields:
+            dict: A "planned" event with the "paths" to analyze and the number of "rejected" and "skipped" images,
+                then the progress events of the images, as given by runBatchEvents.
+        """
+        paths, rejected = findImages(folder, include, exclude, recursive)
+        total = len(paths)
+        if resume:
+            paths = manifest.getPendingImages(paths, hashParameters(parameters))
+        yield {"event": "planned", "paths": paths, "rejected": len(rejected), "skipped": total - len(paths)}
+        # the images left were filtered above, they are not signed again
+        yield from runBatchEvents(
+            paths,
+            parameters,
+            workers=workers,
+            manifest=manifest,
+            resume=False,
+            cancellation=cancellation,
+            memoryBudget=memoryBudget,
+        )
+
+    def _stop_batch_processing(self):
+        """Stop the batch after the images being analyzed, or interrupt them if the batch is already stopping."""
+        if self.cancellation is None:
+            return
+        if not self.cancellation.stopRequested:
+            self.cancellation.stop()
+            self.stop_batch_button.setText("Abort")
+            show_info("Batch processing will stop once the images being analyzed are finished.")
         else:
-            show_info("Batch processing could not be started. Please check the parameters.")
+            self.cancellation.abort()
+            self.stop_batch_button.setEnabled(False)
+            show_info("Interrupting the images being analyzed...")
 
-    def batchProcessingError(self, error):
-        """Handle errors during batch processing."""
+    def initProgress(self, paths):
+        """Fill the progress table with the images of the batch, all queued."""
+        self.progress = BatchProgress(paths)
+        self.progressRows = {}
+        self.progress_table.setRowCount(0)
+        for path in paths:
+            self.addProgressRow(path)
+        self.updateThroughput()
+
+    def addProgressRow(self, path):
+        """Add an image at the end of the progress table."""
+        row = self.progress_table.rowCount()
+        self.progressRows[path] = row
+        self.progress_table.insertRow(row)
+        self.progress_table.setItem(row, 0, QTableWidgetItem(os.path.basename(path)))
+        self.updateProgressRow(path)
+
+    def updateProgressRow(self, path):
+        """Show the status, step, number of beads and duration of an image in the progress table."""
+        image = self.progress.getImage(path)
+        values = [
+            image["status"],
+            image["stage"],
+            "" if image["beads"] is None else str(image["beads"]),
+            "" if image["duration"] is None else f"{image['duration']:.1f}",
+        ]
+        for column, value in enumerate(values, start=1):
+            self.progress_table.setItem(self.progressRows[path], column, QTableWidgetItem(value))
+
+    def updateThroughput(self):
+        """Show the number of images finished, the throughput and the estimated remaining time of the batch."""
+        throughput = self.progress.getThroughput()
+        text = f"{self.progress.finished}/{len(self.progress.paths)} images analyzed"
+        if throughput["imagesPerMinute"] is not None:
+            minutes, seconds = divmod(int(throughput["eta"]), 60)
+            text += (
+                f" | {throughput['imagesPerMinute']:.2f} images/min"
+                f" | {throughput['beadsPerSecond']:.2f} beads/s"
+                f" | ETA {minutes // 60:d}:{minutes % 60:02d}:{seconds:02d}"
+            )
+        self.throughput_label.setText(text)
+
+    def onBatchPlanned(self, event):
+        """Fill the progress table with the images to analyze once the folder was scanned, and report the images skipped."""
+        if event["rejected"]:
+            show_info(f"Skipping {event['rejected']} files which are not readable 3D images.")
+        if event["skipped"]:
+            if event["paths"]:
+                show_info(f"Skipping {event['skipped']} images already analyzed with these parameters.")
+            else:
+                show_info(f"All {event['skipped']} images were already analyzed with these parameters.")
+        elif not event["paths"]:
+            show_info(f"No image to analyze in folder: {self.Path}")
+        self.initProgress(event["paths"])
+        self.worker.pbar.total = len(event["paths"])
+        self.worker.pbar.set_description("Analyzing batch...")
+
+    def onBatchEvent(self, event):
+        """Update the progress table and bar with an event of the batch and report the images whose analysis failed."""
+        if event["event"] == "planned":
+            self.onBatchPlanned(event)
+            return
+        if event["path"] not in self.progressRows:
+            if event["event"] != "queued":
+                return
+            # images found by the watched folder
+            self.progress.update(event)
+            self.addProgressRow(event["path"])
+        else:
+            self.progress.update(event)
+            self.updateProgressRow(event["path"])
+        self.updateThroughput()
+        if event["event"] in ("stage", "queued"):
+            return
+        self.worker.pbar.set_description(f"{self.progress.finished}/{len(self.progress.paths)} images analyzed")
+        self.worker.pbar.update(1)
+        result = event.get("result", {})
+        if result.get("status") == "failed":
+            show_info(f"Analysis of {os.path.basename(result['path'])} failed: {result['error']}")
+
+    def resetButtons(self):
+        """Enable the Run button and disable the Stop button once the batch is over."""
         self.run_batch_button.setEnabled(True)
         self.run_batch_button.setText("Run Batch Processing")
+        self.stop_batch_button.setEnabled(False)
+        self.stop_batch_button.setText("Stop")
+        self.watch_button.blockSignals(True)
+        self.watch_button.setChecked(False)
+        self.watch_button.blockSignals(False)
+        self.watch_button.setEnabled(True)
+        self.watch_button.setText("Watch Folder")
+
+    def batchProcessingError(self, error):
+        """Handle errors during batch processing."""
+        self.resetButtons()
         show_info(f"Batch processing error: {error}")
 
     def batchProcessingFinished(self):
         """Handle the completion of batch processing."""
-        self.run_batch_button.setEnabled(True)
-        self.run_batch_button.setText("Run Batch Processing")
-        show_info("Batch processing completed.")
\ No newline at end of file
+        self.resetButtons()
+        if self.watching:
+            show_info("Folder watch stopped, the queued images will be analyzed by the next watch.")
+        elif self.cancellation is not None and self.cancellation.stopRequested:
+            show_info("Batch processing stopped, the remaining images will be analyzed by the next batch.")
+        else:
+            show_info("Batch processing completed.")
\ No newline at end of file
@@ -0,0 +1,365 @@
+"""Command line batch analysis, running without napari nor Qt so that it can be scripted on headless compute nodes.
+
+Example:
+    microscopy-metrics-batch /data/beads --parameters parameters.json --workers 8
+
+To share a folder between several compute nodes, submit its images to a work queue on a shared file system, then start workers on each node:
+    microscopy-metrics-batch /data/beads --parameters parameters.json --queue /data/queue --submit-only
+    microscopy-metrics-batch --queue /data/queue --workers 8
+"""
+
+import os
+import sys
+import argparse
+
+
+def parseArguments(arguments=None):
+    """Reads the arguments of the command line.
+
+    Args:
+        arguments (list, optional): The arguments. Defaults to the arguments of the process.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="microscopy-metrics-batch",
+        description="Analyse the PSF of all the bead images of a folder with the parameters exported from the napari plugin.",
+    )
+    parser.add_argument(
+        "folder",
+        nargs="?",
+        default=None,
+        help="folder containing the images to analyse, optional when working on an existing --queue",
+    )
+    parser.add_argument(
+        "-p",
+        "--parameters",
+        default=None,
+        help="JSON parameter file, exported from the Batch tab of the plugin, required with a folder",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="number of images analysed at the same time (default: 1)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=None,
+        help="folder in which the result folders are created (default: the image folder)",
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        action="store_true",
+        help="also analyse the images of the subfolders",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=None,
+        metavar="PATTERN",
+        help="glob pattern of the images to analyse, matched against their name and their path in the folder, e.g. '*.tif' (can be repeated)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=None,
+        metavar="PATTERN",
+        help="glob pattern of the images and subfolders to skip, e.g. 'calibration/*' (can be repeated)",
+    )
+    parser.add_argument(
+        "-m",
+        "--memory",
+        type=float,
+        default=None,
+        help="memory in GB the parallel workers may use together, large images wait for memory (default: 80%% of the available memory)",
+    )
+    parser.add_argument(
+        "--no-resume",
+        dest="resume",
+        action="store_false",
+        help="analyse again the images already analysed with the same parameters",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep watching the folder and analyse its new and modified images until interrupted",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=None,
+        help="seconds between two scans of the watched folder",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=None,
+        help="seconds during which a new image must not change before it is analysed",
+    )
+    parser.add_argument(
+        "--queue",
+        default=None,
+        help="shared work queue folder: the images of the folder are submitted to it, and the workers claim their images from it, so that several nodes can analyse the same folder",
+    )
+    parser.add_argument(
+        "--submit-only",
+        action="store_true",
+        help="with --queue, submit the images of the folder without analysing them",
+    )
+    parser.add_argument(
+        "--lease",
+        type=float,
+        default=None,
+        help="with --queue, seconds without news from a worker after which its image is given to another one",
+    )
+    options = parser.parse_args(arguments)
+    if options.folder is None and options.queue is None:
+        parser.error("a folder or a --queue is required")
+    if options.folder is not None and options.parameters is None:
+        parser.error("--parameters is required to analyse a folder")
+    return options
+
+
+def getMemoryBudget(options):
+    """Gives the memory budget of the command line in bytes, None for the default budget."""
+    return None if options.memory is None else int(options.memory * 2**30)
+
+
+def findImages(options):
+    """Plans the batch of the command line, printing the files rejected from their headers.
+
+    Args:
+        options (argparse.Namespace): The parsed arguments.
+
+    Returns:
+        list: The paths of the images to analyse.
+    """
+    from napari_microscopy_metrics._batch import findImages
+
+    paths, rejected = findImages(options.folder, options.include, options.exclude, options.recursive)
+    for path, reason in rejected.items():
+        print(f"Skipped {os.path.relpath(path, options.folder)}: {reason}")
+    return paths
+
+
+def formatResult(event, progress):
+    """Gives the line printed when an image is finished or skipped.
+
+    Args:
+        event (dict): The "finished" or "cancelled" event of the image.
+        progress (BatchProgress): The progress of the batch, updated with the event.
+
+    Returns:
+        str: The line describing the image and the throughput of the batch.
+    """
+    image = progress.getImage(event["path"])
+    line = f"[{progress.finished}/{len(progress.paths)}] {os.path.basename(event['path'])}: {image['status']}"
+    if image["beads"] is not None:
+        line += f", {image['beads']} beads"
+    if image["duration"] is not None:
+        line += f", {image['duration']:.1f} s"
+    if image["status"] == "failed":
+        line += f" ({image['stage']})"
+    throughput = progress.getThroughput()
+    if throughput["imagesPerMinute"] is not None:
+        line += f" | {throughput['imagesPerMinute']:.2f} images/min, ETA {throughput['eta']:.0f} s"
+    return line
+
+
+def main(arguments=None):
+    """Runs the batch analysis of a folder.
+
+    Args:
+        arguments (list, optional): The arguments of the command line. Defaults to the arguments of the process.
+
+    Returns:
+        int: 0 if all the images were analysed, 1 if some failed, 2 if the batch could not start, 130 if it was interrupted.
+    """
+    options = parseArguments(arguments)
+    import matplotlib
+
+    # figures are only saved to files
+    matplotlib.use("Agg")
+    from napari_microscopy_metrics._batch import (
+        BatchCancellation,
+        BatchManifest,
+        BatchProgress,
+        hashParameters,
+        loadParameters,
+        runBatchEvents,
+    )
+
+    if options.queue is not None:
+        return work(options)
+    try:
+        parameters = loadParameters(options.parameters)
+        paths = findImages(options)
+    except (OSError, ValueError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 2
+    if options.watch:
+        return watch(options, parameters)
+    manifest = BatchManifest(os.path.join(options.folder, BatchManifest.fileName))
+    total = len(paths)
+    if options.resume:
+        paths = manifest.getPendingImages(paths, hashParameters(parameters))
+    print(f"{len(paths)} images to analyse in {options.folder}, {total - len(paths)} already analysed")
+    progress = BatchProgress(paths)
+    cancellation = BatchCancellation()
+    failed = 0
+    try:
+        for event in runBatchEvents(
+            paths,
+            parameters,
+            workers=options.workers,
+            outputRoot=options.output,
+            manifest=manifest,
+            resume=False,
+            cancellation=cancellation,
+            memoryBudget=getMemoryBudget(options),
+        ):
+            progress.update(event)
+            if event["event"] == "stage":
+                continue
+            if event["event"] == "finished" and event["result"]["status"] == "failed":
+                failed += 1
+            print(formatResult(event, progress), flush=True)
+    except KeyboardInterrupt:
+        cancellation.abort()
+        print("Interrupted, the remaining images will be analysed by the next run.", file=sys.stderr)
+        return 130
+    print(f"{progress.finished} images analysed in {progress.getElapsed():.0f} s, {failed} failed")
+    return 1 if failed else 0
+
+
+def watch(options, parameters):
+    """Watches the folder of the command line, printing a line per analysed image, until interrupted.
+
+    Args:
+        options (argparse.Namespace): The parsed arguments.
+        parameters (dict): The batch parameters.
+
+    Returns:
+        int: 130, once interrupted.
+    """
+    from napari_microscopy_metrics._batch import BatchCancellation, BatchProgress
+    from napari_microscopy_metrics._watch import SETTLE_TIME, WATCH_INTERVAL, watchFolder
+
+    progress = BatchProgress([])
+    cancellation = BatchCancellation()
+    print(f"Watching {options.folder}, press Ctrl+C to stop")
+    try:
+        for event in watchFolder(
+            options.folder,
+            parameters,
+            workers=options.workers,
+            outputRoot=options.output,
+            cancellation=cancellation,
+            interval=WATCH_INTERVAL if options.interval is None else options.interval,
+            settleTime=SETTLE_TIME if options.settle is None else options.settle,
+            memoryBudget=getMemoryBudget(options),
+        ):
+            progress.update(event)
+            if event["event"] == "queued":
+                print(f"Queued {os.path.basename(event['path'])}", flush=True)
+            elif event["event"] != "stage":
+                print(formatResult(event, progress), flush=True)
+    except KeyboardInterrupt:
+        cancellation.abort()
+        print("Stopped watching, the queued images will be analysed by the next run.", file=sys.stderr)
+    return 130
+
+
+def formatWorkerResult(result):
+    """Gives the line printed by a queue worker when an image is finished.
+
+    Args:
+        result (dict): The summary of the analysis.
+
+    Returns:
+        str: The line describing the image.
+    """
+    line = f"{os.path.basename(result['path'])}: {result['status']}"
+    if result.get("beads") is not None:
+        line += f", {result['beads']} beads"
+    if result.get("duration") is not None:
+        line += f", {result['duration']:.1f} s"
+    if result["status"] == "failed":
+        line += f" ({result.get('error')})"
+    return line
+
+
+def runQueueWorker(queuePath, outputRoot, threads, leaseTime, cancellation):
+    """Analyses images of a work queue until it is empty, printing a line per image, in a worker process."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    from napari_microscopy_metrics._work_queue import runWorker
+
+    try:
+        for event in runWorker(queuePath, outputRoot, threads, cancellation, leaseTime=leaseTime):
+            if event["event"] == "finished":
+                # a single write, so that the lines of the workers sharing the output are not mixed
+                sys.stdout.write(formatWorkerResult(event["result"]) + "\n")
+                sys.stdout.flush()
+    except KeyboardInterrupt:
+        cancellation.abort()
+
+
+def work(options):
+    """Submits the folder of the command line to the work queue, then runs its workers on this node until the queue is empty.
+
+    Args:
+        options (argparse.Namespace): The parsed arguments.
+
+    Returns:
+        int: 0 if all the images of the queue were analysed, 1 if some failed, 2 if the queue could not be used, 130 if interrupted.
+    """
+    import multiprocessing
+
+    from napari_microscopy_metrics._batch import BatchCancellation, getThreads, loadParameters
+    from napari_microscopy_metrics._work_queue import LEASE_TIME, WorkQueue
+
+    leaseTime = LEASE_TIME if options.lease is None else options.lease
+    try:
+        queue = WorkQueue(options.queue, leaseTime)
+        if options.folder is not None:
+            submitted = queue.submit(findImages(options), loadParameters(options.parameters))
+            print(f"{len(submitted)} images of {options.folder} submitted to {options.queue}")
+        queue.checkParameters()
+    except (OSError, ValueError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 2
+    if options.submit_only:
+        return 0
+    workers = max(1, options.workers)
+    threads = getThreads(workers)
+    context = multiprocessing.get_context("spawn")
+    cancellation = BatchCancellation()
+    processes = [
+        context.Process(target=runQueueWorker, args=(options.queue, options.output, threads, leaseTime, cancellation))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        cancellation.abort()
+        for process in processes:
+            process.join()
+        print("Interrupted, the claimed images were put back in the queue.", file=sys.stderr)
+        return 130
+    counts = queue.getCounts()
+    print(f"Queue {options.queue}: {counts['done']} done, {counts['failed']} failed, {counts['pending'] + counts['claimed']} left")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import json
+import hashlib
+import functools
+
+from dataclasses import MISSING, dataclass, fields
+
+
+# parameters of the reports, dicts in the parameter files, kept as tuples of (name, value) pairs in the configuration
+REPORT_DATA_FIELDS = ("detectionDatas", "thresholdDatas", "roiDatas", "fittingDatas", "microscopeDatas")
+# name of the configuration file written in the result folder of each image
+CONFIG_FILE_NAME = "analysis_config.json"
+
+
+@dataclass(frozen=True)
+class AnalysisConfig(object):
+    """Configuration of an analysis, built once per run from the widgets or a parameter file, and read by every step of the analysis.
+    It cannot be modified once built, its numbers are converted to the type of their field, its lists are stored as tuples and its dicts as tuples of pairs, so that it can be used as a cache key,
+    sent to the worker processes and written next to the results. Its fields are the keys of the parameter files, the values being read
+    as attributes or, as in the parameter dicts, with config["key"].
+
+    Attributes:
+        detectionMethod (str): Name of the detection tool.
+        Sigma (float): Sigma of the detection tools which smooth the image.
+        minDistance (int): Minimal distance between two beads, in pixels.
+        thresholdMethod (str): Name of the threshold tool.
+        relThreshold (float): Relative threshold of the manual threshold tool, between 0 and 1.
+        TheoreticalBeadSize (float): Size of the beads in µm.
+        ZRejectionMargin (float): Distance to the first and last slices under which beads are rejected, in µm.
+        cropFactor (int): Size of the crops, in bead sizes.
+        prominenceDoublePass (float): Relative prominence of the peaks rejecting double beads, between 0 and 1.
+        thresholdIntensity (float): Relative intensity under which beads are rejected, between 0 and 1.
+        pixelSize (tuple): Pixel size in Z, Y and X, in µm.
+        annulusInnerDistance (float): Distance between the beads and the annulus measuring the background, in µm.
+        annulusThickness (float): Thickness of the annulus, in µm.
+        MicroscopeType (str): Name of the theoretical resolution tool.
+        numericalAperture (float): Numerical aperture of the objective.
+        emissionWavelength (float): Emission wavelength in nm.
+        excitationWavelength (float): Excitation wavelength in nm.
+        refractionIndex (float): Refraction index of the immersion medium.
+        FitType (str): Type of the Gaussian fitting.
+        prominenceRel (float): Relative prominence of the fitted peaks, between 0 and 1.
+        thresholdRSquared (float): Coefficient of determination under which fits are rejected.
+        listReports (tuple): Names of the reports generated.
+        detectionDatas (tuple): Parameters of the detection shown in the reports.
+        thresholdDatas (tuple): Parameters of the threshold shown in the reports.
+        roiDatas (tuple): Parameters of the regions of interest shown in the reports.
+        fittingDatas (tuple): Parameters of the fitting shown in the reports.
+        microscopeDatas (tuple): Parameters of the microscope shown in the reports.
+        cropContainer (bool): If True, the crops of the beads are saved in a single chunked container instead of per-bead folders.
+    """
+
+    detectionMethod: str
+    Sigma: float
+    minDistance: int
+    thresholdMethod: str
+    relThreshold: float
+    TheoreticalBeadSize: float
+    ZRejectionMargin: float
+    cropFactor: int
+    prominenceDoublePass: float
+    thresholdIntensity: float
+    pixelSize: tuple
+    annulusInnerDistance: float
+    annulusThickness: float
+    MicroscopeType: str
+    numericalAperture: float
+    emissionWavelength: float
+    excitationWavelength: float
+    refractionIndex: float
+    FitType: str
+    prominenceRel: float
+    thresholdRSquared: float
+    listReports: tuple
+    detectionDatas: tuple
+    thresholdDatas: tuple
+    roiDatas: tuple
+    fittingDatas: tuple
+    microscopeDatas: tuple
+    # fields added after the first parameter files have a default, used when they are missing from a file
+    cropContainer: bool = False
+
+    def __post_init__(self):
+        # numbers are stored with the type of their field, so that a value read as 3 or 3.0 gives the same configuration and hash
+        for field in fields(self):
+            if field.type is int:
+                object.__setattr__(self, field.name, int(round(getattr(self, field.name))))
+            elif field.type in (float, str, bool):
+                object.__setattr__(self, field.name, field.type(getattr(self, field.name)))
+        object.__setattr__(self, "pixelSize", tuple(float(value) for value in self.pixelSize))
+        object.__setattr__(self, "listReports", tuple(self.listReports))
+        for name in REPORT_DATA_FIELDS:
+            value = getattr(self, name)
+            object.__setattr__(self, name, tuple(value.items() if isinstance(value, dict) else value))
+
+    @classmethod
+    def getKeys(cls):
+        """Gives the keys of the parameters, in order.
+
+        Returns:
+            tuple: The names of the fields.
+        """
+        return tuple(field.name for field in fields(cls))
+
+    @classmethod
+    def getRequiredKeys(cls):
+        """Gives the keys of the parameters which have no default, in order.
+
+        Returns:
+            tuple: The names of the fields without default.
+        """
+        return tuple(field.name for field in fields(cls) if field.default is MISSING)
+
+    @classmethod
+    def fromParameters(cls, parameters):
+        """Builds the configuration of a parameter dict, as given by the getAnalysisConfig method of the main widget or read from a parameter file.
+
+        Args:
+            parameters (dict): The parameters, keys which are not parameters are ignored and missing keys with a default take it.
+                A configuration is returned as it is.
+
+        Raises:
+            ValueError: If parameters are missing.
+
+        Returns:
+            AnalysisConfig: The configuration.
+        """
+        if isinstance(parameters, cls):
+            return parameters
+        missing = [key for key in cls.getRequiredKeys() if key not in parameters]
+        if missing:
+            raise ValueError(f"Missing analysis parameters: {', '.join(missing)}")
+        return cls(**{key: parameters[key] for key in cls.getKeys() if key in parameters})
+
+    @classmethod
+    def fromJson(cls, text):
+        """Builds the configuration written by toJson.
+
+        Args:
+            text (str): The JSON text.
+
+        Returns:
+            AnalysisConfig: The configuration.
+        """
+        return cls.fromParameters(json.loads(text))
+
+    def toParameters(self):
+        """Gives the parameter dict of the configuration, with lists and dicts as in the parameter files.
+
+        Returns:
+            dict: The parameters.
+        """
+        parameters = {key: getattr(self, key) for key in self.getKeys()}
+        parameters["pixelSize"] = list(self.pixelSize)
+        parameters["listReports"] = list(self.listReports)
+        for name in REPORT_DATA_FIELDS:
+            parameters[name] = dict(parameters[name])
+        return parameters
+
+    def toJson(self):
+        """Serializes the configuration in a compact JSON text, with sorted keys.
+
+        Returns:
+            str: The JSON text.
+        """
+        return json.dumps(self.toParameters(), sort_keys=True, separators=(",", ":"), default=str)
+
+    def save(self, path):
+        """Writes the configuration in a JSON file.
+
+        Args:
+            path (str): Path of the file.
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.toJson())
+
+    def getReportDatas(self, name):
+        """Gives parameters shown in the reports.
+
+        Args:
+            name (str): The field, one of REPORT_DATA_FIELDS.
+
+        Returns:
+            dict: The parameters, as given by the toDict method of their widget.
+        """
+        return dict(getattr(self, name))
+
+    @functools.cached_property
+    def hash(self):
+        """str: The SHA-256 of the parameters, independent of the order of their keys, identifying the results of the configuration.
+        The fields left to their default are not hashed, so that the parameters written before these fields existed keep their hash."""
+        parameters = self.toParameters()
+        for field in fields(self):
+            if field.default is not MISSING and parameters[field.name] == field.default:
+                del parameters[field.name]
+        encoded = json.dumps(parameters, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def __hash__(self):
+        return int(self.hash[:16], 16)
+
+    def __getitem__(self, key):
+        if key not in self.getKeys():
+            raise KeyError(key)
+        return getattr(self, key)
@@ -0,0 +1,177 @@
+import numpy as np
+
+
+class BeadCropStore(object):
+    """Chunked zarr container holding the crops of all the beads of an analysis, instead of one folder of files per bead.
+    Crops are stored in a single array indexed by bead id, with one compressed chunk per bead, so that appending a bead writes a single chunk and reading a bead reads a single chunk.
+    Crops smaller than the array are padded, their actual shape is stored along with their origin in the image and their centroid.
+    The chunks follow the largest crop, a larger crop stored later copies the crops in larger chunks.
+
+    Attributes:
+        _path (str): Path of the container.
+        _group (zarr.Group): The opened container.
+    """
+
+    fileName = "bead_crops.zarr"
+
+    def __init__(self, path, mode="a"):
+        import zarr
+
+        self._path = path
+        self._group = zarr.open_group(path, mode=mode)
+
+    def _array(self, name):
+        return self._group[name] if name in self._group else None
+
+    @property
+    def beadIds(self):
+        """list: The ids of the beads stored in the container."""
+        shapes = self._array("shapes")
+        if shapes is None:
+            return []
+        return [int(beadId) for beadId in np.flatnonzero(np.asarray(shapes)[:, 0])]
+
+    def _grow(self, beadId, cropShape, dtype):
+        """Resizes the arrays of the container so that they can hold the crop of a bead, creating them for the first crop.
+        The chunks of the crops always hold a whole crop of the largest shape, the crops are copied in larger chunks when a larger crop is stored.
+
+        Args:
+            beadId (int): The id of the bead to be stored.
+            cropShape (tuple): The shape of its crop.
+            dtype (np.dtype): The type of the crops, used when creating the container.
+        """
+        crops = self._array("crops")
+        if crops is None:
+            self._createCrops((beadId + 1,) + tuple(cropShape), dtype)
+            for name, metadataType in (("shapes", np.int64), ("origins", np.int64), ("centroids", np.float64)):
+                self._group.zeros(name=name, shape=(beadId + 1, len(cropShape)), chunks=(1024, len(cropShape)), dtype=metadataType)
+            return
+        shape = (max(crops.shape[0], beadId + 1),) + tuple(
+            max(size, cropSize) for size, cropSize in zip(crops.shape[1:], cropShape)
+        )
+        if shape[1:] != crops.shape[1:]:
+            self._rechunk(shape)
+        elif shape != crops.shape:
+            crops.resize(shape)
+        for name in ("shapes", "origins", "centroids"):
+            array = self._array(name)
+            if array.shape[0] < shape[0]:
+                array.resize((shape[0], array.shape[1]))
+
+    def _createCrops(self, shape, dtype, name="crops"):
+        """Creates the array of the crops, with one chunk per bead.
+
+        Args:
+            shape (tuple): The number of beads followed by the shape of the largest crop.
+            dtype (np.dtype): The type of the crops.
+            name (str, optional): Name of the array. Defaults to "crops".
+
+        Returns:
+            zarr.Array: The array, filled with zeros.
+        """
+        return self._group.zeros(name=name, shape=shape, chunks=(1,) + tuple(shape[1:]), dtype=dtype)
+
+    def _rechunk(self, shape):
+        """Copies the stored crops in an array whose chunks hold crops of a larger shape.
+
+        Args:
+            shape (tuple): The new shape of the array of the crops.
+        """
+        crops = self._array("crops")
+        beadIds = self.beadIds
+        # zarr groups cannot rename arrays, the crops are copied back and forth through a temporary array
+        copy = self._createCrops(crops.shape, crops.dtype, name="crops_copy")
+        for beadId in beadIds:
+            copy[beadId] = crops[beadId]
+        del self._group["crops"]
+        crops = self._createCrops(shape, copy.dtype)
+        region = tuple(slice(0, size) for size in copy.shape[1:])
+        for beadId in beadIds:
+            crops[(beadId,) + region] = copy[beadId]
+        del self._group["crops_copy"]
+
+    def append(self, beadId, crop, origin=None, centroid=None):
+        """Stores the crop of a bead, replacing the previous one with the same id.
+
+        Args:
+            beadId (int): The id of the bead.
+            crop (np.ndarray): The (Z)YX crop of the bead.
+            origin (list, optional): Position of the first voxel of the crop in the image. Defaults to zeros.
+            centroid (list, optional): Centroid of the bead in the image. Defaults to NaN.
+        """
+        crop = np.asarray(crop)
+        self._grow(beadId, crop.shape, crop.dtype)
+        crops = self._array("crops")
+        padded = np.zeros(crops.shape[1:], dtype=crops.dtype)
+        padded[tuple(slice(0, size) for size in crop.shape)] = crop
+        crops[beadId] = padded
+        self._array("shapes")[beadId] = crop.shape
+        self._array("origins")[beadId] = np.zeros(crop.ndim) if origin is None else origin
+        self._array("centroids")[beadId] = np.full(crop.ndim, np.nan) if centroid is None else centroid
+
+    def appendBeads(self, beads):
+        """Stores the crops of the beads which were not rejected.
+        The container is sized for the largest crop before storing them, so that each crop is written once in its own chunk.
+
+        Args:
+            beads (list): The BeadAnalyzer instances of an analysis.
+        """
+        beads = [bead for bead in beads if bead._rejected == False and bead._roi is not None]
+        if not beads:
+            return
+        shapes = [np.shape(bead._image) for bead in beads]
+        self._grow(
+            max(bead._id for bead in beads),
+            tuple(max(sizes) for sizes in zip(*shapes)),
+            np.result_type(*(np.asarray(bead._image).dtype for bead in beads)),
+        )
+        for bead in beads:
+            self.append(
+                bead._id,
+                bead._image,
+                origin=[0, bead._roi[0][1], bead._roi[0][2]],
+                centroid=bead._centroid,
+            )
+
+    def __contains__(self, beadId):
+        shapes = self._array("shapes")
+        return shapes is not None and 0 <= beadId < shapes.shape[0] and shapes[beadId][0] > 0
+
+    def __getitem__(self, beadId):
+        """Reads the crop of a bead, reading only its chunk.
+
+        Args:
+            beadId (int): The id of the bead.
+
+        Raises:
+            KeyError: If no crop was stored for this bead.
+
+        Returns:
+            np.ndarray: The crop, without padding.
+        """
+        if beadId not in self:
+            raise KeyError(f"No crop stored for bead {beadId}")
+        shape = self._array("shapes")[beadId]
+        return np.asarray(self._array("crops")[(beadId,) + tuple(slice(0, size) for size in shape)])
+
+    def getOrigin(self, beadId):
+        """Gives the position in the image of the first voxel of the crop of a bead.
+
+        Args:
+            beadId (int): The id of the bead.
+
+        Returns:
+            np.ndarray: The origin of the crop.
+        """
+        return np.asarray(self._array("origins")[beadId])
+
+    def getCentroid(self, beadId):
+        """Gives the centroid in the image of a bead.
+
+        Args:
+            beadId (int): The id of the bead.
+
+        Returns:
+            np.ndarray: The centroid of the bead.
+        """
+        return np.asarray(self._array("centroids")[beadId])
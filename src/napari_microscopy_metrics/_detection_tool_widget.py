@@ -4,7 +4,6 @@ from pathlib import Path
 from qtpy.QtGui import QIcon
 from napari.settings import get_settings
 from napari.qt.threading import create_worker
-from napari.layers import Image
 from qtpy.QtCore import QSize
 from napari.utils.notifications import show_warning
 from qtpy.QtWidgets import (
@@ -16,7 +15,6 @@ from qtpy.QtWidgets import (
     QGroupBox,
 )
 
-from microscopy_metrics.detection import Detection
 from microscopy_metrics.detectionTools.detection_tool import DetectionTool
 from microscopy_metrics.thresholdTools.threshold_tool import Threshold
 
@@ -25,6 +23,7 @@ from napari_microscopy_metrics.widgets.DetectionToolWidget import (
 )
 from napari_microscopy_metrics.widgets.ThresholdWidget import ThresholdWidget
 from napari_microscopy_metrics.widgets.ROIWidget import RoiWidget
+from napari_microscopy_metrics._lazy import ChunkedDetection, layerData, layerOverview
 
 
 class DetectionParametersWidget(QWidget):
@@ -89,7 +88,7 @@ class DetectionToolTab(QWidget):
     Attributes:
         viewer (napari.viewer.Viewer): The environment where the widget will be displayed.
         countWindows (int): A counter to keep track of the number of windows created.
-        detectionTool (Detection): An instance of the Detection class to perform PSF detection.
+        detectionTool (ChunkedDetection): An instance of the ChunkedDetection class to perform PSF detection, on in-memory or lazy images.
         detectionParameters (DetectionParametersWidget): A widget for setting detection parameters.
         detectedBeadsLayer (napari.layers.Points): The layer displaying detected beads in the napari viewer.
         ROILayer (napari.layers.Shapes): The layer displaying regions of interest in the napari viewer.
@@ -102,8 +101,8 @@ class DetectionToolTab(QWidget):
         super().__init__()
         self.viewer = viewer
         self.countWindows = 0
-        self.detectionTool = Detection()
-        self.detectionParameters = DetectionParametersWidget(self.viewer)
+        self.detectionTool = ChunkedDetection()
+        self._detectionParameters = None
 
         self.detectedBeadsLayer = None
         self.ROILayer = None
@@ -135,6 +134,13 @@ class DetectionToolTab(QWidget):
 
         self.viewer.layers.events.removed.connect(self.onLayerRemoved)
 
+    @property
+    def detectionParameters(self):
+        """DetectionParametersWidget: The parameters of the detection, built when the parameters window is first opened or the parameters are first read."""
+        if self._detectionParameters is None:
+            self._detectionParameters = DetectionParametersWidget(self.viewer)
+        return self._detectionParameters
+
     def onLayerRemoved(self, event):
         """Manage the suppression of ROI and _centroids layers
 
@@ -164,11 +170,6 @@ class DetectionToolTab(QWidget):
             self.parametersWindow.show()
             self.detectionParameters.widgetRejection.pixelSize = self.detectionTool._pixelSize
             self.countWindows += 1
-            if self.viewer.layers.selection.active is not None and isinstance(self.viewer.layers.selection.active, Image):
-                self.detectionParameters.widgetThreshold.thresholdRel.setRange(0, self.viewer.layers.selection.active.data.max())
-                self.detectionParameters.widgetThreshold.thresholdRelLabel.setText(
-                    "Relative threshold: " + str(round(self.detectionParameters.widgetThreshold.thresholdRel.value() / self.viewer.layers.selection.active.data.max(), 4))
-                )
             self.detectionParameters.widgetRejection.updateCropFactor(self.detectionParameters.widgetRejection.optionsSliders.value("crop factor"))
 
 
@@ -217,7 +218,8 @@ class DetectionToolTab(QWidget):
 
     def apply(self):
         """Called when validating to launch beads detection and extraction with current parameters. It is not an analysis, only a detection preview."""
-        self.detectionTool.image = self.viewer.layers.selection.active.data
+        self.detectionTool.image = layerData(self.viewer.layers.selection.active)
+        self.detectionTool._overview, self.detectionTool._overviewFactor = layerOverview(self.viewer.layers.selection.active)
         self.detectionTool._pixelSize = self.viewer.layers.selection.active.scale
         self.detectionTool._detectionTool = DetectionTool.getInstance(self.detectionParameters.detectionToolWidget.options.value("Detection tool"))
         if hasattr(self.detectionTool._detectionTool, "_minDistance"):
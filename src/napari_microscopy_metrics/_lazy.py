@@ -0,0 +1,406 @@
+import os
+import math
+import numpy as np
+import dask.array as da
+
+from microscopy_metrics.utils import umToPx
+from microscopy_metrics.detection import Detection
+from microscopy_metrics.ImageAnalyzer import ImageAnalyzer
+from microscopy_metrics.BeadAnalyzer import BeadAnalyzer
+
+from napari_microscopy_metrics._crops import BeadCropStore
+
+
+_statisticsCache = {}
+
+
+def isLazyArray(data):
+    """Tells if an array is a chunked, lazily loaded array (dask, zarr, ...) rather than an in-memory numpy array.
+    Memory-mapped numpy arrays, as read from uncompressed TIFF and npy files, are lazy too: they may be larger than the memory.
+
+    Args:
+        data (array-like): The data of a napari layer.
+
+    Returns:
+        bool: True if the array must not be materialized as a whole.
+    """
+    return not isinstance(data, np.ndarray) or isinstance(data, np.memmap)
+
+
+def readRegion(data, key):
+    """Reads a region of a lazy array in memory.
+
+    Args:
+        data (array-like): A lazy array.
+        key (tuple): The index of the region.
+
+    Returns:
+        np.ndarray: The region, copied when it is a read-only view on a memory-mapped file so that it can be modified in place.
+    """
+    region = np.asarray(data[key])
+    return region if region.flags.writeable else region.copy()
+
+
+def asDaskArray(data):
+    """Wraps an array-like object into a dask array, keeping its native chunks when it has some.
+
+    Args:
+        data (array-like): A numpy, dask or zarr array.
+
+    Returns:
+        dask.array.Array: A lazy view on the data.
+    """
+    if isinstance(data, da.Array):
+        return data
+    return da.from_array(data, chunks=getattr(data, "chunks", "auto"))
+
+
+def _lazyStatistic(data, name, function):
+    """Computes a chunk-wise statistic of a lazy array and keeps it in cache, so that sliders don't read the whole stack on each move.
+
+    Args:
+        data (array-like): A lazy array.
+        name (str): Name of the statistic, used as part of the cache key.
+        function (callable): Reduction to apply on the dask array.
+
+    Returns:
+        The computed statistic.
+    """
+    lazyData = asDaskArray(data)
+    key = (lazyData.name, name)
+    if key not in _statisticsCache:
+        _statisticsCache[key] = function(lazyData).compute()
+    return _statisticsCache[key]
+
+
+def arrayMax(data):
+    """Computes the maximum of an array, chunk by chunk if the array is lazy.
+
+    Args:
+        data (array-like): The data of a napari layer.
+
+    Returns:
+        The maximum value of the array.
+    """
+    if not isLazyArray(data):
+        return np.max(data)
+    return _lazyStatistic(data, "max", lambda x: x.max())
+
+
+def arrayMin(data):
+    """Computes the minimum of an array, chunk by chunk if the array is lazy.
+
+    Args:
+        data (array-like): The data of a napari layer.
+
+    Returns:
+        The minimum value of the array.
+    """
+    if not isLazyArray(data):
+        return np.min(data)
+    return _lazyStatistic(data, "min", lambda x: x.min())
+
+
+def maxProjection(data, axis=0):
+    """Computes the maximum intensity projection of an array, chunk by chunk if the array is lazy.
+
+    Args:
+        data (array-like): The data of a napari layer.
+        axis (int, optional): Axis along which to project. Defaults to 0.
+
+    Returns:
+        np.ndarray: The projection, as an in-memory array.
+    """
+    if not isLazyArray(data):
+        return np.max(data, axis=axis)
+    return np.asarray(asDaskArray(data).max(axis=axis).compute())
+
+
+def thresholdSample(data, maxVoxels=2**24):
+    """Gives an in-memory version of the data small enough to compute a threshold preview.
+    Lazy arrays are regularly subsampled until they contain less than maxVoxels voxels, in-memory arrays are returned unchanged.
+
+    Args:
+        data (array-like): The data of a napari layer.
+        maxVoxels (int, optional): Maximum number of voxels of the sample. Defaults to 2**24.
+
+    Returns:
+        np.ndarray: The sampled data.
+    """
+    if not isLazyArray(data):
+        return data
+    step = max(1, math.ceil((math.prod(data.shape) / maxVoxels) ** (1 / data.ndim)))
+    return np.asarray(asDaskArray(data)[(slice(None, None, step),) * data.ndim])
+
+
+def layerData(layer):
+    """Gives the full resolution data of a napari layer, which is the first level of multiscale layers.
+
+    Args:
+        layer (napari.layers.Layer): A napari layer.
+
+    Returns:
+        array-like: The full resolution data.
+    """
+    if getattr(layer, "multiscale", False) is True:
+        return layer.data[0]
+    return layer.data
+
+
+def layerOverview(layer, maxVoxels=2**26):
+    """Gives the finest level of a multiscale layer small enough to be loaded in memory.
+
+    Args:
+        layer (napari.layers.Layer): A napari layer.
+        maxVoxels (int, optional): Maximum number of voxels of the overview. Defaults to 2**26.
+
+    Returns:
+        tuple: The in-memory overview and its lateral downsampling factor relative to the full resolution, or (None, 1) if the layer has no such level.
+    """
+    if getattr(layer, "multiscale", False) is not True:
+        return None, 1
+    for level in layer.data[1:]:
+        if math.prod(level.shape) <= maxVoxels:
+            factor = layer.data[0].shape[-1] / level.shape[-1]
+            return np.asarray(level), factor
+    return None, 1
+
+
+class CropReader(object):
+    """Read-only view on a lazy array materializing only the regions which are indexed.
+    It allows the ROI extraction of Detection to read each bead's crop separately instead of the whole stack.
+
+    Attributes:
+        _data (array-like): The lazy array.
+    """
+
+    def __init__(self, data):
+        self._data = data
+
+    @property
+    def shape(self):
+        return self._data.shape
+
+    @property
+    def ndim(self):
+        return self._data.ndim
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    def __getitem__(self, key):
+        return readRegion(self._data, key)
+
+
+class ChunkedDetection(Detection):
+    """Detection running on lazy (dask, zarr, memory-mapped) images without loading them as a whole.
+    In-memory images are processed exactly as by Detection. Lazy images are cut in overlapping XY tiles spanning the whole Z axis:
+    the detection tool runs on each tile, only the centroids found in the core of a tile are kept, and the crop of each bead is read from the lazy image when extracting ROIs.
+    As the detection tools normalize and threshold the image they receive, normalization and automatic thresholds are computed tile by tile.
+    When a coarse level of a multiscale image is given as overview, the tiles whose region of the overview has no voxel above the threshold are skipped, so that only the full resolution chunks around beads are read.
+
+    Attributes:
+        _tileSize (int): Size in pixels of the core of the XY tiles.
+        _projectionRGB (np.ndarray): Cached RGB maximum intensity projection of the lazy image, used to draw ROIs.
+        _overview (np.ndarray): In-memory coarse level of the image, or None.
+        _overviewFactor (float): Lateral downsampling factor of the overview.
+        _cropContainer (bool): If True, the crops of the beads are saved in a single BeadCropStore instead of per-bead folders.
+    """
+
+    def __init__(self, image=None):
+        super().__init__(image)
+        self._tileSize = 512
+        self._projectionRGB = None
+        self._overview = None
+        self._overviewFactor = 1
+        self._cropContainer = False
+
+    @property
+    def image(self):
+        return self._image
+
+    @image.setter
+    def image(self, image):
+        if image is None or getattr(image, "ndim", None) not in (2, 3):
+            raise ValueError("Please, select an Image with 2 or 3 dimensions.")
+        self._image = image
+        self._projectionRGB = None
+
+    def getTileMargin(self):
+        """Computes the overlap needed between tiles so that beads close to a tile border are detected with their whole neighbourhood.
+
+        Returns:
+            int: The margin in pixels added around the core of each tile.
+        """
+        roiSize = umToPx((self._cropFactor * self._beadSize) / 2, self._pixelSize[2])
+        sigma = getattr(self._detectionTool, "_sigma", 2.0)
+        return int(math.ceil(max(roiSize, 4 * sigma)))
+
+    def iterTiles(self):
+        """Iterates over the XY tiles covering the image.
+
+        Yields:
+            tuple: The (yStart, yStop, xStart, xStop) bounds of the core of the tile.
+        """
+        height, width = self._image.shape[-2:]
+        for yStart in range(0, height, self._tileSize):
+            for xStart in range(0, width, self._tileSize):
+                yield (
+                    yStart,
+                    min(yStart + self._tileSize, height),
+                    xStart,
+                    min(xStart + self._tileSize, width),
+                )
+
+    def getCandidateTiles(self, margin):
+        """Selects the tiles which may contain beads, using the overview when there is one.
+
+        Args:
+            margin (int): The margin in pixels around the core of each tile.
+
+        Returns:
+            list: The (yStart, yStop, xStart, xStop) bounds of the selected tiles.
+        """
+        tiles = list(self.iterTiles())
+        if self._overview is None:
+            return tiles
+        overview = self._overview
+        if self._detectionTool._thresholdTool is not None:
+            threshold = self._detectionTool._thresholdTool.getThreshold(overview)
+        else:
+            threshold = np.max(overview) / 2
+        factor = self._overviewFactor
+        selected = []
+        for yStart, yStop, xStart, xStop in tiles:
+            region = overview[
+                ...,
+                int(max(yStart - margin, 0) // factor) : int(math.ceil((yStop + margin) / factor)),
+                int(max(xStart - margin, 0) // factor) : int(math.ceil((xStop + margin) / factor)),
+            ]
+            if region.size > 0 and np.max(region) > threshold:
+                selected.append((yStart, yStop, xStart, xStop))
+        return selected
+
+    def detectChunks(self):
+        """Runs the detection tool on each tile of the lazy image and gathers the centroids found in the core of the tiles.
+
+        Yields:
+            dict: Description of the tile being processed.
+
+        Returns:
+            np.ndarray: The centroids detected in the whole image.
+        """
+        height, width = self._image.shape[-2:]
+        margin = self.getTileMargin()
+        tiles = self.getCandidateTiles(margin)
+        centroids = []
+        for index, (yStart, yStop, xStart, xStop) in enumerate(tiles):
+            yield {"desc": f"Detecting beads in chunk {index + 1}/{len(tiles)}..."}
+            yOrigin = max(yStart - margin, 0)
+            xOrigin = max(xStart - margin, 0)
+            tile = readRegion(
+                self._image,
+                (
+                    ...,
+                    slice(yOrigin, min(yStop + margin, height)),
+                    slice(xOrigin, min(xStop + margin, width)),
+                ),
+            )
+            self._detectionTool._image = tile
+            self._detectionTool.detect()
+            for centroid in self._detectionTool._centroids:
+                centroid = np.array(centroid)
+                centroid[-2] += yOrigin
+                centroid[-1] += xOrigin
+                if yStart <= centroid[-2] < yStop and xStart <= centroid[-1] < xStop:
+                    centroids.append(centroid)
+            self._detectionTool._image = None
+        return np.array(centroids)
+
+    def run(self, outputDir=None, cropPsf=True):
+        """Runs the complete detection workflow, on tiles if the image is lazy.
+
+        Args:
+            outputDir (Path, optional): Directory of the output folder where cropped PSF images will be saved. Required if cropPsf is set to True. Defaults to None.
+            cropPsf (bool, optional): Flag indicating whether to crop PSF images and save them in the output directory. Defaults to True.
+
+        Raises:
+            ValueError: If cropPsf is set to True and outputDir is not provided.
+
+        Yields:
+            dict: Description of the current step in the detection workflow.
+        """
+        if not isLazyArray(self._image):
+            yield from super().run(outputDir, cropPsf)
+            return
+        if outputDir is None and cropPsf == True:
+            raise ValueError(
+                "Output directory is required for saving cropped PSF images."
+            )
+        self._imageAnalyzer = ImageAnalyzer(
+            image=self._image,
+            beadSize=self._beadSize,
+            pixelSize=self._pixelSize,
+            BeadAnalyzer=[],
+        )
+        centroids = yield from self.detectChunks()
+        self._detectionTool._centroids = centroids
+        for i, centroid in enumerate(centroids):
+            bead = BeadAnalyzer(id=i, centroid=centroid)
+            self._imageAnalyzer._beadAnalyzer.append(bead)
+        yield {"desc": "Extracting Rois..."}
+        self.extractRegionOfInterest()
+
+    def extractRegionOfInterest(self):
+        """Extracts regions of interest, reading only the crop of each bead when the image is lazy."""
+        if not isLazyArray(self._image):
+            super().extractRegionOfInterest()
+            return
+        lazyImage = self._image
+        self._image = CropReader(lazyImage)
+        try:
+            super().extractRegionOfInterest()
+        finally:
+            self._image = lazyImage
+
+    def cropPsf(self, outputDir):
+        """Saves the crop of each valid bead, in a single chunked container when _cropContainer is set, in per-bead folders otherwise.
+
+        Args:
+            outputDir (Path): The directory of the output folder where the cropped PSF images will be saved.
+        """
+        if not self._cropContainer:
+            super().cropPsf(outputDir)
+            return
+        store = BeadCropStore(os.path.join(outputDir, BeadCropStore.fileName), mode="w")
+        store.appendBeads(self._imageAnalyzer._beadAnalyzer)
+
+    def getProjectionRGB(self):
+        """Computes once the normalized RGB maximum intensity projection of the image used to draw ROIs.
+
+        Returns:
+            np.ndarray: A copy of the RGB projection, which can be drawn on.
+        """
+        if self._projectionRGB is None:
+            projection = maxProjection(self._image).astype(np.float32)
+            projection = (
+                (projection - projection.min()) / (projection.max() - projection.min()) * 255
+            ).astype(np.uint8)
+            self._projectionRGB = np.stack([projection, projection, projection], axis=-1)
+        return self._projectionRGB.copy()
+
+    def addRoiOnImage(self, roi, image=None, beadId=None):
+        """Draws a ROI on the image, using a chunk-wise projection when the image is lazy.
+
+        Args:
+            roi (np.ndarray): Coordinates of the corners of the ROI to be highlighted on the image.
+            image (np.ndarray, optional): The RGB image on which to draw the ROI. Defaults to the projection of the analysed image.
+            beadId (int, optional): The ID of the bead to write next to the ROI. Defaults to None.
+
+        Returns:
+            np.ndarray: The image with the ROI highlighted by a polygon perimeter.
+        """
+        if image is None and isLazyArray(self._image):
+            image = self.getProjectionRGB()
+        return super().addRoiOnImage(roi, image=image, beadId=beadId)
@@ -0,0 +1,141 @@
+import os
+import math
+
+import numpy as np
+
+
+# memory used by a worker process before it loads an image: interpreter, libraries and figures
+PROCESS_MEMORY = 500 * 2**20
+# float64 copies of an in-memory image made by the detection: normalized, low pass and high pass images
+FLOAT_COPIES = 3
+# number of beads whose crops are assumed to be in memory, the real number is only known after the detection
+ESTIMATED_BEADS = 200
+# size of the core of the XY tiles read at once from lazy images, as in ChunkedDetection
+TILE_SIZE = 512
+# part of the memory available when the batch starts used by default as its budget
+MEMORY_FRACTION = 0.8
+
+
+def getAvailableMemory():
+    """Gives the memory which can be used without swapping.
+
+    Returns:
+        int: The available memory in bytes, the total physical memory if it is unknown.
+    """
+    try:
+        import psutil
+
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+def getMemoryBudget(fraction=MEMORY_FRACTION):
+    """Gives the default memory budget of a batch, a part of the memory available now.
+
+    Args:
+        fraction (float, optional): The part of the available memory. Defaults to MEMORY_FRACTION.
+
+    Returns:
+        int: The budget in bytes.
+    """
+    return int(getAvailableMemory() * fraction)
+
+
+def getCropVoxels(parameters):
+    """Gives the number of voxels of the crop of a bead.
+
+    Args:
+        parameters (dict): The batch parameters.
+
+    Returns:
+        int: The number of voxels of a crop, cropFactor times the theoretical bead size along each axis.
+    """
+    side = parameters["cropFactor"] * parameters["TheoreticalBeadSize"]
+    return math.prod(max(1, math.ceil(side / size)) for size in parameters["pixelSize"])
+
+
+def estimateWorkingSet(shape, dtype, lazy, parameters):
+    """Estimates the peak memory used by a worker analysing an image.
+    An in-memory image is copied then converted to float by the detection, a lazy image is read tile by tile, and the crops of the beads are added.
+
+    Args:
+        shape (tuple): The shape of the image.
+        dtype (np.dtype): The type of its voxels.
+        lazy (bool): Whether the image is chunked or memory-mapped, and read tile by tile.
+        parameters (dict): The batch parameters.
+
+    Returns:
+        int: The estimated memory in bytes, PROCESS_MEMORY included.
+    """
+    itemSize = np.dtype(dtype).itemsize
+    voxels = math.prod(shape)
+    if lazy:
+        depth = shape[0] if len(shape) == 3 else 1
+        margin = math.ceil(parameters["cropFactor"] * parameters["TheoreticalBeadSize"] / parameters["pixelSize"][-1])
+        tileVoxels = min(voxels, depth * (TILE_SIZE + 2 * margin) ** 2)
+        # the RGB projection drawn with the ROIs covers the whole XY plane
+        image = tileVoxels * (itemSize + FLOAT_COPIES * 8) + shape[-2] * shape[-1] * 3
+    else:
+        image = voxels * (itemSize + FLOAT_COPIES * 8)
+    crops = min(voxels, ESTIMATED_BEADS * getCropVoxels(parameters)) * (itemSize + 8)
+    return PROCESS_MEMORY + image + crops
+
+
+class MemoryScheduler(object):
+    """Admits the images of a batch against a memory budget, so that parallel workers do not run out of memory when a folder mixes small and large stacks.
+    The first queued image whose estimated working set fits in the memory left is started, so that small images fill the workers while a large one waits for memory;
+    an image larger than the whole budget is analysed alone.
+
+    Attributes:
+        _budget (int): The memory budget in bytes.
+        _reserved (dict): The estimated memory of each running image, by path.
+    """
+
+    def __init__(self, budget):
+        self._budget = budget
+        self._reserved = {}
+
+    @property
+    def used(self):
+        """int: The memory reserved by the running images."""
+        return sum(self._reserved.values())
+
+    def fits(self, estimate):
+        """Checks whether an image can start now.
+
+        Args:
+            estimate (int): The estimated working set of the image.
+
+        Returns:
+            bool: True if it fits in the memory left, or if no image is running.
+        """
+        return not self._reserved or self.used + estimate <= self._budget
+
+    def admit(self, queued):
+        """Takes the next image to start from the queue and reserves its memory.
+
+        Args:
+            queued (list): The (path, estimate) of the images waiting, in order; the admitted image is removed from it.
+
+        Returns:
+            str: The path of the image to start, None if no image fits now.
+        """
+        for index, (path, estimate) in enumerate(queued):
+            if self.fits(estimate):
+                del queued[index]
+                self._reserved[path] = estimate
+                return path
+        return None
+
+    def release(self, path):
+        """Frees the memory reserved by a finished image.
+
+        Args:
+            path (str): Path of the image.
+        """
+        self._reserved.pop(path, None)
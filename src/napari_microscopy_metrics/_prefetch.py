@@ -0,0 +1,115 @@
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from napari_microscopy_metrics._memory import getAvailableMemory
+
+
+# number of queued images read ahead of the analysis
+PREFETCH_DEPTH = 2
+# bytes read at once when prefetching a file
+READ_BLOCK = 8 * 2**20
+
+
+def listImageFiles(path):
+    """Lists the files of an image which are read ahead.
+    Chunked images, OME-Zarr folders, are not read ahead: their analysis only reads the full resolution chunks around the beads,
+    reading all their chunks and pyramid levels would read much more than the analysis does.
+
+    Args:
+        path (str): Path of the image.
+
+    Returns:
+        list: Paths of the files of the image, empty for a folder.
+    """
+    if os.path.isdir(path):
+        return []
+    return [path]
+
+
+def readAhead(path, stop=None, maxBytes=None):
+    """Reads the files of an image and discards their content, so that the operating system keeps them in its page cache
+    and the analysis, in this process or a worker process, reads them from memory rather than from the disk or the network.
+
+    Args:
+        path (str): Path of the image.
+        stop (threading.Event, optional): Event interrupting the reading. Defaults to None.
+        maxBytes (int, optional): Number of bytes after which the reading stops. Defaults to None, reading the whole image.
+
+    Returns:
+        int: The number of bytes read.
+    """
+    buffer = bytearray(READ_BLOCK)
+    total = 0
+    for filePath in listImageFiles(path):
+        try:
+            with open(filePath, "rb", buffering=0) as file:
+                while True:
+                    if (stop is not None and stop.is_set()) or (maxBytes is not None and total >= maxBytes):
+                        return total
+                    count = file.readinto(buffer)
+                    if not count:
+                        break
+                    total += count
+        except OSError:
+            # the analysis reports unreadable images
+            continue
+    return total
+
+
+class ImagePrefetcher(object):
+    """Reads the next images of a batch in a background thread while the current ones are analysed, so that the batch is bound by the computation rather than by the reads.
+    Only the first images of the queue are read ahead, and no more than a share of the available memory per image, so that prefetched images are not evicted before their analysis.
+    Chunked OME-Zarr images are left to the analysis, see listImageFiles.
+
+    Attributes:
+        _depth (int): Number of queued images read ahead.
+        _maxBytes (int): Number of bytes read ahead per image.
+        _stop (threading.Event): Set when the prefetcher is closed, interrupting the current reading.
+        _executor (ThreadPoolExecutor): The reading thread.
+        _futures (dict): The reading of each image already requested, by path.
+    """
+
+    def __init__(self, depth=PREFETCH_DEPTH):
+        self._depth = depth
+        self._maxBytes = getAvailableMemory() // (depth + 1) if depth > 0 else 0
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch") if depth > 0 else None
+        self._futures = {}
+
+    def update(self, upcoming):
+        """Requests the reading of the first images of the queue which were not read yet.
+
+        Args:
+            upcoming (list): Paths of the queued images, the next one first.
+        """
+        if self._executor is None:
+            return
+        for path in upcoming[: self._depth]:
+            if path not in self._futures:
+                self._futures[path] = self._executor.submit(readAhead, path, self._stop, self._maxBytes)
+
+    def isPrefetched(self, path):
+        """Checks whether an image was read ahead.
+
+        Args:
+            path (str): Path of the image.
+
+        Returns:
+            bool: True if its reading is finished.
+        """
+        future = self._futures.get(path)
+        return future is not None and future.done()
+
+    def close(self):
+        """Stops the reading and the thread, the images not read yet are dropped."""
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -4,10 +4,43 @@ This module is an example of a barebones numpy reader plugin for napari.
 It implements the Reader specification, but your plugin may choose to
 implement multiple readers or even other plugin contributions. see:
 https://napari.org/stable/plugins/building_a_plugin/guides.html#readers
+
+Bead stacks saved as TIFF or OME-TIFF files are memory-mapped (or read
+lazily page by page when compressed), and their physical pixel sizes are
+exposed in the layer metadata. OME-Zarr multiscale pyramids are opened
+lazily as multiscale layers. Several files, or a directory of per-plane
+files, are stacked lazily into a single z-stack without copying them.
 """
 
+import os
+import re
+import xml.etree.ElementTree as ET
+
 import numpy as np
 
+# dask, zarr and tifffile are only imported when a file is read, napari
+# imports this module to find out which files the plugin can open
+
+TIFF_EXTENSIONS = (".tif", ".tiff")
+OME_ZARR_EXTENSION = ".zarr"
+# attribute listing the layers of an analysis saved by the writer
+LAYERS_ATTRIBUTE = "napari_layers"
+
+# conversion factors from the units found in TIFF metadata to micrometers
+UNITS_TO_MICRONS = {
+    "m": 1e6,
+    "cm": 1e4,
+    "mm": 1e3,
+    "um": 1.0,
+    "µm": 1.0,
+    "μm": 1.0,
+    # ImageJ writes the micro sign escaped in its metadata
+    "\\u00B5m": 1.0,
+    "micron": 1.0,
+    "microns": 1.0,
+    "nm": 1e-3,
+}
+
 
 def napari_get_reader(path):
     """A basic implementation of a Reader contribution.
@@ -29,6 +62,18 @@ def napari_get_reader(path):
         # so we are only going to look at the first file.
         path = path[0]
 
+    if str(path).rstrip("/\\").lower().endswith(OME_ZARR_EXTENSION):
+        attributes = get_zarr_attributes(path) or {}
+        if LAYERS_ATTRIBUTE in attributes:
+            return analysis_reader_function
+        return ome_zarr_reader_function if get_multiscales(path) else None
+
+    if os.path.isdir(path):
+        return directory_reader_function if list_plane_files(path) else None
+
+    if str(path).lower().endswith(TIFF_EXTENSIONS):
+        return tiff_reader_function if is_tiff_stack(path) else None
+
     # the get_reader function should make as many checks as possible
     # (without loading the full file) to determine if it can read
     # the path. Here, we check the dtype of the array by loading
@@ -73,13 +118,382 @@ def reader_function(path):
     """
     # handle both a string and a list of strings
     paths = [path] if isinstance(path, str) else path
-    # load all files into array
-    arrays = [np.load(_path) for _path in paths]
-    # stack arrays into single array
-    data = np.squeeze(np.stack(arrays))
+    # memory-map all files, nothing is read until napari displays a plane
+    arrays = [np.load(_path, mmap_mode="r") for _path in paths]
+    if len(arrays) == 1:
+        data = np.squeeze(arrays[0])
+    else:
+        import dask.array as da
+
+        # stack lazily, each file being a single chunk of the stack
+        data = da.squeeze(
+            da.stack([da.from_array(array, chunks=array.shape) for array in arrays])
+        )
 
     # optional kwargs for the corresponding viewer.add_* method
     add_kwargs = {}
 
     layer_type = "image"  # optional, default is "image"
     return [(data, add_kwargs, layer_type)]
+
+
+def is_tiff_stack(path):
+    """Check from the file header only that a TIFF file holds a (Z)YX image.
+
+    Parameters
+    ----------
+    path : str
+        Path to a TIFF file.
+
+    Returns
+    -------
+    bool
+        True if the first series of the file has 2 or 3 non-singleton axes.
+    """
+    import tifffile
+
+    try:
+        with tifffile.TiffFile(path) as tif:
+            shape = tif.series[0].shape
+    except (OSError, ValueError, IndexError, tifffile.TiffFileError):
+        return False
+    return len([size for size in shape if size > 1]) in (2, 3)
+
+
+def open_tiff(path):
+    """Open the first series of a TIFF file as a lazy array.
+
+    Uncompressed files are memory-mapped, compressed ones are exposed as
+    a zarr array reading the pages on demand. Singleton axes are dropped
+    so that the array is (Z)YX.
+
+    Parameters
+    ----------
+    path : str
+        Path to a TIFF or OME-TIFF file.
+
+    Returns
+    -------
+    data : array-like
+        A numpy memmap or a dask array, never loaded in memory.
+    pixel_size : list of float or None
+        Physical size of a voxel along Z, Y and X in µm, None for the
+        axes without calibration.
+    """
+    import tifffile
+
+    with tifffile.TiffFile(path) as tif:
+        pixel_size = get_tiff_pixel_size(tif)
+    try:
+        data = tifffile.memmap(path, mode="r")
+        return np.squeeze(data), pixel_size
+    except ValueError:
+        # compressed or tiled data can't be memory-mapped
+        import zarr
+        import dask.array as da
+
+        store = tifffile.imread(path, aszarr=True)
+        data = da.from_zarr(zarr.open(store, mode="r"))
+        return da.squeeze(data), pixel_size
+
+
+def get_tiff_pixel_size(tif):
+    """Read the physical pixel sizes from OME-XML or ImageJ metadata.
+
+    Parameters
+    ----------
+    tif : tifffile.TiffFile
+        An opened TIFF file.
+
+    Returns
+    -------
+    list of float or None
+        Physical size of a voxel along Z, Y and X in µm, None for the
+        axes without calibration.
+    """
+    pixel_size = [None, None, None]
+    if tif.is_ome and tif.ome_metadata:
+        root = ET.fromstring(tif.ome_metadata)
+        pixels = next(
+            (element for element in root.iter() if element.tag.endswith("Pixels")),
+            None,
+        )
+        if pixels is not None:
+            for index, axis in enumerate("ZYX"):
+                value = pixels.get(f"PhysicalSize{axis}")
+                unit = pixels.get(f"PhysicalSize{axis}Unit", "µm")
+                if value is not None and unit in UNITS_TO_MICRONS:
+                    pixel_size[index] = float(value) * UNITS_TO_MICRONS[unit]
+            return pixel_size
+    page = tif.pages[0]
+    unit_factor = None
+    if tif.is_imagej:
+        unit = tif.imagej_metadata.get("unit", "")
+        unit_factor = UNITS_TO_MICRONS.get(unit)
+        spacing = tif.imagej_metadata.get("spacing")
+        if spacing is not None and unit_factor is not None:
+            pixel_size[0] = float(spacing) * unit_factor
+    resolution_unit = page.tags.get("ResolutionUnit")
+    resolution_unit = resolution_unit.value if resolution_unit is not None else 1
+    if resolution_unit == 2:
+        unit_factor = 25400.0
+    elif resolution_unit == 3:
+        unit_factor = 1e4
+    if unit_factor is None:
+        return pixel_size
+    for index, tag in ((1, "YResolution"), (2, "XResolution")):
+        resolution = page.tags.get(tag)
+        if resolution is None:
+            continue
+        numerator, denominator = resolution.value
+        if numerator > 0 and (numerator, denominator) != (1, 1):
+            pixel_size[index] = denominator / numerator * unit_factor
+    return pixel_size
+
+
+def tiff_reader_function(path):
+    """Take a TIFF path or list of paths and return a list of LayerData tuples.
+
+    The image is memory-mapped and its pixel sizes are used as the layer
+    scale and stored in the layer metadata under "pixel_size", so that the
+    plugin can fill its scale parameters.
+
+    Parameters
+    ----------
+    path : str or list of str
+        Path to file, or list of paths. Several files are lazily stacked.
+
+    Returns
+    -------
+    layer_data : list of tuples
+        A list containing one (data, add_kwargs, "image") tuple.
+    """
+    paths = [path] if isinstance(path, str) else path
+    opened = [open_tiff(_path) for _path in paths]
+    pixel_size = opened[0][1]
+    if len(opened) == 1:
+        data = opened[0][0]
+    else:
+        import dask.array as da
+
+        data = da.squeeze(da.stack([da.asarray(array) for array, _ in opened]))
+
+    add_kwargs = {"metadata": {"pixel_size": pixel_size}}
+    scale = [1.0 if size is None else size for size in pixel_size]
+    if any(size is not None for size in pixel_size):
+        add_kwargs["scale"] = scale[-data.ndim :]
+        add_kwargs["units"] = "um"
+    return [(data, add_kwargs, "image")]
+
+
+def get_zarr_attributes(path):
+    """Read the attributes of a zarr group.
+
+    Parameters
+    ----------
+    path : str
+        Path to a ``.zarr`` folder.
+
+    Returns
+    -------
+    dict or None
+        The attributes of the group, None if the path is not a zarr group.
+    """
+    import zarr
+
+    try:
+        group = zarr.open_group(path, mode="r")
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return dict(group.attrs)
+
+
+def get_multiscales(path):
+    """Read the OME-NGFF multiscales metadata of a zarr group.
+
+    Both the 0.4 (zarr v2, attributes at the root) and the 0.5 (zarr v3,
+    attributes under "ome") layouts are supported.
+
+    Parameters
+    ----------
+    path : str
+        Path to a ``.zarr`` folder.
+
+    Returns
+    -------
+    list of dict or None
+        The multiscales metadata, None if the path is not an OME-Zarr image.
+    """
+    attrs = get_zarr_attributes(path)
+    if attrs is None:
+        return None
+    return attrs.get("ome", attrs).get("multiscales")
+
+
+def ome_zarr_reader_function(path):
+    """Take an OME-Zarr path and return a list of LayerData tuples.
+
+    Every level of the pyramid is opened lazily, napari only reads the
+    chunks of the level matching the current zoom. The scale of the full
+    resolution level is used as the layer scale and stored in the layer
+    metadata under "pixel_size".
+
+    Parameters
+    ----------
+    path : str or list of str
+        Path to the ``.zarr`` folder, only the first path of a list is read.
+
+    Returns
+    -------
+    layer_data : list of tuples
+        A list containing one (levels, add_kwargs, "image") tuple.
+    """
+    import zarr
+    import dask.array as da
+
+    if isinstance(path, list):
+        path = path[0]
+    multiscales = get_multiscales(path)[0]
+    group = zarr.open_group(path, mode="r")
+    levels = [
+        da.from_zarr(group[dataset["path"]]) for dataset in multiscales["datasets"]
+    ]
+    scale = [1.0] * levels[0].ndim
+    for transformation in multiscales["datasets"][0].get(
+        "coordinateTransformations", []
+    ):
+        if transformation.get("type") == "scale":
+            scale = [float(size) for size in transformation["scale"]]
+    pixel_size = [None] * (3 - len(scale)) + scale[-3:]
+
+    add_kwargs = {
+        "multiscale": len(levels) > 1,
+        "scale": scale,
+        "units": "um",
+        "metadata": {"pixel_size": pixel_size},
+    }
+    if "name" in multiscales:
+        add_kwargs["name"] = multiscales["name"]
+    data = levels if len(levels) > 1 else levels[0]
+    return [(data, add_kwargs, "image")]
+
+
+def _natural_key(path):
+    """Sort key ordering "plane_2" before "plane_10"."""
+    return [
+        int(part) if part.isdigit() else part.lower()
+        for part in re.split(r"(\d+)", os.path.basename(path))
+    ]
+
+
+def list_plane_files(directory):
+    """List the per-plane files of a directory, in natural order.
+
+    Only the files sharing the extension of the first supported file are
+    kept, so that a directory mixing formats is not stacked.
+
+    Parameters
+    ----------
+    directory : str
+        Path to a directory.
+
+    Returns
+    -------
+    list of str
+        Paths to the ``.npy`` or TIFF files of the directory.
+    """
+    with os.scandir(directory) as entries:
+        files = sorted(
+            (
+                entry.path
+                for entry in entries
+                if entry.is_file()
+                and entry.name.lower().endswith((".npy",) + TIFF_EXTENSIONS)
+            ),
+            key=_natural_key,
+        )
+    if not files:
+        return []
+    extension = os.path.splitext(files[0])[1].lower()
+    return [file for file in files if file.lower().endswith(extension)]
+
+
+def directory_reader_function(path):
+    """Take a directory of per-plane files and return a list of LayerData tuples.
+
+    The planes are stacked lazily along Z in natural file name order.
+
+    Parameters
+    ----------
+    path : str or list of str
+        Path to the directory, only the first path of a list is read.
+
+    Returns
+    -------
+    layer_data : list of tuples
+        A list containing one (data, add_kwargs, "image") tuple.
+    """
+    if isinstance(path, list):
+        path = path[0]
+    files = list_plane_files(path)
+    if files[0].lower().endswith(TIFF_EXTENSIONS):
+        layer_data = tiff_reader_function(files)
+    else:
+        layer_data = reader_function(files)
+    data, add_kwargs, layer_type = layer_data[0]
+    add_kwargs.setdefault("name", os.path.basename(os.path.normpath(path)))
+    return [(data, add_kwargs, layer_type)]
+
+
+def analysis_reader_function(path):
+    """Take a saved analysis container and return a list of LayerData tuples.
+
+    Images are opened lazily as OME-Zarr pyramids, the points, shapes and
+    surfaces are read in memory with their features and display
+    attributes.
+
+    Parameters
+    ----------
+    path : str or list of str
+        Path to the ``.zarr`` folder, only the first path of a list is read.
+
+    Returns
+    -------
+    layer_data : list of tuples
+        A list of (data, add_kwargs, layer_type) tuples, in the order the
+        layers were saved.
+    """
+    import zarr
+    import dask.array as da
+
+    if isinstance(path, list):
+        path = path[0]
+    group = zarr.open_group(path, mode="r")
+    layer_data = []
+    for layer in group.attrs[LAYERS_ATTRIBUTE]:
+        key, layer_type = layer["path"], layer["type"]
+        add_kwargs = dict(layer["meta"])
+        if layer_type == "image":
+            data, image_kwargs, _ = ome_zarr_reader_function(
+                os.path.join(path, key)
+            )[0]
+            add_kwargs = {**image_kwargs, **add_kwargs}
+        elif layer_type == "labels":
+            data = da.from_zarr(group[key])
+        elif layer_type == "points":
+            data = np.asarray(group[key])
+        elif layer_type == "shapes":
+            counts = np.asarray(group[key]["counts"])
+            vertices = np.asarray(group[key]["vertices"])
+            data = np.split(vertices, np.cumsum(counts)[:-1])
+            if not len(counts):
+                data = []
+        elif layer_type == "surface":
+            data = tuple(
+                np.asarray(group[key][name])
+                for name in ("vertices", "faces", "values")
+            )
+        else:
+            continue
+        layer_data.append((data, add_kwargs, layer_type))
+    return layer_data
@@ -0,0 +1,128 @@
+import os
+import json
+import datetime
+
+import numpy as np
+
+# the library only registers its own reports when no report is registered yet
+import microscopy_metrics.reportTools  # noqa: F401
+from microscopy_metrics.report_generator import ReportGenerator
+
+
+class ReportParquet(ReportGenerator):
+    """Report writing one row per bead in a Parquet file, with typed columns which can be scanned with column pruning by QC dashboards.
+    The parameters of the analysis are stored as JSON in the metadata of the file.
+
+    Attributes:
+        _imagePath (str): Path of the analysed image, written in the image column; the path of the image analyzer is its result folder.
+    """
+
+    name = "Parquet"
+    fileName = "PSF_analysis_result.parquet"
+
+    def __init__(self):
+        super().__init__()
+        self._imagePath = None
+
+    @staticmethod
+    def _value(values, index=None):
+        """Gives a value of a bead result as a float, NaN when it was not computed.
+
+        Args:
+            values: The result, or the list of results along each axis.
+            index (int, optional): The axis of the result to get. Defaults to None.
+
+        Returns:
+            float: The value, NaN if it is missing.
+        """
+        if values is not None and index is not None:
+            values = values[index] if len(values) > index else None
+        if values is None:
+            return np.nan
+        return float(values)
+
+    def getColumns(self):
+        """Gathers the results of all the beads of the image analyzer, rejected ones included, column by column.
+
+        Returns:
+            dict: The list of values of each column.
+        """
+        beads = self._imageAnalyzer._beadAnalyzer
+        columns = {
+            "image": [],
+            "analysis_time": [],
+            "bead_id": [],
+            "centroid_z": [],
+            "centroid_y": [],
+            "centroid_x": [],
+            "roi_y_min": [],
+            "roi_y_max": [],
+            "roi_x_min": [],
+            "roi_x_max": [],
+            "sbr": [],
+            "fwhm_z": [],
+            "fwhm_y": [],
+            "fwhm_x": [],
+            "r2_z": [],
+            "r2_y": [],
+            "r2_x": [],
+            "rejected": [],
+            "rejection_reason": [],
+        }
+        imagePath = str(self._imagePath or "")
+        analysisTime = datetime.datetime.now(datetime.timezone.utc)
+        for bead in beads:
+            fitTool = bead._fitTool
+            metricTool = bead._metricTool
+            fwhms = getattr(fitTool, "fwhms", None)
+            determinations = getattr(fitTool, "determinations", None)
+            roi = np.asarray(bead._roi) if bead._roi is not None else None
+            columns["image"].append(imagePath)
+            columns["analysis_time"].append(analysisTime)
+            columns["bead_id"].append(int(bead._id))
+            for axis, name in enumerate("zyx"):
+                columns[f"centroid_{name}"].append(self._value(bead._centroid, axis))
+                columns[f"fwhm_{name}"].append(self._value(fwhms, axis))
+                columns[f"r2_{name}"].append(self._value(determinations, axis))
+            for name, axis, function in (
+                ("roi_y_min", 1, np.min),
+                ("roi_y_max", 1, np.max),
+                ("roi_x_min", 2, np.min),
+                ("roi_x_max", 2, np.max),
+            ):
+                columns[name].append(np.nan if roi is None else float(function(roi[:, axis])))
+            columns["sbr"].append(self._value(getattr(metricTool, "_SBR", None)))
+            columns["rejected"].append(bool(bead._rejected))
+            columns["rejection_reason"].append(str(bead._rejectionDesc or ""))
+        return columns
+
+    def getMetadata(self):
+        """Gathers the parameters of the analysis to be stored with the results.
+
+        Returns:
+            dict: The JSON encoded parameters, by parameter group.
+        """
+        parameters = {
+            "detection": self._detectionDatas,
+            "threshold": self._thresholdDatas,
+            "roi": self._roiDatas,
+            "fitting": self._fittingDatas,
+            "microscope": self._microscopeDatas,
+            "pixel_size": list(getattr(self._imageAnalyzer, "_pixelSize", None) or []),
+        }
+        return {name: json.dumps(value, default=str) for name, value in parameters.items()}
+
+    def generateReport(self, outputPath=None):
+        """Generates a Parquet file with one row per bead and the parameters of the analysis as metadata.
+
+        Args:
+            outputPath (str, optional): Path to the directory where the file will be saved. Defaults to the result folder of the image analyzer.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if outputPath is None:
+            outputPath = self._imageAnalyzer._path
+        table = pa.table(self.getColumns())
+        table = table.replace_schema_metadata(self.getMetadata())
+        pq.write_table(table, os.path.join(outputPath, self.fileName), compression="zstd")
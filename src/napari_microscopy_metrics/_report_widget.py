@@ -5,6 +5,9 @@ from qtpy.QtCore import Qt
 from qtpy.QtWidgets import QWidget, QVBoxLayout, QPushButton, QLabel, QGroupBox
 
 from napari_microscopy_metrics.widgets.ReportWidget import ReportWidget
+# registers the "Parquet" and "SQLite index" reports in ReportGenerator
+from napari_microscopy_metrics._report_parquet import ReportParquet  # noqa: F401
+from napari_microscopy_metrics._results_index import ReportIndex  # noqa: F401
 
 
 class ReportToolPage(QWidget):
@@ -51,4 +54,8 @@ class ReportToolPage(QWidget):
             listReports.append("CSV")
         if self.widgetReportChoices.options.value("Export report as HTML"):
             listReports.append("HTML")
+        if self.widgetReportChoices.options.value("Export results as Parquet"):
+            listReports.append("Parquet")
+        if self.widgetReportChoices.options.value("Index results in the results database"):
+            listReports.append("SQLite index")
         return listReports
@@ -0,0 +1,334 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import datetime
+
+import numpy as np
+
+# the library only registers its own reports when no report is registered yet
+import microscopy_metrics.reportTools  # noqa: F401
+from microscopy_metrics.report_generator import ReportGenerator
+
+from napari_microscopy_metrics._config import CONFIG_FILE_NAME, AnalysisConfig
+from napari_microscopy_metrics._report_parquet import ReportParquet
+
+
+# environment variable giving the path of the results database, instead of the default one in the home folder
+INDEX_PATH_VARIABLE = "MICROSCOPY_METRICS_INDEX"
+DEFAULT_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".microscopy_metrics", "results.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY,
+    output_dir TEXT NOT NULL UNIQUE,
+    image_name TEXT NOT NULL,
+    analysis_time TEXT NOT NULL,
+    parameter_hash TEXT NOT NULL,
+    parameters TEXT,
+    pixel_size_z REAL,
+    pixel_size_y REAL,
+    pixel_size_x REAL,
+    beads INTEGER,
+    valid_beads INTEGER,
+    mean_fwhm_z REAL,
+    mean_fwhm_y REAL,
+    mean_fwhm_x REAL,
+    mean_r2_z REAL,
+    mean_r2_y REAL,
+    mean_r2_x REAL,
+    mean_sbr REAL
+);
+CREATE TABLE IF NOT EXISTS beads (
+    image_id INTEGER NOT NULL REFERENCES images (id) ON DELETE CASCADE,
+    bead_id INTEGER NOT NULL,
+    centroid_z REAL,
+    centroid_y REAL,
+    centroid_x REAL,
+    sbr REAL,
+    fwhm_z REAL,
+    fwhm_y REAL,
+    fwhm_x REAL,
+    r2_z REAL,
+    r2_y REAL,
+    r2_x REAL,
+    rejected INTEGER,
+    rejection_reason TEXT,
+    PRIMARY KEY (image_id, bead_id)
+);
+CREATE INDEX IF NOT EXISTS images_time ON images (analysis_time);
+CREATE INDEX IF NOT EXISTS images_name ON images (image_name);
+"""
+
+# per-bead columns of the Parquet report stored in the beads table
+BEAD_COLUMNS = (
+    "bead_id",
+    "centroid_z",
+    "centroid_y",
+    "centroid_x",
+    "sbr",
+    "fwhm_z",
+    "fwhm_y",
+    "fwhm_x",
+    "r2_z",
+    "r2_y",
+    "r2_x",
+    "rejected",
+    "rejection_reason",
+)
+
+
+def getIndexPath():
+    """Gives the path of the results database shared by all the analyses.
+
+    Returns:
+        str: The path set in the MICROSCOPY_METRICS_INDEX environment variable, or the default one in the home folder.
+    """
+    return os.environ.get(INDEX_PATH_VARIABLE) or DEFAULT_INDEX_PATH
+
+
+def toColumnName(name):
+    """Converts a parameter name, such as those of MicroscopeParametersWidget.toDict, to a column name.
+
+    Args:
+        name (str): The parameter name, in camel case or with spaces.
+
+    Returns:
+        str: The snake case column name, e.g. "numerical_aperture" for "numericalAperture".
+    """
+    name = re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name)
+    return re.sub(r"[^0-9a-zA-Z]+", "_", name).strip("_").lower()
+
+
+def toValue(value):
+    """Converts a value to a type which can be stored in the database, NaN becoming NULL."""
+    if isinstance(value, (np.generic,)):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, (list, tuple, dict)):
+        return json.dumps(value, default=str)
+    return value
+
+
+class ResultsIndex(object):
+    """Indexed SQLite database holding the per-image and per-bead results of all the analyses, single image and batch, so that trends can be queried without reading the result folders.
+    An image is identified by its result folder, analysing it again replaces its results. The microscope parameters are stored as columns of the images table, added when a new parameter appears.
+    SQLite locks are not reliable on network filesystems: the database must be on a disk local to the host running the analyses,
+    batches running on several hosts must each write in a database of their own, set with the MICROSCOPY_METRICS_INDEX environment variable.
+
+    Attributes:
+        _path (str): Path of the database.
+        _connection (sqlite3.Connection): The connection to the database.
+    """
+
+    def __init__(self, path=None):
+        self._path = getIndexPath() if path is None else path
+        folder = os.path.dirname(os.path.abspath(self._path))
+        os.makedirs(folder, exist_ok=True)
+        # batch worker processes may write at the same time, each write takes the lock of the database in a transaction
+        self._connection = sqlite3.connect(self._path, timeout=60, isolation_level=None)
+        # the default rollback journal, the write-ahead log needs memory shared by all the processes using the database
+        self._connection.execute("PRAGMA journal_mode=DELETE")
+        self._connection.execute("PRAGMA foreign_keys=ON")
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        """Closes the connection to the database."""
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def getColumns(self, table="images"):
+        """Gives the columns of a table.
+
+        Args:
+            table (str, optional): The name of the table. Defaults to "images".
+
+        Returns:
+            list: The names of the columns.
+        """
+        return [row[1] for row in self._connection.execute(f"PRAGMA table_info({table})")]
+
+    def _addColumns(self, values):
+        """Adds the columns of the images table which are missing for the given values, with an index for each."""
+        columns = self.getColumns()
+        for name, value in values.items():
+            if name in columns:
+                continue
+            columnType = "REAL" if isinstance(value, (int, float)) and not isinstance(value, bool) else "TEXT"
+            self._connection.execute(f'ALTER TABLE images ADD COLUMN "{name}" {columnType}')
+            self._connection.execute(f'CREATE INDEX IF NOT EXISTS "images_{name}" ON images ("{name}")')
+
+    def upsert(self, image, beads):
+        """Stores the results of an image, replacing the previous results of the same result folder.
+
+        Args:
+            image (dict): The values of the images table, output_dir being required.
+            beads (dict): The list of values of each column of the beads table.
+        """
+        image = {name: toValue(value) for name, value in image.items()}
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._addColumns(image)
+            self._connection.execute("DELETE FROM images WHERE output_dir = ?", (image["output_dir"],))
+            names = ", ".join(f'"{name}"' for name in image)
+            placeholders = ", ".join("?" for _ in image)
+            cursor = self._connection.execute(f"INSERT INTO images ({names}) VALUES ({placeholders})", list(image.values()))
+            imageId = cursor.lastrowid
+            rows = [
+                [imageId] + [toValue(beads[name][index]) for name in BEAD_COLUMNS]
+                for index in range(len(beads["bead_id"]))
+            ]
+            self._connection.executemany(
+                f"INSERT INTO beads (image_id, {', '.join(BEAD_COLUMNS)}) VALUES ({', '.join('?' for _ in range(len(BEAD_COLUMNS) + 1))})",
+                rows,
+            )
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def getTrend(self, metric, since=None, until=None, **filters):
+        """Gives the values of a per-image result over time.
+
+        Args:
+            metric (str): A column of the images table, e.g. "mean_fwhm_z".
+            since (str, optional): ISO date from which the analyses are given. Defaults to None.
+            until (str, optional): ISO date until which the analyses are given. Defaults to None.
+            **filters: Values of columns of the images table, e.g. numerical_aperture=1.4.
+
+        Raises:
+            ValueError: If the metric or a filter is not a column of the images table.
+
+        Returns:
+            list: The (analysis time, image name, value) tuples, sorted by time.
+        """
+        columns = self.getColumns()
+        unknown = [name for name in [metric] + list(filters) if name not in columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        conditions = []
+        arguments = []
+        if since is not None:
+            conditions.append("analysis_time >= ?")
+            arguments.append(since)
+        if until is not None:
+            conditions.append("analysis_time <= ?")
+            arguments.append(until)
+        for name, value in filters.items():
+            conditions.append(f'"{name}" = ?')
+            arguments.append(toValue(value))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._connection.execute(
+            f'SELECT analysis_time, image_name, "{metric}" FROM images {where} ORDER BY analysis_time',
+            arguments,
+        ).fetchall()
+
+    def query(self, sql, arguments=()):
+        """Runs a read query on the database, for comparisons not covered by getTrend.
+
+        Args:
+            sql (str): The SQL query.
+            arguments (tuple, optional): The values of its placeholders. Defaults to ().
+
+        Returns:
+            list: The rows of the result.
+        """
+        return self._connection.execute(sql, arguments).fetchall()
+
+
+class ReportIndex(ReportGenerator):
+    """Report upserting the per-image and per-bead results of the analysis in the results database, see ResultsIndex."""
+
+    name = "SQLite index"
+
+    def __init__(self):
+        super().__init__()
+
+    def getParameters(self):
+        """Gathers the parameters of the analysis.
+
+        Returns:
+            dict: The parameters, by parameter group.
+        """
+        return {
+            "detection": self._detectionDatas,
+            "threshold": self._thresholdDatas,
+            "roi": self._roiDatas,
+            "fitting": self._fittingDatas,
+            "microscope": self._microscopeDatas,
+            "pixel_size": list(getattr(self._imageAnalyzer, "_pixelSize", None) or []),
+        }
+
+    def getParameterHash(self, outputPath, parameters):
+        """Gives the hash identifying the configuration of the analysis, as in the batch manifests.
+
+        Args:
+            outputPath (str): The result folder of the image.
+            parameters (str): The JSON parameters of the report, hashed when the result folder has no configuration file.
+
+        Returns:
+            str: The hash of the AnalysisConfig written in the result folder, or the SHA-256 of the report parameters.
+        """
+        try:
+            with open(os.path.join(outputPath, CONFIG_FILE_NAME), encoding="utf-8") as file:
+                return AnalysisConfig.fromJson(file.read()).hash
+        except (OSError, ValueError):
+            return hashlib.sha256(parameters.encode("utf-8")).hexdigest()
+
+    def getImageRow(self, outputPath, beads):
+        """Gathers the per-image results and parameters.
+
+        Args:
+            outputPath (str): The result folder of the image.
+            beads (dict): The per-bead columns of the image.
+
+        Returns:
+            dict: The values of the images table.
+        """
+        parameters = json.dumps(self.getParameters(), sort_keys=True, default=str)
+        name = os.path.basename(os.path.normpath(outputPath))
+        if name.endswith("_analysis"):
+            name = name[: -len("_analysis")]
+        imageAnalyzer = self._imageAnalyzer
+        pixelSize = list(getattr(imageAnalyzer, "_pixelSize", None) or [None] * 3)
+        meanFWHM = list(getattr(imageAnalyzer, "_meanFWHM", None) or [None] * 3)
+        meanDetermination = list(getattr(imageAnalyzer, "_meanDetermination", None) or [None] * 3)
+        row = {
+            "output_dir": os.path.abspath(outputPath),
+            "image_name": name,
+            "analysis_time": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "parameter_hash": self.getParameterHash(outputPath, parameters),
+            "parameters": parameters,
+            "beads": len(beads["bead_id"]),
+            "valid_beads": int(sum(1 for rejected in beads["rejected"] if not rejected)),
+            "mean_sbr": getattr(imageAnalyzer, "_meanSBR", None),
+        }
+        for axis, axisName in enumerate("zyx"):
+            row[f"pixel_size_{axisName}"] = pixelSize[axis]
+            row[f"mean_fwhm_{axisName}"] = meanFWHM[axis]
+            row[f"mean_r2_{axisName}"] = meanDetermination[axis]
+        for key, value in (self._microscopeDatas or {}).items():
+            row[toColumnName(key)] = value
+        return row
+
+    def generateReport(self, outputPath=None, indexPath=None):
+        """Upserts the results of the analysis in the results database.
+
+        Args:
+            outputPath (str, optional): The result folder of the image. Defaults to the folder of the image analyzer.
+            indexPath (str, optional): Path of the database. Defaults to the path given by getIndexPath.
+        """
+        if outputPath is None:
+            outputPath = self._imageAnalyzer._path
+        parquet = ReportParquet()
+        parquet._imageAnalyzer = self._imageAnalyzer
+        beads = parquet.getColumns()
+        with ResultsIndex(indexPath) as index:
+            index.upsert(self.getImageRow(outputPath, beads), beads)
@@ -4,19 +4,331 @@ This module is an example of a barebones sample data provider for napari.
 It implements the "sample data" specification.
 see: https://napari.org/stable/plugins/building_a_plugin/guides.html#sample-data
 
-Replace code below according to your needs.
+The sample is a synthetic 3D field of beads: the PSF kernel is computed
+once with the PSF generators of microscopy_metrics, then placed at
+sub-pixel positions for all beads with vectorized operations. The
+ground-truth centroids and FWHMs are returned as a points layer.
 """
 
 from __future__ import annotations
 
+import functools
+
 import numpy
 
+# names of the aberrations, as used by the "Generate random PSF" button
+ABERRATIONS = (None, "comatic", "astigmatism", "spherical")
+# maximum number of voxels of the shifted kernels computed at once
+BATCH_VOXELS = 2**22
+# number of PSF kernels kept in memory by cached_psf_kernel
+PSF_CACHE_SIZE = 16
+
 
 def make_sample_data():
-    """Generates an image"""
+    """Generates a synthetic bead field with its ground truth"""
     # Return list of tuples
     # [(data1, add_image_kwargs1), (data2, add_image_kwargs2)]
     # Check the documentation for more information about the
     # add_image_kwargs
     # https://napari.org/stable/api/napari.Viewer.html#napari.Viewer.add_image
-    return [(numpy.random.rand(512, 512), {})]
+    return make_bead_field()
+
+
+def make_psf_kernel(
+    size=33,
+    dxy=0.069,
+    dz=0.1,
+    ni=1.45,
+    wavelength=0.5,
+    NA=1.0,
+    aberration=None,
+):
+    """Compute a PSF kernel with the generators of microscopy_metrics.
+
+    Parameters
+    ----------
+    size : int
+        Number of voxels of the kernel along each axis.
+    dxy, dz : float
+        Lateral and axial pixel sizes in µm.
+    ni : float
+        Refractive index of the immersion and sample media.
+    wavelength : float
+        Emission wavelength in µm.
+    NA : float
+        Numerical aperture of the objective.
+    aberration : str or None
+        One of None, "comatic", "astigmatism" or "spherical".
+
+    Returns
+    -------
+    numpy.ndarray
+        The (size, size, size) kernel, with a maximum of 255.
+    """
+    from microscopy_metrics.scripts.PSFGenerator.PSF import (
+        PSFGenerator,
+        PSFWithAstigmatismAberration,
+        PSFWithComaticAberration,
+        PSFWithSphericalAberration,
+    )
+
+    if aberration not in ABERRATIONS:
+        raise ValueError(f"Unknown aberration type: {aberration}")
+    if aberration == "comatic":
+        generator = PSFWithComaticAberration(
+            size, dxy, dz, ni, ni, wavelength, NA
+        )
+    elif aberration == "astigmatism":
+        generator = PSFWithAstigmatismAberration(
+            size, dxy, dz, ni, ni, wavelength, NA
+        )
+    elif aberration == "spherical":
+        generator = PSFWithSphericalAberration(
+            size, dxy, dz, ni, wavelength, NA
+        )
+    else:
+        generator = PSFGenerator(size, dxy, dz, ni, ni, wavelength, NA)
+    return generator.psf.reshape((size, size, size))
+
+
+@functools.lru_cache(maxsize=PSF_CACHE_SIZE)
+def cached_psf_kernel(
+    size=33,
+    dxy=0.069,
+    dz=0.1,
+    ni=1.45,
+    wavelength=0.5,
+    NA=1.0,
+    aberration=None,
+):
+    """Compute a PSF kernel once per set of microscope parameters.
+
+    The parameters are those of make_psf_kernel. The kernels of the
+    last PSF_CACHE_SIZE parameter sets are kept, so that generating a PSF
+    again with the same settings is instant.
+
+    Returns
+    -------
+    numpy.ndarray
+        The read-only kernel, shared between the callers.
+    """
+    kernel = make_psf_kernel(size, dxy, dz, ni, wavelength, NA, aberration)
+    kernel.setflags(write=False)
+    return kernel
+
+
+def measure_fwhm(kernel, pixel_size):
+    """Measure the FWHM of a kernel along Z, Y and X through its maximum.
+
+    Parameters
+    ----------
+    kernel : numpy.ndarray
+        A 3D PSF kernel.
+    pixel_size : sequence of float
+        Size of a voxel along Z, Y and X in µm.
+
+    Returns
+    -------
+    list of float
+        The FWHM along Z, Y and X in µm, half maxima being located by
+        linear interpolation between voxels.
+    """
+    peak = numpy.unravel_index(numpy.argmax(kernel), kernel.shape)
+    half = kernel[peak] / 2
+    fwhm = []
+    for axis in range(3):
+        index = list(peak)
+        index[axis] = slice(None)
+        profile = kernel[tuple(index)]
+        above = numpy.flatnonzero(profile >= half)
+        first, last = above[0], above[-1]
+        left = float(first)
+        if first > 0:
+            left -= (profile[first] - half) / (
+                profile[first] - profile[first - 1]
+            )
+        right = float(last)
+        if last < len(profile) - 1:
+            right += (profile[last] - half) / (
+                profile[last] - profile[last + 1]
+            )
+        fwhm.append((right - left) * pixel_size[axis])
+    return fwhm
+
+
+def _shifted_kernels(kernel, fractions):
+    """Shift copies of a kernel by sub-pixel offsets with linear interpolation.
+
+    Parameters
+    ----------
+    kernel : numpy.ndarray
+        The (K, K, K) kernel.
+    fractions : numpy.ndarray
+        The (B, 3) offsets, between 0 and 1, of B copies.
+
+    Returns
+    -------
+    numpy.ndarray
+        The (B, K + 2, K + 2, K + 2) shifted copies, the kernel being
+        padded by one voxel on each side.
+    """
+    shifted = numpy.pad(kernel.astype(numpy.float32), 1)[numpy.newaxis]
+    for axis in range(3):
+        weight = fractions[:, axis].astype(numpy.float32)
+        weight = weight.reshape((-1,) + (1,) * 3)
+        previous = numpy.roll(shifted, 1, axis=axis + 1)
+        shifted = (1 - weight) * shifted + weight * previous
+    return shifted
+
+
+def _place_beads(shape, kernel, centroids, intensities):
+    """Add shifted copies of a kernel at sub-pixel centroids of a volume.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Shape of the (Z, Y, X) volume.
+    kernel : numpy.ndarray
+        The (K, K, K) kernel, its maximum being at its center.
+    centroids : numpy.ndarray
+        The (N, 3) sub-pixel positions of the beads.
+    intensities : numpy.ndarray
+        The (N,) factors applied to the kernel of each bead.
+
+    Returns
+    -------
+    numpy.ndarray
+        The float32 volume.
+    """
+    peak = numpy.unravel_index(numpy.argmax(kernel), kernel.shape)
+    # padding shifts the kernel by one voxel along each axis
+    peak = numpy.array(peak) + 1
+    padded_size = numpy.array(kernel.shape) + 2
+    volume = numpy.zeros(shape, dtype=numpy.float32)
+    batch = max(1, BATCH_VOXELS // int(numpy.prod(padded_size)))
+    for start in range(0, len(centroids), batch):
+        positions = centroids[start : start + batch]
+        origins = numpy.floor(positions).astype(numpy.int64)
+        copies = _shifted_kernels(kernel, positions - origins)
+        copies *= intensities[start : start + batch].reshape((-1, 1, 1, 1))
+        starts = origins - peak
+        stops = starts + padded_size
+        lows = numpy.maximum(starts, 0)
+        highs = numpy.minimum(stops, shape)
+        for copy, low, high, first in zip(copies, lows, highs, starts):
+            if numpy.any(high <= low):
+                continue
+            volume[tuple(map(slice, low, high))] += copy[
+                tuple(map(slice, low - first, high - first))
+            ]
+    return volume
+
+
+def make_bead_field(
+    n_beads=100,
+    shape=(64, 512, 512),
+    pixel_size=(0.1, 0.069, 0.069),
+    wavelength=0.5,
+    NA=1.0,
+    ni=1.45,
+    aberration=None,
+    kernel_size=33,
+    amplitude=1000.0,
+    background=100.0,
+    noise_std=5.0,
+    seed=0,
+):
+    """Render a synthetic 3D field of beads with its ground truth.
+
+    Beads are spread on a jittered lateral grid so that they rarely
+    overlap, at random depths keeping their PSF inside the stack. The
+    image gets a constant background, Poisson shot noise and Gaussian
+    read noise.
+
+    Parameters
+    ----------
+    n_beads : int
+        Number of beads in the field.
+    shape : tuple of int
+        Shape of the (Z, Y, X) image.
+    pixel_size : tuple of float
+        Size of a voxel along Z, Y and X in µm.
+    wavelength, NA, ni : float
+        Emission wavelength in µm, numerical aperture and refractive index.
+    aberration : str or None
+        One of None, "comatic", "astigmatism" or "spherical".
+    kernel_size : int
+        Number of voxels of the PSF kernel along each axis, odd so that
+        the kernel is centered on a voxel.
+    amplitude : float
+        Mean peak intensity of the beads.
+    background : float
+        Constant background intensity.
+    noise_std : float
+        Standard deviation of the Gaussian read noise.
+    seed : int
+        Seed of the random generator, for reproducible fields.
+
+    Returns
+    -------
+    list of tuples
+        The uint16 image and the ground-truth points, whose features hold
+        the bead ids and the FWHM along Z, Y and X in µm.
+    """
+    rng = numpy.random.default_rng(seed)
+    kernel = cached_psf_kernel(
+        kernel_size,
+        pixel_size[1],
+        pixel_size[0],
+        ni,
+        wavelength,
+        NA,
+        aberration,
+    )
+    kernel = kernel / kernel.max()
+    fwhm = measure_fwhm(kernel, pixel_size)
+
+    # jittered grid of at least n_beads cells in the lateral plane
+    rows = max(1, int(numpy.ceil(numpy.sqrt(n_beads * shape[1] / shape[2]))))
+    columns = max(1, int(numpy.ceil(n_beads / rows)))
+    cells = rng.choice(rows * columns, size=n_beads, replace=False)
+    cell_size = numpy.array([shape[1] / rows, shape[2] / columns])
+    jitter = rng.uniform(0.25, 0.75, size=(n_beads, 2))
+    lateral = numpy.stack([cells // columns, cells % columns], axis=1)
+    lateral = (lateral + jitter) * cell_size
+    margin = min(kernel_size / 2, (shape[0] - 1) / 2)
+    depth = rng.uniform(margin, shape[0] - 1 - margin, size=n_beads)
+    centroids = numpy.column_stack([depth, lateral])
+    intensities = amplitude * rng.uniform(0.8, 1.2, size=n_beads)
+
+    image = _place_beads(shape, kernel, centroids, intensities) + background
+    image = rng.poisson(image).astype(numpy.float32)
+    image += rng.normal(0, noise_std, size=shape).astype(numpy.float32)
+    image = numpy.clip(image, 0, numpy.iinfo(numpy.uint16).max)
+
+    scale = list(pixel_size)
+    features = {
+        "bead_id": numpy.arange(n_beads),
+        "fwhm_z": numpy.full(n_beads, fwhm[0]),
+        "fwhm_y": numpy.full(n_beads, fwhm[1]),
+        "fwhm_x": numpy.full(n_beads, fwhm[2]),
+    }
+    image_kwargs = {
+        "name": "Synthetic beads",
+        "scale": scale,
+        "units": "um",
+        "metadata": {"pixel_size": scale, "ground_truth_fwhm": fwhm},
+    }
+    points_kwargs = {
+        "name": "Ground truth",
+        "scale": scale,
+        "units": "um",
+        "features": features,
+        "face_color": "transparent",
+        "border_color": "lime",
+        "size": 4,
+    }
+    return [
+        (image.astype(numpy.uint16), image_kwargs, "image"),
+        (centroids, points_kwargs, "points"),
+    ]
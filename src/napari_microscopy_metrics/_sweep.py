@@ -0,0 +1,418 @@
+import csv
+import itertools
+import multiprocessing
+import dataclasses
+
+import numpy as np
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from napari_microscopy_metrics._batch import (
+    RESULT_SUFFIX,
+    createDetection,
+    createFitting,
+    createMetrics,
+    getOutputDir,
+    getThreads,
+    loadImage,
+)
+from napari_microscopy_metrics._config import AnalysisConfig
+from napari_microscopy_metrics._lazy import isLazyArray
+
+
+# parameters changing the detected beads and their crops
+DETECTION_KEYS = (
+    "detectionMethod",
+    "Sigma",
+    "minDistance",
+    "thresholdMethod",
+    "relThreshold",
+    "TheoreticalBeadSize",
+    "ZRejectionMargin",
+    "cropFactor",
+    "prominenceDoublePass",
+    "thresholdIntensity",
+    "pixelSize",
+)
+# parameters of the metrics computed before the fitting
+PREFITTING_KEYS = (
+    "annulusInnerDistance",
+    "annulusThickness",
+    "MicroscopeType",
+    "numericalAperture",
+    "emissionWavelength",
+    "excitationWavelength",
+    "refractionIndex",
+)
+# parameters which are integers, the values of their ranges are rounded
+INTEGER_KEYS = ("minDistance", "cropFactor")
+# columns of the comparison table, after the swept parameters
+TABLE_COLUMNS = ("beads", "validBeads", "FWHM Z", "FWHM Y", "FWHM X", "R2 Z", "R2 Y", "R2 X", "status", "error")
+# suffix of the comparison table saved next to the image
+SWEEP_SUFFIX = "_sweep.csv"
+
+# image swept by each worker process, loaded once by the pool initializer
+_workerImage = None
+_workerThreads = 1
+_workerRange = None
+
+
+def parseValues(text, key):
+    """Reads the values of a swept parameter, a comma-separated list or a start:stop:step range including stop.
+
+    Args:
+        text (str): The values, e.g. "1, 2, 4" or "1:3:0.5".
+        key (str): The parameter, the values of INTEGER_KEYS are rounded.
+
+    Raises:
+        ValueError: If the text is not a list nor a range of numbers.
+
+    Returns:
+        list: The values, without duplicates, in the given order.
+    """
+    values = []
+    for part in (part.strip() for part in text.split(",")):
+        if not part:
+            continue
+        if ":" in part:
+            bounds = [float(bound) for bound in part.split(":")]
+            if len(bounds) not in (2, 3) or (len(bounds) == 3 and bounds[2] <= 0):
+                raise ValueError(f"Invalid range for {key}: {part}")
+            start, stop = bounds[:2]
+            step = bounds[2] if len(bounds) == 3 else 1.0
+            count = int((stop - start) / step + 1e-9) + 1
+            values.extend(round(start + index * step, 10) for index in range(max(0, count)))
+        else:
+            values.append(float(part))
+    if key in INTEGER_KEYS:
+        values = [int(round(value)) for value in values]
+    return list(dict.fromkeys(values))
+
+
+def expandGrid(config, ranges):
+    """Gives the configurations of every combination of the swept values.
+
+    Args:
+        config (AnalysisConfig): The configuration giving the parameters which are not swept.
+        ranges (dict): The values of each swept parameter, by key of AnalysisConfig.
+
+    Raises:
+        ValueError: If a swept parameter is not a parameter of the analysis, or has no value.
+
+    Returns:
+        list: The configurations, the last swept parameter changing first.
+    """
+    for key, values in ranges.items():
+        if key not in AnalysisConfig.getKeys():
+            raise ValueError(f"Unknown parameter: {key}")
+        if len(values) == 0:
+            raise ValueError(f"No value to sweep for {key}")
+    return [
+        dataclasses.replace(config, **dict(zip(ranges, combination, strict=True)))
+        for combination in itertools.product(*ranges.values())
+    ]
+
+
+def getStageKey(config, keys):
+    """Gives the values of the parameters of a stage, identifying the results shared by several configurations."""
+    return tuple(getattr(config, key) for key in keys)
+
+
+def groupByStage(configs, keys):
+    """Groups the configurations sharing the parameters of a stage, in the order of their first configuration.
+
+    Args:
+        configs (list): The configurations of the sweep.
+        keys (tuple): The parameters of the stage.
+
+    Returns:
+        list: The lists of configurations sharing the same parameters of the stage.
+    """
+    groups = {}
+    for config in configs:
+        groups.setdefault(getStageKey(config, keys), []).append(config)
+    return list(groups.values())
+
+
+def groupByDetection(configs):
+    """Groups the configurations sharing their detection, in the order of their first configuration.
+
+    Args:
+        configs (list): The configurations of the sweep.
+
+    Returns:
+        list: The lists of configurations sharing the same detection parameters.
+    """
+    return groupByStage(configs, DETECTION_KEYS)
+
+
+def getIntensityRange(image):
+    """Gives the intensity range of an image, computed once per sweep rather than by each detection normalizing the image.
+
+    Args:
+        image (array-like): The swept image.
+
+    Returns:
+        tuple: The minimum and maximum intensities, None for lazy images, whose detection normalizes each tile with its own range.
+    """
+    if isLazyArray(image):
+        return None
+    return float(np.min(image)), float(np.max(image))
+
+
+def setIntensityRange(detectionTool, intensityRange):
+    """Makes a detection tool normalize its image with an intensity range given by getIntensityRange, as its setNormalizedImage method does with the range of the image.
+
+    Args:
+        detectionTool (DetectionTool): The detection tool.
+        intensityRange (tuple): The minimum and maximum intensities of the image.
+    """
+    low, high = intensityRange
+
+    def setNormalizedImage():
+        normalizedImage = detectionTool._image.astype(np.float64)
+        normalizedImage -= low
+        normalizedImage /= high - low + 1e-6
+        normalizedImage[normalizedImage < 0] = 0
+        detectionTool._normalizedImage = normalizedImage
+
+    detectionTool.setNormalizedImage = setNormalizedImage
+
+
+def evaluateDetectionGroup(image, configs, threads=1, intensityRange=None):
+    """Evaluates configurations sharing their detection parameters on an image: the beads are detected once,
+    the metrics computed before the fitting once per set of metric parameters, and only the fitting is run for each configuration.
+
+    Args:
+        image (array-like): The image, loaded once for the whole sweep.
+        configs (list): Configurations whose DETECTION_KEYS parameters are the same.
+        threads (int, optional): Number of beads fitted at the same time. Defaults to 1.
+        intensityRange (tuple, optional): Intensity range normalizing the image, see getIntensityRange. Defaults to None.
+
+    Returns:
+        list: The measures of each configuration, as (config, measures) pairs in the order of configs.
+    """
+    rows, imageAnalyzer, stages = prepareDetectionGroup(image, configs, intensityRange)
+    for stageConfigs, prefitted in stages:
+        rows.extend((config, fitBeads(imageAnalyzer, config, prefitted, threads)) for config in stageConfigs)
+    order = {id(config): index for index, config in enumerate(configs)}
+    return sorted(rows, key=lambda row: order[id(row[0])])
+
+
+def prepareDetectionGroup(image, configs, intensityRange=None):
+    """Detects the beads of configurations sharing their detection parameters, and computes the metrics run before the fitting once per set of metric parameters,
+    so that each configuration is then evaluated by fitBeads alone.
+
+    Args:
+        image (array-like): The image, loaded once for the whole sweep.
+        configs (list): Configurations whose DETECTION_KEYS parameters are the same.
+        intensityRange (tuple, optional): Intensity range normalizing the image, see getIntensityRange. Defaults to None.
+
+    Returns:
+        tuple: The (config, measures) pairs of the configurations whose detection or metrics failed, the ImageAnalyzer holding the detected beads,
+            and the fitting stages, each one the list of configurations sharing their metric parameters with the rejections of the beads after these metrics.
+    """
+    try:
+        detection = createDetection(image, configs[0])
+        if intensityRange is not None:
+            setIntensityRange(detection._detectionTool, intensityRange)
+        for _ in detection.run(None, cropPsf=False):
+            pass
+    except Exception as error:  # noqa: BLE001 - a failed detection fails the configurations of its group only, the sweep goes on
+        return [(config, getFailure(error)) for config in configs], None, []
+    imageAnalyzer = detection._imageAnalyzer
+    beads = imageAnalyzer._beadAnalyzer
+    detected = getRejections(beads)
+    failures = []
+    stages = []
+    for prefittingConfigs in groupByStage(configs, PREFITTING_KEYS):
+        # the metrics computed before the fitting start again from the beads of the detection
+        setRejections(beads, detected)
+        try:
+            if any(not bead._rejected for bead in beads):
+                for _ in createMetrics(imageAnalyzer, prefittingConfigs[0]).runPrefittingMetrics():
+                    pass
+        except Exception as error:  # noqa: BLE001 - failed metrics fail the configurations sharing them only, the sweep goes on
+            failures.extend((config, getFailure(error)) for config in prefittingConfigs)
+            continue
+        stages.append((prefittingConfigs, getRejections(beads)))
+    # the fitting reads the crops of the beads only, the image is not sent with them to other processes
+    imageAnalyzer._image = None
+    return failures, imageAnalyzer, stages
+
+
+def fitBeads(imageAnalyzer, config, prefitted, threads=1):
+    """Fits the beads of a detection with the fitting parameters of a configuration, after restoring the rejections made before the fitting.
+
+    Args:
+        imageAnalyzer (ImageAnalyzer): The detected beads, with the metrics computed before the fitting.
+        config (AnalysisConfig): The configuration giving the fitting parameters.
+        prefitted (list): The (rejected, rejectionDesc) of each bead before the fitting.
+        threads (int, optional): Number of beads fitted at the same time. Defaults to 1.
+
+    Returns:
+        dict: The measures of the configuration, see TABLE_COLUMNS.
+    """
+    beads = imageAnalyzer._beadAnalyzer
+    setRejections(beads, prefitted)
+    for bead in beads:
+        bead._fitTool = None
+    imageAnalyzer._meanDetermination = [0.0, 0.0, 0.0]
+    imageAnalyzer._meanFWHM = [0.0, 0.0, 0.0]
+    imageAnalyzer._meanUncertainty = [0.0, 0.0, 0.0]
+    measures = {"beads": len(beads), "validBeads": 0, "status": "done", "error": ""}
+    try:
+        if any(not bead._rejected and bead._roi is not None for bead in beads):
+            createFitting(imageAnalyzer, config, threads).computeFitting()
+    except Exception as error:  # noqa: BLE001 - a failed fitting fails its configuration only, the sweep goes on
+        return dict(getFailure(error), beads=len(beads))
+    measures["validBeads"] = len([bead for bead in beads if not bead._rejected and bead._roi is not None])
+    if measures["validBeads"] == 0:
+        measures["status"] = "no beads"
+        return measures
+    for axis, name in enumerate("ZYX"):
+        measures[f"FWHM {name}"] = float(imageAnalyzer._meanFWHM[axis])
+        measures[f"R2 {name}"] = float(imageAnalyzer._meanDetermination[axis])
+    return measures
+
+
+def getRejections(beads):
+    """Gives the (rejected, rejectionDesc) of each bead, the state changed by the metrics and the fitting."""
+    return [(bead._rejected, bead._rejectionDesc) for bead in beads]
+
+
+def setRejections(beads, rejections):
+    """Restores the rejections given by getRejections."""
+    for bead, (rejected, rejectionDesc) in zip(beads, rejections, strict=True):
+        bead._rejected, bead._rejectionDesc = rejected, rejectionDesc
+
+
+def getFailure(error):
+    """Gives the measures of a configuration whose evaluation failed."""
+    return {"beads": 0, "validBeads": 0, "status": "failed", "error": f"{type(error).__name__}: {error}"}
+
+
+def _initWorker(path, threads):
+    """Loads the swept image once per worker process."""
+    global _workerImage, _workerThreads, _workerRange
+    _workerImage = loadImage(path)
+    _workerThreads = threads
+    _workerRange = getIntensityRange(_workerImage)
+
+
+def _evaluateInWorker(configs):
+    return evaluateDetectionGroup(_workerImage, configs, _workerThreads, _workerRange)
+
+
+def _prepareInWorker(configs):
+    return prepareDetectionGroup(_workerImage, configs, _workerRange)
+
+
+def _fitInWorker(imageAnalyzer, config, prefitted):
+    return [(config, fitBeads(imageAnalyzer, config, prefitted, _workerThreads))]
+
+
+def runSweepEvents(image, config, ranges, workers=1, cancellation=None):
+    """Evaluates every combination of the swept values on an image, the combinations sharing their detection being evaluated together, see evaluateDetectionGroup.
+    The combinations are evaluated in parallel processes when several workers are requested and the image is a file, each worker loading the image once.
+    The groups holding more combinations than the share of a worker have their beads detected by one worker and their fits spread over all of them.
+
+    Args:
+        image (str or array-like): Path of the image, or the image itself, which is then swept in the calling process.
+        config (AnalysisConfig): The configuration giving the parameters which are not swept.
+        ranges (dict): The values of each swept parameter, by key of AnalysisConfig.
+        workers (int, optional): Number of processes evaluating combinations at the same time. Defaults to 1.
+        cancellation (BatchCancellation, optional): Token stopping the sweep before the next combinations. Defaults to None.
+
+    Yields:
+        dict: A "finished" event for each group of combinations evaluated, holding the "rows" of the comparison table of the group,
+            the number of combinations "done" so far and their "total".
+    """
+    config = AnalysisConfig.fromParameters(config)
+    groups = groupByDetection(expandGrid(config, ranges))
+    total = sum(len(group) for group in groups)
+    done = 0
+    if workers <= 1 or total <= 1 or not isinstance(image, str):
+        image = loadImage(image) if isinstance(image, str) else image
+        intensityRange = getIntensityRange(image)
+        for group in groups:
+            if cancellation is not None and cancellation.stopRequested:
+                return
+            rows = [getRow(config, measures, ranges) for config, measures in evaluateDetectionGroup(image, group, getThreads(1), intensityRange)]
+            done += len(rows)
+            yield {"event": "finished", "rows": rows, "done": done, "total": total}
+        return
+    workers = min(workers, total)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        # processes are spawned rather than forked, forking a process running Qt is unsafe
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_initWorker,
+        initargs=(image, getThreads(workers)),
+    ) as executor:
+        # the fits of a group larger than the share of a worker are spread over the workers once its beads are detected
+        pending = {executor.submit(_prepareInWorker if len(group) > total / workers else _evaluateInWorker, group) for group in groups}
+        try:
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    results = future.result()
+                    if isinstance(results, tuple):
+                        # a prepared group gives the configurations which failed, its fits are submitted
+                        results, imageAnalyzer, stages = results
+                        for stageConfigs, prefitted in stages:
+                            pending.update(executor.submit(_fitInWorker, imageAnalyzer, config, prefitted) for config in stageConfigs)
+                    if not results:
+                        continue
+                    rows = [getRow(config, measures, ranges) for config, measures in results]
+                    done += len(rows)
+                    yield {"event": "finished", "rows": rows, "done": done, "total": total}
+                if cancellation is not None and cancellation.stopRequested:
+                    return
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def getRow(config, measures, ranges):
+    """Gives the row of the comparison table of a combination, its swept values followed by its measures."""
+    row = {key: getattr(config, key) for key in ranges}
+    row.update({column: measures.get(column, "") for column in TABLE_COLUMNS})
+    return row
+
+
+def runSweep(image, config, ranges, workers=1):
+    """Evaluates every combination of the swept values on an image, as runSweepEvents does.
+
+    Args:
+        image (str or array-like): Path of the image, or the image itself.
+        config (AnalysisConfig): The configuration giving the parameters which are not swept.
+        ranges (dict): The values of each swept parameter, by key of AnalysisConfig.
+        workers (int, optional): Number of groups of combinations evaluated at the same time. Defaults to 1.
+
+    Returns:
+        list: The rows of the comparison table, in the order of the grid.
+    """
+    rows = [row for event in runSweepEvents(image, config, ranges, workers) for row in event["rows"]]
+    keys = list(ranges)
+    order = {combination: index for index, combination in enumerate(itertools.product(*ranges.values()))}
+    return sorted(rows, key=lambda row: order[tuple(row[key] for key in keys)])
+
+
+def saveSweepTable(path, rows):
+    """Saves the comparison table of a sweep in a CSV file.
+
+    Args:
+        path (str): Path of the CSV file.
+        rows (list): The rows given by runSweep.
+    """
+    columns = list(rows[0]) if rows else list(TABLE_COLUMNS)
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def getSweepTablePath(path):
+    """Gives the path of the comparison table of the sweep of an image, next to the image."""
+    return getOutputDir(path)[: -len(RESULT_SUFFIX)] + SWEEP_SUFFIX
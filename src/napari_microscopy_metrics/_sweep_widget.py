@@ -0,0 +1,214 @@
+import os
+import napari
+from napari.qt.threading import create_worker
+
+from napari.utils.notifications import show_info
+from qtpy.QtWidgets import (
+    QPushButton,
+    QWidget,
+    QVBoxLayout,
+    QLabel,
+    QGroupBox,
+    QHBoxLayout,
+    QSpinBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
+    QAbstractItemView,
+    QLineEdit,
+    QGridLayout,
+)
+
+from napari_microscopy_metrics._batch import BatchCancellation, canLoadImage
+from napari_microscopy_metrics._lazy import layerData
+from napari_microscopy_metrics._sweep import TABLE_COLUMNS, getSweepTablePath, parseValues, runSweepEvents, saveSweepTable
+
+
+class SweepWidget(QWidget):
+    """A widget evaluating a grid of parameter values on the selected image and comparing the beads found and measured by each combination.
+
+    Attributes:
+        viewer (napari.viewer.Viewer): The napari viewer instance.
+        _parent (Microscopy_Metrics_QWidget): The main widget, giving the parameters which are not swept.
+        worker (napari.qt.threading.Worker): The worker running the sweep.
+        cancellation (BatchCancellation): Token set by the Stop button.
+        rows (list): The rows of the comparison table received so far.
+        imagePath (str): Path of the swept image, None if it is not a file which loadImage can open.
+    """
+
+    # parameters which can be swept, by label
+    SWEPT_PARAMETERS = {
+        "Sigma": "Sigma",
+        "Min dist": "minDistance",
+        "Threshold (0-1)": "relThreshold",
+        "Crop factor": "cropFactor",
+        "Fit prominence (0-1)": "prominenceRel",
+        "Threshold R2": "thresholdRSquared",
+    }
+
+    def __init__(self, viewer: "napari.viewer.Viewer", parent=None):
+        super().__init__()
+        self.viewer = viewer
+        self._parent = parent
+        self.worker = None
+        self.cancellation = None
+        self.rows = []
+        self.imagePath = None
+        self.valueEdits = {}
+        self._init_ui()
+
+    def _init_ui(self):
+        """Initialize the widget UI."""
+        main_layout = QVBoxLayout()
+        main_layout.setContentsMargins(10, 10, 10, 10)
+        main_layout.setSpacing(10)
+
+        self.description_label = QLabel(
+            "Evaluates every combination of the values below on the selected image, the other parameters being those of the plugin interface. "
+            "Values are comma-separated, or ranges written start:stop:step. Empty parameters are not swept. "
+            "The beads are detected once per set of detection parameters and shared by all the fitting parameters."
+        )
+        self.description_label.setWordWrap(True)
+        main_layout.addWidget(self.description_label)
+
+        values_group = QGroupBox("Swept parameters")
+        values_layout = QGridLayout()
+        for row, label in enumerate(self.SWEPT_PARAMETERS):
+            values_layout.addWidget(QLabel(label), row, 0)
+            edit = QLineEdit()
+            edit.setPlaceholderText("e.g. 1, 2, 4 or 1:3:0.5")
+            values_layout.addWidget(edit, row, 1)
+            self.valueEdits[label] = edit
+        values_group.setLayout(values_layout)
+        main_layout.addWidget(values_group)
+
+        action_layout = QHBoxLayout()
+        action_layout.addWidget(QLabel("Parallel workers"))
+        self.workers_spinbox = QSpinBox()
+        self.workers_spinbox.setRange(1, os.cpu_count() or 1)
+        self.workers_spinbox.setValue(min(4, os.cpu_count() or 1))
+        self.workers_spinbox.setToolTip(
+            "Number of processes evaluating the combinations, the beads of each set of detection parameters being detected by one of them.\n"
+            "Images which are not files are swept in a single worker."
+        )
+        action_layout.addWidget(self.workers_spinbox)
+        self.run_sweep_button = QPushButton("Run Sweep")
+        self.run_sweep_button.clicked.connect(self._run_sweep)
+        action_layout.addWidget(self.run_sweep_button)
+        self.stop_sweep_button = QPushButton("Stop")
+        self.stop_sweep_button.setToolTip("Stop the sweep once the combinations being evaluated are finished.")
+        self.stop_sweep_button.setEnabled(False)
+        self.stop_sweep_button.clicked.connect(self._stop_sweep)
+        action_layout.addWidget(self.stop_sweep_button)
+        main_layout.addLayout(action_layout)
+
+        results_group = QGroupBox("Comparison")
+        results_layout = QVBoxLayout()
+        self.progress_label = QLabel("No sweep running")
+        self.progress_label.setWordWrap(True)
+        results_layout.addWidget(self.progress_label)
+        self.results_table = QTableWidget(0, 0)
+        self.results_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.results_table.verticalHeader().setVisible(False)
+        self.results_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.results_table.setSortingEnabled(True)
+        results_layout.addWidget(self.results_table)
+        results_group.setLayout(results_layout)
+        main_layout.addWidget(results_group)
+
+        self.setLayout(main_layout)
+
+    def getRanges(self):
+        """Give the values of the swept parameters entered by the user.
+
+        Raises:
+            ValueError: If values cannot be read.
+
+        Returns:
+            dict: The values of each swept parameter, by key of AnalysisConfig.
+        """
+        ranges = {}
+        for label, key in self.SWEPT_PARAMETERS.items():
+            text = self.valueEdits[label].text().strip()
+            if text:
+                ranges[key] = parseValues(text, key)
+        return ranges
+
+    def _run_sweep(self):
+        """Start the sweep on the selected image."""
+        layer = self.viewer.layers.selection.active
+        if layer is None or not isinstance(layer, napari.layers.Image):
+            show_info("Please, select a valid layer of type Image")
+            return
+        try:
+            ranges = self.getRanges()
+        except ValueError as error:
+            show_info(f"Invalid values: {error}")
+            return
+        if not ranges:
+            show_info("No parameter to sweep.")
+            return
+        path = getattr(layer.source, "path", None)
+        self.imagePath = path if path and canLoadImage(path) else None
+        # files are loaded once by each worker process, other images, or files opened by another reader, are swept in this process
+        image = self.imagePath if self.imagePath is not None else layerData(layer)
+        config = self._parent.getAnalysisConfig()
+        self.rows = []
+        self.results_table.setSortingEnabled(False)
+        self.results_table.setRowCount(0)
+        self.results_table.setColumnCount(len(ranges) + len(TABLE_COLUMNS))
+        self.results_table.setHorizontalHeaderLabels(list(ranges) + list(TABLE_COLUMNS))
+        self.cancellation = BatchCancellation()
+        self.run_sweep_button.setEnabled(False)
+        self.stop_sweep_button.setEnabled(True)
+        self.worker = create_worker(
+            runSweepEvents,
+            image,
+            config,
+            ranges,
+            self.workers_spinbox.value(),
+            self.cancellation,
+            _progress={"desc": "Sweeping parameters..."},
+        )
+        self.worker.yielded.connect(self.onSweepEvent)
+        self.worker.finished.connect(self.sweepFinished)
+        self.worker.errored.connect(self.sweepError)
+        self.worker.start()
+
+    def _stop_sweep(self):
+        """Stop the sweep after the combinations being evaluated."""
+        if self.cancellation is not None:
+            self.cancellation.stop()
+            self.stop_sweep_button.setEnabled(False)
+
+    def onSweepEvent(self, event):
+        """Add the rows of the combinations evaluated to the comparison table."""
+        for row in event["rows"]:
+            self.rows.append(row)
+            index = self.results_table.rowCount()
+            self.results_table.insertRow(index)
+            for column, value in enumerate(row.values()):
+                text = f"{value:.4g}" if isinstance(value, float) else str(value)
+                self.results_table.setItem(index, column, QTableWidgetItem(text))
+        self.progress_label.setText(f"{event['done']}/{event['total']} combinations evaluated")
+
+    def resetButtons(self):
+        """Enable the Run button and disable the Stop button once the sweep is over."""
+        self.results_table.setSortingEnabled(True)
+        self.run_sweep_button.setEnabled(True)
+        self.stop_sweep_button.setEnabled(False)
+
+    def sweepFinished(self):
+        """Save the comparison table next to the swept image."""
+        self.resetButtons()
+        if self.imagePath is None or not self.rows:
+            show_info("Parameter sweep finished.")
+            return
+        tablePath = getSweepTablePath(self.imagePath)
+        saveSweepTable(tablePath, self.rows)
+        show_info(f"Parameter sweep finished, comparison saved to: {tablePath}")
+
+    def sweepError(self, error):
+        """Handle errors during the sweep."""
+        self.resetButtons()
+        show_info(f"Parameter sweep error: {error}")
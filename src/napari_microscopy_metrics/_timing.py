@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import inspect
+import functools
+import contextlib
+
+
+# name of the timing report written in the result folder of each image
+TIMING_FILE_NAME = "analysis_timing.json"
+
+
+def getFolderSize(path):
+    """Gives the total size of the files of a folder.
+
+    Args:
+        path (str): Path of the folder.
+
+    Returns:
+        int: The size in bytes, 0 if the folder does not exist.
+    """
+    size = 0
+    for folder, _, names in os.walk(path):
+        for name in names:
+            with contextlib.suppress(OSError):
+                size += os.stat(os.path.join(folder, name)).st_size
+    return size
+
+
+class StageTimer(object):
+    """Times the stages of the analysis of an image, with the number of beads entering each stage and the bytes the run wrote in the result folder,
+    so that the slow stages of a run can be found from its timing report.
+
+    Attributes:
+        outputDir (str): The result folder whose growth is measured, None to skip the measure.
+        stages (list): The finished stages, each one a dict with its name, duration in seconds, beads entering it and beads per second.
+        _start (float): Time at which the timer was created.
+        _initialBytes (int): Size of the result folder when the first stage writing in it started, None before.
+        _outputBytes (int): Bytes written in the result folder by the run, None until measured by getOutputBytes.
+    """
+
+    def __init__(self, outputDir=None):
+        self.outputDir = outputDir
+        self.stages = []
+        self._start = time.perf_counter()
+        self._initialBytes = None
+        self._outputBytes = None
+
+    @contextlib.contextmanager
+    def stage(self, name, beads=None):
+        """Times the block as a stage; the stage is recorded even if the block fails.
+
+        Args:
+            name (str): Name of the stage.
+            beads (int or callable, optional): Number of beads entering the stage, or a function giving it, called when the stage starts.
+                Defaults to None, for stages without beads entering them such as the detection.
+        """
+        if self.outputDir is not None and self._initialBytes is None:
+            # the result folder is measured once before the stages writing in it, and once when the report is built
+            self._initialBytes = getFolderSize(self.outputDir)
+        try:
+            count = beads() if callable(beads) else beads
+        except (AttributeError, TypeError):
+            # the function reads results which are not built yet
+            count = None
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            duration = time.perf_counter() - start
+            self.stages.append(
+                {
+                    "stage": name,
+                    "seconds": duration,
+                    "beads": count,
+                    "beadsPerSecond": count / duration if count and duration > 0 else None,
+                }
+            )
+
+    def wrap(self, name, function, beads=None):
+        """Gives a function running another one as a stage, for the functions run by workers.
+
+        Args:
+            name (str): Name of the stage.
+            function (callable): The function, a generator function stays a generator function.
+            beads (int or callable, optional): Number of beads entering the stage, see stage. Defaults to None.
+
+        Returns:
+            callable: The timed function.
+        """
+        if inspect.isgeneratorfunction(function):
+
+            @functools.wraps(function)
+            def timedGenerator(*args, **kwargs):
+                with self.stage(name, beads):
+                    return (yield from function(*args, **kwargs))
+
+            return timedGenerator
+
+        @functools.wraps(function)
+        def timedFunction(*args, **kwargs):
+            with self.stage(name, beads):
+                return function(*args, **kwargs)
+
+        return timedFunction
+
+    def getOutputBytes(self):
+        """Gives the bytes written in the result folder by the run, measured the first time it is asked, once the stages are over.
+
+        Returns:
+            int: The growth of the result folder, None if no stage ran with a result folder.
+        """
+        if self._outputBytes is None and self._initialBytes is not None:
+            self._outputBytes = max(0, getFolderSize(self.outputDir) - self._initialBytes)
+        return self._outputBytes
+
+    def toDict(self):
+        """Gives the timing report of the run.
+
+        Returns:
+            dict: The stages, the total duration since the timer was created and the total bytes written.
+        """
+        return {
+            "stages": self.stages,
+            "totalSeconds": time.perf_counter() - self._start,
+            "outputBytes": self.getOutputBytes(),
+        }
+
+    def save(self, outputDir=None):
+        """Writes the timing report in a JSON file of the result folder.
+
+        Args:
+            outputDir (str, optional): The result folder. Defaults to outputDir.
+
+        Returns:
+            str: Path of the report.
+        """
+        path = os.path.join(outputDir or self.outputDir, TIMING_FILE_NAME)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.toDict(), file, indent=4)
+        return path
+
+    def formatSummary(self):
+        """Gives a line per stage with its duration and beads per second, the slowest stage first, after the total duration and output size.
+
+        Returns:
+            str: The summary.
+        """
+        report = self.toDict()
+        lines = [f"Total: {report['totalSeconds']:.1f} s, {(report['outputBytes'] or 0) / 2**20:.1f} MiB written"]
+        for stage in sorted(self.stages, key=lambda stage: stage["seconds"], reverse=True):
+            line = f"{stage['stage']}: {stage['seconds']:.2f} s"
+            if stage["beadsPerSecond"] is not None:
+                line += f", {stage['beads']} beads, {stage['beadsPerSecond']:.1f} beads/s"
+            lines.append(line)
+        return "\n".join(lines)
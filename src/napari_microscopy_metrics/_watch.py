@@ -0,0 +1,183 @@
+import os
+import json
+import time
+
+from napari_microscopy_metrics._batch import (
+    FINISHED_STATUSES,
+    BatchManifest,
+    getImageSignature,
+    hashParameters,
+    listImages,
+    runBatchEvents,
+)
+
+
+# seconds between two scans of the watched folder
+WATCH_INTERVAL = 5.0
+# seconds during which the size and modification time of an image must not change before it is analysed
+SETTLE_TIME = 30.0
+
+
+class WatchQueue(object):
+    """Persistent queue of the images of a watched folder waiting to be analysed.
+    The queue is saved at each change, so that the images already noticed are analysed after a restart without waiting for them to settle again.
+
+    Attributes:
+        _path (str): Path of the queue file.
+        _paths (list): The queued images, in the order they were noticed.
+    """
+
+    fileName = "batch_queue.json"
+
+    def __init__(self, path):
+        self._path = path
+        self._paths = []
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as file:
+                self._paths = json.load(file)["paths"]
+
+    @property
+    def paths(self):
+        """list: The queued images."""
+        return list(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __contains__(self, path):
+        return os.path.abspath(path) in self._paths
+
+    def save(self):
+        """Writes the queue, replacing the file at once so that it is never left half written."""
+        temporaryPath = self._path + ".tmp"
+        with open(temporaryPath, "w", encoding="utf-8") as file:
+            json.dump({"paths": self._paths}, file, indent=4)
+        os.replace(temporaryPath, self._path)
+
+    def push(self, path):
+        """Adds an image at the end of the queue, if it is not queued yet.
+
+        Args:
+            path (str): Path of the image.
+        """
+        if path not in self:
+            self._paths.append(os.path.abspath(path))
+            self.save()
+
+    def remove(self, path):
+        """Removes an image from the queue once it is analysed.
+
+        Args:
+            path (str): Path of the image.
+        """
+        if path in self:
+            self._paths.remove(os.path.abspath(path))
+            self.save()
+
+
+class FolderWatcher(object):
+    """Finds the new and modified images of a folder, waiting for the files being written to settle before queueing them.
+
+    Attributes:
+        _folder (str): The watched folder.
+        _manifest (BatchManifest): Manifest of the folder, telling which images were already analysed.
+        _queue (WatchQueue): Queue in which the settled images are added.
+        _settleTime (float): Seconds during which an image must not change before it is queued.
+        _candidates (dict): For each image waiting to settle, its last signature and the time it was first seen with it.
+    """
+
+    def __init__(self, folder, manifest, queue, settleTime=SETTLE_TIME):
+        self._folder = folder
+        self._manifest = manifest
+        self._queue = queue
+        self._settleTime = settleTime
+        self._candidates = {}
+
+    def poll(self, parameterHash, now=None):
+        """Scans the folder once and queues the images which settled.
+        Images already analysed with the same parameters are ignored unless they were modified, failed ones included so that they are not retried forever.
+
+        Args:
+            parameterHash (str): Hash of the parameters of the batch.
+            now (float, optional): Current time, as given by time.monotonic. Defaults to now.
+
+        Returns:
+            list: Paths of the images queued by this scan.
+        """
+        now = time.monotonic() if now is None else now
+        queued = []
+        for path in listImages(self._folder):
+            path = os.path.abspath(path)
+            if path in self._queue or self._manifest.isRecorded(path, parameterHash, FINISHED_STATUSES + ("failed",)):
+                self._candidates.pop(path, None)
+                continue
+            try:
+                signature = getImageSignature(path)
+            except OSError:
+                # removed or renamed between the listing and now
+                continue
+            candidate = self._candidates.get(path)
+            if candidate is None or candidate[0] != signature:
+                self._candidates[path] = (signature, now)
+                continue
+            if now - candidate[1] >= self._settleTime:
+                del self._candidates[path]
+                self._queue.push(path)
+                queued.append(path)
+        return queued
+
+
+def watchFolder(
+    folder,
+    parameters,
+    workers=1,
+    outputRoot=None,
+    cancellation=None,
+    interval=WATCH_INTERVAL,
+    settleTime=SETTLE_TIME,
+    memoryBudget=None,
+):
+    """Watches a folder and analyses its new and modified images, until the batch is stopped.
+    The images left in the queue by a previous watch are analysed first.
+
+    Args:
+        folder (str): The watched folder.
+        parameters (dict): The batch parameters.
+        workers (int, optional): Number of images analysed at the same time. Defaults to 1.
+        outputRoot (str, optional): Folder in which the result folders are created. Defaults to the watched folder.
+        cancellation (BatchCancellation, optional): Token stopping the watch. Defaults to None, watching forever.
+        interval (float, optional): Seconds between two scans of the folder. Defaults to WATCH_INTERVAL.
+        settleTime (float, optional): Seconds during which an image must not change before it is analysed. Defaults to SETTLE_TIME.
+        memoryBudget (int, optional): Memory in bytes the parallel workers may use together. Defaults to a part of the available memory.
+
+    Yields:
+        dict: A "queued" event for each image added to the queue, then the events of runBatchEvents for its analysis.
+    """
+    manifest = BatchManifest(os.path.join(folder, BatchManifest.fileName))
+    queue = WatchQueue(os.path.join(folder, WatchQueue.fileName))
+    watcher = FolderWatcher(folder, manifest, queue, settleTime)
+    parameterHash = hashParameters(parameters)
+    for path in queue.paths:
+        yield {"event": "queued", "path": path}
+    while cancellation is None or not cancellation.stopRequested:
+        for path in watcher.poll(parameterHash):
+            yield {"event": "queued", "path": path}
+        if len(queue) > 0:
+            for event in runBatchEvents(
+                queue.paths,
+                parameters,
+                workers,
+                outputRoot,
+                manifest=manifest,
+                resume=False,
+                cancellation=cancellation,
+                memoryBudget=memoryBudget,
+            ):
+                # cancelled images stay in the queue for the next watch
+                if event["event"] == "finished" and event["result"]["status"] != "cancelled":
+                    queue.remove(event["path"])
+                yield event
+            continue
+        deadline = time.monotonic() + interval
+        while time.monotonic() < deadline and not (cancellation is not None and cancellation.stopRequested):
+            time.sleep(min(0.5, interval))
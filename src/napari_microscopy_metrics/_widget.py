@@ -12,24 +12,53 @@ from qtpy.QtWidgets import (
     QPushButton,
     QSizePolicy,
     QTabWidget,
+    QLabel,
 )
 from napari.utils.notifications import show_info, show_warning, show_error
 
-from microscopy_metrics.fitting import Fitting
-from microscopy_metrics.metrics import Metrics
-from microscopy_metrics.detection import Detection
-from microscopy_metrics.report_generator import ReportGenerator
-from microscopy_metrics.thresholdTools.threshold_tool import Threshold
-from microscopy_metrics.scripts.PSFGenerator.PSF import PSFGenerator,PSFWithComaticAberration,PSFWithAstigmatismAberration,PSFWithSphericalAberration
-from microscopy_metrics.detectionTools.detection_tool import DetectionTool
-from microscopy_metrics.resolutionTools.theoretical_resolution import TheoreticalResolution
-
-from napari_microscopy_metrics._metrics_widget import Metricstoolpage
-from napari_microscopy_metrics._detection_tool_widget import DetectionToolTab
+# the other pages and the analysis are imported when their tab is built or an analysis is run, opening the plugin only builds the acquisition page
 from napari_microscopy_metrics._acquisition_widget import AcquisitionToolPage
-from napari_microscopy_metrics._report_widget import ReportToolPage
-from napari_microscopy_metrics._batch_widget import BatchWidget
-from microscopy_metrics.BatchAnalyzer import BatchAnalyzer
+from napari_microscopy_metrics._config import CONFIG_FILE_NAME, AnalysisConfig
+from napari_microscopy_metrics._timing import StageTimer
+
+
+class LazyTab(QWidget):
+    """A tab whose page is only built when it is first shown or used, so that opening the plugin does not build the pages nor load their options.
+
+    Attributes:
+        factory (callable): Function building the page.
+        _page (QWidget): The page, None until it is built.
+    """
+
+    def __init__(self, factory):
+        super().__init__()
+        self.factory = factory
+        self._page = None
+        self.setLayout(QVBoxLayout())
+        self.layout().setContentsMargins(0, 0, 0, 0)
+        self.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Minimum)
+
+    @property
+    def isBuilt(self):
+        """bool: Whether the page was built."""
+        return self._page is not None
+
+    def build(self):
+        """Builds the page if it was not built yet.
+
+        Returns:
+            QWidget: The page.
+        """
+        if self._page is None:
+            self._page = self.factory()
+            self._page.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Minimum)
+            self.layout().addWidget(self._page)
+        return self._page
+
+    @property
+    def page(self):
+        """QWidget: The page, built on first access."""
+        return self.build()
 
 
 class Microscopy_Metrics_QWidget(QWidget):
@@ -37,10 +66,10 @@ class Microscopy_Metrics_QWidget(QWidget):
     
     Attributes:
         viewer (napari.viewer.Viewer): The environment where the widget will be displayed.
-        DetectionTool (Detection): An instance of the Detection class for PSF detection.
-        MetricTool (Metrics): An instance of the Metrics class for metrics calculation.
-        FittingTool (Fitting): An instance of the Fitting class for fitting process.
-        reportGenerator (ReportGenerator): An instance of the ReportGenerator class for generating reports.
+        DetectionTool (ChunkedDetection): An instance of the ChunkedDetection class for PSF detection, on in-memory or lazy images, None until an analysis is run.
+        MetricTool (Metrics): An instance of the Metrics class for metrics calculation, None until an analysis is run.
+        FittingTool (Fitting): An instance of the Fitting class for fitting process, None until an analysis is run.
+        reportGenerator (ReportGenerator): An instance of the ReportGenerator class for generating reports, None until an analysis is run.
         centroidsLayer (napari.layers.Points): A napari layer to display detected centroids.
         roisLayer (napari.layers.Shapes): A napari layer to display regions of interest.
         workingLayer (napari.layers.Image): The currently selected image layer in the viewer.
@@ -48,15 +77,20 @@ class Microscopy_Metrics_QWidget(QWidget):
         selectedShape (int): The index of the currently selected shape in the roisLayer.
         isRunning (bool): A flag indicating whether the analysis is currently running.
         worker (napari.qt.threading.Worker): A worker for running the analysis in a separate thread.
+        psfWorker (napari.qt.threading.Worker): A worker for generating random PSFs without freezing the viewer.
+        config (AnalysisConfig): The configuration of the current run, read from the widgets when it starts.
+        timer (StageTimer): The duration of each stage of the current run.
+        timingLabel (QLabel): A label summarising the duration of the stages of the last run.
     """
 
     def __init__(self, viewer: "napari.viewer.Viewer"):
         super().__init__()
         self.viewer = viewer
-        self.DetectionTool = Detection()
-        self.MetricTool = Metrics()
-        self.FittingTool = Fitting()
-        self.reportGenerator = ReportGenerator()
+        # the tools are created by each run, see createDetectionTools
+        self.DetectionTool = None
+        self.MetricTool = None
+        self.FittingTool = None
+        self.reportGenerator = None
 
         self.centroidsLayer = None
         self.roisLayer = None
@@ -65,6 +99,9 @@ class Microscopy_Metrics_QWidget(QWidget):
         self.selectedShape = 0
         self.isRunning = False
         self.worker = None
+        self.psfWorker = None
+        self.config = None
+        self.timer = None
         self.init_ui()
 
     def init_ui(self):
@@ -73,42 +110,23 @@ class Microscopy_Metrics_QWidget(QWidget):
         self.tab = QTabWidget()
         self.tab.setSizePolicy(QSizePolicy.Minimum, QSizePolicy.Minimum)
         self.tab.setDocumentMode(True)
-        self.acquisitionToolPage = AcquisitionToolPage(self.viewer)
-        self.acquisitionToolPage.pixelSizeWidget.signal.scaleUpdate.connect(
-            self.updateScaleDetection
-        )
-        self.acquisitionToolPage.setSizePolicy(
-            QSizePolicy.Minimum, QSizePolicy.Minimum
-        )
-        self.tab.addTab(self.acquisitionToolPage, "Acquisition parameters")
-        self.detectionToolPage = DetectionToolTab(self.viewer)
-        self.detectionToolPage.detectionTool._pixelSize = [
-            self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size Z"),
-            self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size Y"),
-            self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size X"),
-        ]
-        self.detectionToolPage.setSizePolicy(
-            QSizePolicy.Minimum, QSizePolicy.Minimum
-        )
-        self.tab.addTab(self.detectionToolPage, "Detection parameters")
-        self.metricsToolPage = Metricstoolpage(self.viewer)
-        self.metricsToolPage.setSizePolicy(
-            QSizePolicy.Minimum, QSizePolicy.Minimum
-        )
-        self.metricsToolPage.spacing = [
-            self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size Z"),
-            self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size Y"),
-            self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size X"),
-        ]
-        self.tab.addTab(self.metricsToolPage, "Fitting parameters")
-
-        self.reportToolPage = ReportToolPage(self.viewer)
-        self.reportToolPage.setSizePolicy(
-            QSizePolicy.Minimum, QSizePolicy.Minimum
-        )
-        self.tab.addTab(self.reportToolPage, "Report parameters")
-        self.batchWidget = BatchWidget(self.viewer, parent=self)
-        self.tab.addTab(self.batchWidget, "Batch processing")
+        # pages are built when their tab is first shown, or when the analysis reads their parameters
+        self.tabs = {
+            "acquisition": LazyTab(self.createAcquisitionPage),
+            "detection": LazyTab(self.createDetectionPage),
+            "metrics": LazyTab(self.createMetricsPage),
+            "report": LazyTab(self.createReportPage),
+            "batch": LazyTab(self.createBatchPage),
+            "sweep": LazyTab(self.createSweepPage),
+        }
+        self.tab.addTab(self.tabs["acquisition"], "Acquisition parameters")
+        self.tab.addTab(self.tabs["detection"], "Detection parameters")
+        self.tab.addTab(self.tabs["metrics"], "Fitting parameters")
+        self.tab.addTab(self.tabs["report"], "Report parameters")
+        self.tab.addTab(self.tabs["batch"], "Batch processing")
+        self.tab.addTab(self.tabs["sweep"], "Parameter sweep")
+        self.tab.currentChanged.connect(self.onTabChanged)
+        self.onTabChanged(self.tab.currentIndex())
         self.runButton = QPushButton("Run analysis")
         self.runButton.setStyleSheet(
             """
@@ -170,6 +188,9 @@ class Microscopy_Metrics_QWidget(QWidget):
             }
             """
         )
+        self.timingLabel = QLabel("No analysis run yet.")
+        self.timingLabel.setWordWrap(True)
+        self.timingLabel.setToolTip("Duration of the stages of the last analysis, the slowest first")
         self.setLayout(QVBoxLayout())
         self.layout().setContentsMargins(0, 0, 0, 0)
         self.layout().setSpacing(5)
@@ -177,6 +198,7 @@ class Microscopy_Metrics_QWidget(QWidget):
         self.layout().addWidget(self.genButton)
         self.layout().addWidget(self.runButton)
         self.layout().addWidget(self.docButton)
+        self.layout().addWidget(self.timingLabel)
         self.runButton.pressed.connect(self.startProcessing)
         self.docButton.pressed.connect(self.openDocumentation)
         self.genButton.pressed.connect(self.generateRandomPSF)
@@ -186,6 +208,94 @@ class Microscopy_Metrics_QWidget(QWidget):
 
 
 
+    def onTabChanged(self, index):
+        """Builds the page of a tab when it is shown for the first time.
+
+        Args:
+            index (int): The index of the shown tab.
+        """
+        tab = self.tab.widget(index)
+        if isinstance(tab, LazyTab):
+            tab.build()
+
+    def getPixelSize(self):
+        """Gives the pixel size set in the acquisition page.
+
+        Returns:
+            list: The pixel size in Z, Y and X.
+        """
+        pixelSizeWidget = self.acquisitionToolPage.pixelSizeWidget
+        return [
+            pixelSizeWidget.options.value("Pixel size Z"),
+            pixelSizeWidget.options.value("Pixel size Y"),
+            pixelSizeWidget.options.value("Pixel size X"),
+        ]
+
+    def createAcquisitionPage(self):
+        """Builds the acquisition page."""
+        page = AcquisitionToolPage(self.viewer)
+        page.pixelSizeWidget.signal.scaleUpdate.connect(self.updateScaleDetection)
+        return page
+
+    def createDetectionPage(self):
+        """Builds the detection page with the pixel size of the acquisition page."""
+        from napari_microscopy_metrics._detection_tool_widget import DetectionToolTab
+
+        page = DetectionToolTab(self.viewer)
+        page.detectionTool._pixelSize = self.getPixelSize()
+        return page
+
+    def createMetricsPage(self):
+        """Builds the fitting page with the pixel size of the acquisition page."""
+        from napari_microscopy_metrics._metrics_widget import Metricstoolpage
+
+        page = Metricstoolpage(self.viewer)
+        page.spacing = self.getPixelSize()
+        return page
+
+    def createReportPage(self):
+        """Builds the report page."""
+        from napari_microscopy_metrics._report_widget import ReportToolPage
+
+        return ReportToolPage(self.viewer)
+
+    def createBatchPage(self):
+        """Builds the batch page."""
+        from napari_microscopy_metrics._batch_widget import BatchWidget
+
+        return BatchWidget(self.viewer, parent=self)
+
+    def createSweepPage(self):
+        """Builds the parameter sweep page."""
+        from napari_microscopy_metrics._sweep_widget import SweepWidget
+
+        return SweepWidget(self.viewer, parent=self)
+
+    @property
+    def acquisitionToolPage(self):
+        """AcquisitionToolPage: The acquisition page, built on first access."""
+        return self.tabs["acquisition"].page
+
+    @property
+    def detectionToolPage(self):
+        """DetectionToolTab: The detection page, built on first access."""
+        return self.tabs["detection"].page
+
+    @property
+    def metricsToolPage(self):
+        """Metricstoolpage: The fitting page, built on first access."""
+        return self.tabs["metrics"].page
+
+    @property
+    def reportToolPage(self):
+        """ReportToolPage: The report page, built on first access."""
+        return self.tabs["report"].page
+
+    @property
+    def batchWidget(self):
+        """BatchWidget: The batch page, built on first access."""
+        return self.tabs["batch"].page
+
     def startProcessing(self):
         """Function to start the whole analysis process .
         
@@ -222,11 +332,13 @@ class Microscopy_Metrics_QWidget(QWidget):
         self.runButton.pressed.disconnect(self.startProcessing)
         self.runButton.pressed.connect(self.stopProcessing)
         self.isRunning = True
+        # the widgets are read once, every step of the run uses the same configuration
+        self.config = self.getAnalysisConfig()
+        self.timer = StageTimer()
         self.apply_detect_psf()
 
     def stopProcessing(self):
         """Function to stop the whole analysis process and reset the plugin interface"""
-        print("Process stopped by user.")
         self.runButton.setText("Run analysis")
         self.runButton.setStyleSheet(
             """
@@ -254,9 +366,15 @@ class Microscopy_Metrics_QWidget(QWidget):
 
     def createDetectionTools(self):
         """Function to create the tools for detection, metrics calculation, fitting and report generation"""
+        from microscopy_metrics.fitting import Fitting
+        from microscopy_metrics.metrics import Metrics
+        from microscopy_metrics.report_generator import ReportGenerator
+
+        from napari_microscopy_metrics._batch import createDetection
+        from napari_microscopy_metrics._lazy import layerData, layerOverview
+
         self.workingLayer = self.viewer.layers.selection.active
         self.imageAnalyzer = None
-        self.DetectionTool = Detection()
         self.MetricTool = Metrics()
         self.FittingTool = Fitting()
         self.reportGenerator = ReportGenerator()
@@ -264,30 +382,8 @@ class Microscopy_Metrics_QWidget(QWidget):
             self.workingLayer, napari.layers.Image
         ):
             raise ValueError("Please, select a valid layer of type Image")
-        image = np.copy(self.workingLayer.data)
-        parameterDetection = self.detectionToolPage.detectionParameters.detectionToolWidget
-        self.DetectionTool._image = image
-        self.DetectionTool._detectionTool = DetectionTool.getInstance(parameterDetection.options.value("Detection tool"))
-        if self.DetectionTool._detectionTool is not None:
-            if hasattr(self.DetectionTool._detectionTool, "_minDistance"):
-                self.DetectionTool._detectionTool._minDistance = parameterDetection.optionsSliders.value("Min dist")
-            if hasattr(self.DetectionTool._detectionTool, "_sigma"):
-                self.DetectionTool._detectionTool._sigma = parameterDetection.optionsSliders.value("Sigma")
-        parameterThreshold = self.detectionToolPage.detectionParameters.widgetThreshold
-        self.DetectionTool._detectionTool._thresholdTool = Threshold.getInstance(parameterThreshold.options.value("Threshold"))
-        if self.DetectionTool._detectionTool._thresholdTool is not None and hasattr(self.DetectionTool._detectionTool._thresholdTool, "_relThreshold"):
-            self.DetectionTool._detectionTool._relThreshold = parameterThreshold.optionsSliders.value("threshold") / 100
-        parameterROI = self.detectionToolPage.detectionParameters.widgetRejection
-        self.DetectionTool._beadSize = parameterROI.options.value("Theoretical bead size (µm)")
-        self.DetectionTool._rejectionDistance = parameterROI.options.value("Z axis rejection margin (µm)")
-        self.DetectionTool._cropFactor = parameterROI.optionsSliders.value("crop factor")
-        self.DetectionTool._thresholdIntensity = parameterROI.optionsSliders.value("threshold intensity") / 100
-        parameterPixelSize = self.acquisitionToolPage.pixelSizeWidget
-        self.DetectionTool._pixelSize = [
-            parameterPixelSize.options.value("Pixel size Z"),
-            parameterPixelSize.options.value("Pixel size Y"),
-            parameterPixelSize.options.value("Pixel size X"),
-        ]
+        self.DetectionTool = createDetection(layerData(self.workingLayer), self.config)
+        self.DetectionTool._overview, self.DetectionTool._overviewFactor = layerOverview(self.workingLayer)
 
     def apply_detect_psf(self):
         """Function to update DetectionTool with the image and parameters setup by user in the widget and start a worker for bead detection
@@ -312,9 +408,11 @@ class Microscopy_Metrics_QWidget(QWidget):
             if os.path.exists(self.outputDir):
                 shutil.rmtree(self.outputDir)
             os.makedirs(self.outputDir)
+            self.config.save(os.path.join(self.outputDir, CONFIG_FILE_NAME))
+            self.timer.outputDir = self.outputDir
         args = [self.outputDir]
         self.worker = create_worker(
-            self.DetectionTool.run,
+            self.timer.wrap("detection", self.DetectionTool.run),
             *args,
             _progress={"desc": "Detecting beads..."},
         )
@@ -346,17 +444,9 @@ class Microscopy_Metrics_QWidget(QWidget):
 
     def createMetricTools(self):
         """Function to create the tools for metrics calculation, fitting and report generation"""
-        self.MetricTool = Metrics()
-        self.MetricTool._imageAnalyzer = self.imageAnalyzer
-        parameterROI = self.detectionToolPage.detectionParameters.widgetRejection
-        self.MetricTool._ringInnerDistance = parameterROI.options.value("Inner annulus distance to bead (µm)")
-        self.MetricTool._ringThickness = parameterROI.options.value("Annulus thickness (µm)")
-        parameterMicroscope = self.acquisitionToolPage.microscopeWidget
-        self.MetricTool._TheoreticalResolutionTool = TheoreticalResolution.getInstance(parameterMicroscope.options.value("Microscope type"))
-        self.MetricTool._TheoreticalResolutionTool._numericalAperture = parameterMicroscope.options.value("Numerical aperture")
-        self.MetricTool._TheoreticalResolutionTool._emissionWavelength = parameterMicroscope.options.value("Emission wavelength") / 1000
-        self.MetricTool._TheoreticalResolutionTool._refractiveIndex = parameterMicroscope.options.value("Refraction index")
-        self.MetricTool._TheoreticalResolutionTool._excitationWavelength = parameterMicroscope.options.value("Excitation wavelength") / 1000
+        from napari_microscopy_metrics._batch import createMetrics
+
+        self.MetricTool = createMetrics(self.imageAnalyzer, self.config)
 
     def applyPrefittingMetrics(self):
         """Function to update MetricTool with the image and parameters setup by user in the widget and start a worker for prefitting metrics calculation
@@ -368,7 +458,7 @@ class Microscopy_Metrics_QWidget(QWidget):
             return
         self.createMetricTools()
         self.worker = create_worker(
-            self.MetricTool.runPrefittingMetrics,
+            self.timer.wrap("prefitting", self.MetricTool.runPrefittingMetrics, self.countKeptBeads),
             _progress={"desc": "Metrics calculation..."},
         )
         self.worker.finished.connect(self.prefittingFinished)
@@ -380,21 +470,22 @@ class Microscopy_Metrics_QWidget(QWidget):
         if not self.isRunning:
             return
         self.metricsToolPage.printResults(self.imageAnalyzer._meanSBR)
-        for bead in self.imageAnalyzer._beadAnalyzer:
-            if bead._rejected == False and bead._roi is not None and bead._metricTool.meshBuilder is not None:
-                bead._metricTool.meshBuilder.saveMesh(os.path.join(self.getActivePath(bead._id), f"bead_{bead._id}_mesh.obj"))
+        with self.timer.stage("mesh saving", self.countKeptBeads):
+            for bead in self.imageAnalyzer._beadAnalyzer:
+                if bead._rejected == False and bead._roi is not None and bead._metricTool.meshBuilder is not None:
+                    bead._metricTool.meshBuilder.saveMesh(os.path.join(self.getActivePath(bead._id), f"bead_{bead._id}_mesh.obj"))
         self.generateMesh()
         self.applyFitting()
 
     def createFittingTools(self):
         """Function to create the tools for fitting and report generation"""
+        from microscopy_metrics.fitting import Fitting
+
         self.FittingTool = Fitting()
         self.FittingTool._imageAnalyzer = self.imageAnalyzer
-        parameterFitting = self.metricsToolPage.widgetFittingChoice
-        self.FittingTool.fitType = parameterFitting.options.value("Fit type")
-        self.FittingTool._prominenceRel = parameterFitting.optionsSliders.value("prominence") / 100
-        self.FittingTool._thresholdRSquared = parameterFitting.options.value("Threshold R2")
-        self.FittingTool._imageAnalyzer = self.imageAnalyzer
+        self.FittingTool.fitType = self.config.FitType
+        self.FittingTool._prominenceRel = self.config.prominenceRel
+        self.FittingTool._thresholdRSquared = self.config.thresholdRSquared
 
     def applyFitting(self):
         """Function to update FittingTool with the image and parameters setup by user in the widget and start a worker for fitting process
@@ -407,7 +498,7 @@ class Microscopy_Metrics_QWidget(QWidget):
         self.createFittingTools()
 
         self.worker = create_worker(
-            self.FittingTool.computeFitting,
+            self.timer.wrap("fitting", self.FittingTool.computeFitting, self.countKeptBeads),
             _progress={"desc": "Gaussian fitting..."},
         )
         self.worker.finished.connect(self.onFittingFinished)
@@ -428,7 +519,8 @@ class Microscopy_Metrics_QWidget(QWidget):
         ):
             raise ValueError("There are no bead analyzed !")
         self.worker = create_worker(
-            self.MetricTool.runMetrics, _progress={"desc": "Final metrics calculation..."}
+            self.timer.wrap("final metrics", self.MetricTool.runMetrics, self.countKeptBeads),
+            _progress={"desc": "Final metrics calculation..."},
         )
         self.worker.finished.connect(self.onMetricsFinished)
         self.worker.errored.connect(self.onReportFinished)
@@ -468,31 +560,25 @@ class Microscopy_Metrics_QWidget(QWidget):
 
     def generateReport(self):
         """Function to generate a PDF report with all the results of the analysis using ReportGenerator"""
+        from microscopy_metrics.report_generator import ReportGenerator
+
         if not self.isRunning:
             return
-        self.generateFigures()
-        listReports = self.reportToolPage.getListReports()
-        for report in listReports:
+        with self.timer.stage("figures", self.countKeptBeads):
+            self.generateFigures()
+        for report in self.config.listReports:
             yield {"desc": f"Generating {report}..."}
-            PDFGenerator = ReportGenerator().getInstance(report)
-            PDFGenerator._inputDir = self.outputDir
-            PDFGenerator._imageAnalyzer = self.imageAnalyzer
-            PDFGenerator._detectionDatas = (
-                self.detectionToolPage.detectionParameters.detectionToolWidget.toDict()
-            )
-            PDFGenerator._thresholdDatas = (
-                self.detectionToolPage.detectionParameters.widgetThreshold.toDict()
-            )
-            PDFGenerator._roiDatas = (
-                self.detectionToolPage.detectionParameters.widgetRejection.toDict()
-            )
-            PDFGenerator._fittingDatas = (
-                self.metricsToolPage.widgetFittingChoice.toDict()
-            )
-            PDFGenerator._microscopeDatas = (
-                self.acquisitionToolPage.microscopeWidget.toDict()
-            )
-            PDFGenerator.generateReport(self.outputDir)
+            with self.timer.stage(f"report {report}", self.countKeptBeads):
+                PDFGenerator = ReportGenerator().getInstance(report)
+                PDFGenerator._inputDir = self.outputDir
+                PDFGenerator._imagePath = getattr(self.workingLayer.source, "path", None) or self.workingLayer.name
+                PDFGenerator._imageAnalyzer = self.imageAnalyzer
+                PDFGenerator._detectionDatas = self.config.getReportDatas("detectionDatas")
+                PDFGenerator._thresholdDatas = self.config.getReportDatas("thresholdDatas")
+                PDFGenerator._roiDatas = self.config.getReportDatas("roiDatas")
+                PDFGenerator._fittingDatas = self.config.getReportDatas("fittingDatas")
+                PDFGenerator._microscopeDatas = self.config.getReportDatas("microscopeDatas")
+                PDFGenerator.generateReport(self.outputDir)
 
     def onReportFinished(self):
         """Function to update plugin interface after report generation and open the HTML report in a web browser"""
@@ -524,7 +610,25 @@ class Microscopy_Metrics_QWidget(QWidget):
             pass
         self.runButton.pressed.connect(self.startProcessing)
         self.isRunning = False
-        print(self.imageAnalyzer == self.DetectionTool._imageAnalyzer)
+        self.showTiming()
+
+    def countKeptBeads(self):
+        """Function to count the beads of the current run which are not rejected, the beads entering the next stage
+
+        Returns:
+            int: The number of beads kept, 0 before the detection.
+        """
+        if self.imageAnalyzer is None:
+            return 0
+        return len([bead for bead in self.imageAnalyzer._beadAnalyzer if not bead._rejected and bead._roi is not None])
+
+    def showTiming(self):
+        """Function to summarise the duration of the stages of the run in the widget and save them next to the report"""
+        if self.timer is None:
+            return
+        self.timingLabel.setText(self.timer.formatSummary())
+        if self.timer.outputDir is not None and os.path.isdir(self.timer.outputDir):
+            self.timer.save()
 
     def openBrowser(self):
         """Function to open the HTML report corresponding to the bead selected by user in napari viewer in a web browser"""
@@ -590,7 +694,6 @@ class Microscopy_Metrics_QWidget(QWidget):
                 for bead in self.imageAnalyzer._beadAnalyzer
                 if not bead._rejected
             ]
-            print(f"{len(beads)} bead(s) detected and not rejected.")
             if self.centroidsLayer is None or self.centroidsLayer not in self.viewer.layers:
                 self.centroidsLayer = self.viewer.add_points(
                     [
@@ -655,27 +758,49 @@ class Microscopy_Metrics_QWidget(QWidget):
         Args:
             scale (list): List of 3 values corresponding to pixel size in Z, Y and X of the image.
         """
-        self.detectionToolPage.detectionTool._pixelSize = scale
-        self.metricsToolPage.spacing = scale        
+        # pages which are not built yet read the pixel size when they are built
+        if self.tabs["detection"].isBuilt:
+            self.detectionToolPage.detectionTool._pixelSize = scale
+        if self.tabs["metrics"].isBuilt:
+            self.metricsToolPage.spacing = scale
 
     def generateRandomPSF(self):
-        """Function to generate a random PSF and display it in the napari viewer"""
+        """Function to start a worker generating a PSF with a random aberration, displayed in the napari viewer once generated.
+        Kernels are cached by microscope parameters and aberration, so generating again with the same settings is instant.
+        """
+        from napari_microscopy_metrics._sample_data import ABERRATIONS, cached_psf_kernel
+
         size = 100
         dxy = self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size X")
         dz = self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size Z")
         ni0 = self.acquisitionToolPage.microscopeWidget.options.value("Refraction index")
         wvl = self.acquisitionToolPage.microscopeWidget.options.value("Emission wavelength") / 1000
         NA = self.acquisitionToolPage.microscopeWidget.options.value("Numerical aperture")
-        aberrationType = random.choice([None,"comatic","astigmatism","spherical"])
-        if aberrationType == "comatic":
-            psf = PSFWithComaticAberration(size, dxy, dz, ni0, ni0, wvl, NA).psf
-        elif aberrationType == "astigmatism":
-            psf = PSFWithAstigmatismAberration(size, dxy, dz, ni0, ni0, wvl, NA).psf
-        elif aberrationType == "spherical":
-            psf = PSFWithSphericalAberration(size, dxy, dz, ni0, wvl, NA).psf
-        else:
-            psf = PSFGenerator(size, dxy, dz, ni0, ni0, wvl, NA).psf
-        psf = psf.reshape((size, size, size))
+        aberrationType = random.choice(ABERRATIONS)
+        self.psfWorker = create_worker(
+            cached_psf_kernel,
+            size,
+            dxy,
+            dz,
+            ni0,
+            wvl,
+            NA,
+            aberrationType,
+            _progress={"desc": "Generating PSF..."},
+        )
+        self.psfWorker.returned.connect(
+            lambda psf: self.onRandomPSFGenerated(psf, aberrationType)
+        )
+        self.psfWorker.errored.connect(lambda error: show_error(f"PSF generation failed: {error}"))
+        self.psfWorker.start()
+
+    def onRandomPSFGenerated(self, psf, aberrationType):
+        """Function to display a generated PSF in the napari viewer
+
+        Args:
+            psf (np.ndarray): The generated PSF.
+            aberrationType (str): The aberration of the PSF, None if it has no aberration.
+        """
         if aberrationType == None : 
             aberrationType = "no"
         self.viewer.add_image(psf, name=f"PSF with {aberrationType} aberration")
@@ -779,38 +904,44 @@ class Microscopy_Metrics_QWidget(QWidget):
         self.viewer.reset_view()
 
 
-    def generateBatchAnalyzer(self, folder):
-        batchAnalyzer = BatchAnalyzer(folder)
-        batchAnalyzer._detectionMethod = self.detectionToolPage.detectionParameters.detectionToolWidget.options.value("Detection tool")
-        batchAnalyzer._Sigma = self.detectionToolPage.detectionParameters.detectionToolWidget.optionsSliders.value("Sigma")
-        batchAnalyzer._minDistance = self.detectionToolPage.detectionParameters.detectionToolWidget.optionsSliders.value("Min dist")
-        batchAnalyzer._thresholdMethod = self.detectionToolPage.detectionParameters.widgetThreshold.options.value("Threshold")
-        batchAnalyzer._relThreshold = self.detectionToolPage.detectionParameters.widgetThreshold.optionsSliders.value("threshold") / 100
-        batchAnalyzer._TheoreticalBeadSize = self.detectionToolPage.detectionParameters.widgetRejection.options.value("Theoretical bead size (µm)")
-        batchAnalyzer._ZRejectionMargin = self.detectionToolPage.detectionParameters.widgetRejection.options.value("Z axis rejection margin (µm)")
-        batchAnalyzer._cropFactor = self.detectionToolPage.detectionParameters.widgetRejection.optionsSliders.value("crop factor")
-        batchAnalyzer._prominenceDoublePass = self.detectionToolPage.detectionParameters.widgetRejection.optionsSliders.value("ProminenceRel Double Pass") / 100
-        batchAnalyzer._thresholdIntensity = self.detectionToolPage.detectionParameters.widgetRejection.optionsSliders.value("threshold intensity") / 100
-        batchAnalyzer._pixelSize = [
-            self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size Z"),
-            self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size Y"),
-            self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size X"),
-        ]
-        batchAnalyzer._annulusInnerDistance = self.detectionToolPage.detectionParameters.widgetRejection.options.value("Inner annulus distance to bead (µm)")
-        batchAnalyzer._annulusThickness = self.detectionToolPage.detectionParameters.widgetRejection.options.value("Annulus thickness (µm)")
-        batchAnalyzer._MicroscopeType = self.acquisitionToolPage.microscopeWidget.options.value("Microscope type")
-        batchAnalyzer._numericalAperture = self.acquisitionToolPage.microscopeWidget.options.value("Numerical aperture")
-        batchAnalyzer._emissionWavelength = self.acquisitionToolPage.microscopeWidget.options.value("Emission wavelength")
-        batchAnalyzer._excitationWavelength = self.acquisitionToolPage.microscopeWidget.options.value("Excitation wavelength")
-        batchAnalyzer._refractionIndex = self.acquisitionToolPage.microscopeWidget.options.value("Refraction index")
-        batchAnalyzer._FitType = self.metricsToolPage.widgetFittingChoice.options.value("Fit type")
-        batchAnalyzer._thresholdRSquared = self.metricsToolPage.widgetFittingChoice.options.value("Threshold R2")
-        batchAnalyzer._listReports = self.reportToolPage.getListReports()
-        batchAnalyzer._detectionDatas = self.detectionToolPage.detectionParameters.detectionToolWidget.toDict()
-        batchAnalyzer._thresholdDatas = self.detectionToolPage.detectionParameters.widgetThreshold.toDict()
-        batchAnalyzer._roiDatas = self.detectionToolPage.detectionParameters.widgetRejection.toDict()
-        batchAnalyzer._fittingDatas = self.metricsToolPage.widgetFittingChoice.toDict()
-        batchAnalyzer._microscopeDatas = self.acquisitionToolPage.microscopeWidget.toDict()
-        return batchAnalyzer
-
-                
+    def getAnalysisConfig(self):
+        """Function to gather the parameters set up in the widget for an analysis, interactive or batch.
+
+        Returns:
+            AnalysisConfig: The configuration of the analysis, which can be sent to worker processes.
+        """
+        detectionParameters = self.detectionToolPage.detectionParameters
+        return AnalysisConfig.fromParameters({
+            "detectionMethod": detectionParameters.detectionToolWidget.options.value("Detection tool"),
+            "Sigma": detectionParameters.detectionToolWidget.optionsSliders.value("Sigma"),
+            "minDistance": detectionParameters.detectionToolWidget.optionsSliders.value("Min dist"),
+            "thresholdMethod": detectionParameters.widgetThreshold.options.value("Threshold"),
+            "relThreshold": detectionParameters.widgetThreshold.optionsSliders.value("threshold") / 100,
+            "TheoreticalBeadSize": detectionParameters.widgetRejection.options.value("Theoretical bead size (µm)"),
+            "ZRejectionMargin": detectionParameters.widgetRejection.options.value("Z axis rejection margin (µm)"),
+            "cropFactor": detectionParameters.widgetRejection.optionsSliders.value("crop factor"),
+            "prominenceDoublePass": detectionParameters.widgetRejection.optionsSliders.value("ProminenceRel Double Pass") / 100,
+            "thresholdIntensity": detectionParameters.widgetRejection.optionsSliders.value("threshold intensity") / 100,
+            "pixelSize": [
+                self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size Z"),
+                self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size Y"),
+                self.acquisitionToolPage.pixelSizeWidget.options.value("Pixel size X"),
+            ],
+            "annulusInnerDistance": detectionParameters.widgetRejection.options.value("Inner annulus distance to bead (µm)"),
+            "annulusThickness": detectionParameters.widgetRejection.options.value("Annulus thickness (µm)"),
+            "MicroscopeType": self.acquisitionToolPage.microscopeWidget.options.value("Microscope type"),
+            "numericalAperture": self.acquisitionToolPage.microscopeWidget.options.value("Numerical aperture"),
+            "emissionWavelength": self.acquisitionToolPage.microscopeWidget.options.value("Emission wavelength"),
+            "excitationWavelength": self.acquisitionToolPage.microscopeWidget.options.value("Excitation wavelength"),
+            "refractionIndex": self.acquisitionToolPage.microscopeWidget.options.value("Refraction index"),
+            "FitType": self.metricsToolPage.widgetFittingChoice.options.value("Fit type"),
+            "prominenceRel": self.metricsToolPage.widgetFittingChoice.prominenceRel.value() / 100,
+            "thresholdRSquared": self.metricsToolPage.widgetFittingChoice.options.value("Threshold R2"),
+            "listReports": self.reportToolPage.getListReports(),
+            "detectionDatas": detectionParameters.detectionToolWidget.toDict(),
+            "thresholdDatas": detectionParameters.widgetThreshold.toDict(),
+            "roiDatas": detectionParameters.widgetRejection.toDict(),
+            "fittingDatas": self.metricsToolPage.widgetFittingChoice.toDict(),
+            "microscopeDatas": self.acquisitionToolPage.microscopeWidget.toDict(),
+            "cropContainer": self.reportToolPage.widgetReportChoices.options.value("Save bead crops in a single container"),
+        })
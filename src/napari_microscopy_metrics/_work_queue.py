@@ -0,0 +1,375 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+import contextlib
+
+from napari_microscopy_metrics._batch import (
+    FINISHED_STATUSES,
+    getImageSignature,
+    getOutputDir,
+    getThreads,
+    iterAnalysis,
+    loadParameters,
+)
+from napari_microscopy_metrics._config import AnalysisConfig
+
+
+# seconds after which a job whose lease was not renewed is given to another worker
+LEASE_TIME = 300.0
+# number of analyses of an image, failed or lost, before it is given up
+MAX_ATTEMPTS = 3
+# seconds between two looks at the queue of an idle worker
+POLL_INTERVAL = 5.0
+
+
+def _writeJson(path, data):
+    """Writes a JSON file at once, through a temporary file in the same folder."""
+    temporaryPath = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temporaryPath, "w", encoding="utf-8") as file:
+        json.dump(data, file, indent=4, default=str)
+    os.replace(temporaryPath, path)
+
+
+def _readJson(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+class WorkQueue(object):
+    """Work queue of a batch stored in a shared folder, from which headless workers on several hosts claim the images to analyse.
+    Each image is a JSON job file moved between the pending, claimed, done and failed folders with atomic renames, so that a job is claimed by a single worker.
+    The attempt number of a job is part of its file name, its lease is the modification time of its claimed file, renewed by the worker while it analyses the image.
+    A job whose lease expired, because its worker died, or whose analysis failed, is put back in the pending folder until MAX_ATTEMPTS attempts were made.
+    The parameters of each submission are saved in the parameters folder under their hash, which is recorded in its jobs,
+    so that images submitted with different parameters are each analysed with their own.
+
+    Attributes:
+        _path (str): The folder of the queue.
+        _leaseTime (float): Seconds after which a lease which was not renewed expires.
+        _maxAttempts (int): Number of attempts before a job is moved to the failed folder.
+    """
+
+    parametersFolder = "parameters"
+    folders = ("pending", "claimed", "done", "failed")
+
+    def __init__(self, path, leaseTime=LEASE_TIME, maxAttempts=MAX_ATTEMPTS):
+        self._path = path
+        self._leaseTime = leaseTime
+        self._maxAttempts = maxAttempts
+        for folder in self.folders + (self.parametersFolder,):
+            os.makedirs(os.path.join(path, folder), exist_ok=True)
+
+    def getFolder(self, name):
+        """Gives the path of one of the folders of the queue."""
+        return os.path.join(self._path, name)
+
+    @staticmethod
+    def getKey(path):
+        """Gives the identifier of the job of an image, the same on every host sharing the folder."""
+        return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def parseName(name):
+        """Gives the key and attempt number of a job file name.
+
+        Args:
+            name (str): The name, "<key>.<attempt>.json".
+
+        Returns:
+            tuple: The key and the attempt number.
+        """
+        key, attempt, _ = name.split(".")
+        return key, int(attempt)
+
+    def _listJobs(self, folder):
+        return sorted(name for name in os.listdir(self.getFolder(folder)) if name.endswith(".json"))
+
+    def getCounts(self):
+        """Gives the number of jobs in each folder of the queue.
+
+        Returns:
+            dict: The number of pending, claimed, done and failed jobs.
+        """
+        return {folder: len(self._listJobs(folder)) for folder in self.folders}
+
+    def getParametersPath(self, parameterHash):
+        """Gives the path of the parameter file of the jobs submitted with the given parameters."""
+        return os.path.join(self.getFolder(self.parametersFolder), f"{parameterHash}.json")
+
+    def getParameters(self, parameterHash):
+        """Reads the batch parameters of the jobs submitted with them.
+
+        Args:
+            parameterHash (str): The hash of the parameters, recorded in the jobs.
+
+        Raises:
+            ValueError: If parameters are missing from the file.
+
+        Returns:
+            dict: The batch parameters.
+        """
+        return loadParameters(self.getParametersPath(parameterHash))
+
+    def checkParameters(self):
+        """Checks that parameters were submitted to the queue and can be read.
+
+        Raises:
+            ValueError: If no parameters were submitted, or parameters are missing from a file.
+        """
+        names = [name for name in os.listdir(self.getFolder(self.parametersFolder)) if name.endswith(".json")]
+        if not names:
+            raise ValueError(f"No image was submitted to the queue {self._path}")
+        for name in names:
+            self.getParameters(name[: -len(".json")])
+
+    def submit(self, paths, parameters):
+        """Adds images to the queue, with the parameters of the batch.
+        Images already queued, or done with the same parameters and not modified since, are not added again.
+
+        Args:
+            paths (list): Paths of the images, as seen by all the workers.
+            parameters (dict): The batch parameters.
+
+        Returns:
+            list: Paths of the images added to the queue.
+        """
+        config = AnalysisConfig.fromParameters(parameters)
+        parameterHash = config.hash
+        if not os.path.isfile(self.getParametersPath(parameterHash)):
+            _writeJson(self.getParametersPath(parameterHash), config.toParameters())
+        queued = {self.parseName(name)[0] for folder in ("pending", "claimed") for name in self._listJobs(folder)}
+        submitted = []
+        for path in paths:
+            key = self.getKey(path)
+            if key in queued:
+                continue
+            size, mtime = getImageSignature(path)
+            job = {"path": os.path.abspath(path), "parameterHash": parameterHash, "size": size, "mtime": mtime}
+            donePath = os.path.join(self.getFolder("done"), f"{key}.json")
+            if os.path.isfile(donePath):
+                done = _readJson(donePath)
+                if all(done.get(name) == value for name, value in job.items()):
+                    continue
+            for folder in ("done", "failed"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(self.getFolder(folder), f"{key}.json"))
+            _writeJson(os.path.join(self.getFolder("pending"), f"{key}.0.json"), job)
+            submitted.append(path)
+        return submitted
+
+    def reclaimExpired(self, now=None):
+        """Puts back in the queue the jobs whose lease expired, or moves them to the failed folder after their last attempt.
+
+        Args:
+            now (float, optional): Current time, as given by time.time. Defaults to now.
+
+        Returns:
+            list: Names of the job files reclaimed.
+        """
+        now = time.time() if now is None else now
+        reclaimed = []
+        for name in self._listJobs("claimed"):
+            claimedPath = os.path.join(self.getFolder("claimed"), name)
+            try:
+                if now - os.stat(claimedPath).st_mtime < self._leaseTime:
+                    continue
+                self._retry(claimedPath, name, {"status": "failed", "error": "Lease expired"})
+            except FileNotFoundError:
+                # finished or reclaimed by another worker meanwhile
+                continue
+            reclaimed.append(name)
+        return reclaimed
+
+    def _retry(self, claimedPath, name, result):
+        """Moves a claimed job to the pending folder for its next attempt, or to the failed folder after its last attempt."""
+        key, attempt = self.parseName(name)
+        if attempt + 1 < self._maxAttempts:
+            os.rename(claimedPath, os.path.join(self.getFolder("pending"), f"{key}.{attempt + 1}.json"))
+            return
+        failedPath = os.path.join(self.getFolder("failed"), f"{key}.json")
+        os.rename(claimedPath, failedPath)
+        job = _readJson(failedPath)
+        job.update(result, attempts=attempt + 1)
+        _writeJson(failedPath, job)
+
+    def claim(self):
+        """Claims the next pending job, after reclaiming the expired ones.
+
+        Returns:
+            Job: The claimed job, None if no job is pending.
+        """
+        self.reclaimExpired()
+        for name in self._listJobs("pending"):
+            pendingPath = os.path.join(self.getFolder("pending"), name)
+            claimedPath = os.path.join(self.getFolder("claimed"), name)
+            try:
+                # the lease starts now, not when the job was written, so that a job which waited longer than a lease is not expired once claimed
+                os.utime(pendingPath)
+                os.rename(pendingPath, claimedPath)
+            except FileNotFoundError:
+                # claimed by another worker first
+                continue
+            try:
+                os.utime(claimedPath)
+                data = _readJson(claimedPath)
+            except FileNotFoundError:
+                # reclaimed by another worker meanwhile
+                continue
+            return Job(self, name, data)
+        return None
+
+
+class Job(object):
+    """An image claimed from a WorkQueue by a worker.
+
+    Attributes:
+        _queue (WorkQueue): The queue of the job.
+        _name (str): The name of the job file.
+        path (str): Path of the image.
+        attempt (int): Number of the attempt, starting at 0.
+        data (dict): The content of the job file.
+    """
+
+    def __init__(self, queue, name, data):
+        self._queue = queue
+        self._name = name
+        self.path = data["path"]
+        self.attempt = queue.parseName(name)[1]
+        self.data = data
+
+    def _claimedPath(self):
+        return os.path.join(self._queue.getFolder("claimed"), self._name)
+
+    def renew(self):
+        """Renews the lease of the job.
+
+        Returns:
+            bool: False if the lease was lost, the job having been given to another worker.
+        """
+        try:
+            os.utime(self._claimedPath())
+        except FileNotFoundError:
+            return False
+        return True
+
+    @contextlib.contextmanager
+    def keepLease(self):
+        """Renews the lease of the job in a background thread while the block runs."""
+        stopped = threading.Event()
+
+        def renewLease():
+            while not stopped.wait(self._queue._leaseTime / 3):
+                if not self.renew():
+                    return
+
+        thread = threading.Thread(target=renewLease, daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stopped.set()
+            thread.join()
+
+    def complete(self, result):
+        """Moves the job to the done folder with the summary of its analysis.
+
+        Args:
+            result (dict): Summary of the analysis.
+
+        Returns:
+            bool: False if the lease was lost, the result being left to the worker which got the job.
+        """
+        key = self._queue.parseName(self._name)[0]
+        donePath = os.path.join(self._queue.getFolder("done"), f"{key}.json")
+        try:
+            os.rename(self._claimedPath(), donePath)
+        except FileNotFoundError:
+            return False
+        _writeJson(donePath, dict(self.data, result=result, attempts=self.attempt + 1))
+        return True
+
+    def fail(self, result):
+        """Puts the job back in the queue for another attempt, or moves it to the failed folder after its last attempt.
+
+        Args:
+            result (dict): Summary of the failed analysis.
+
+        Returns:
+            bool: False if the lease was lost.
+        """
+        try:
+            self._queue._retry(self._claimedPath(), self._name, {"status": result["status"], "error": result.get("error")})
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self):
+        """Puts the job back in the queue without counting an attempt, when the worker is stopped."""
+        with contextlib.suppress(FileNotFoundError):
+            os.rename(self._claimedPath(), os.path.join(self._queue.getFolder("pending"), self._name))
+
+
+def runWorker(
+    queuePath,
+    outputRoot=None,
+    threads=None,
+    cancellation=None,
+    exitWhenEmpty=True,
+    pollInterval=POLL_INTERVAL,
+    leaseTime=LEASE_TIME,
+    maxAttempts=MAX_ATTEMPTS,
+):
+    """Claims and analyses the images of a work queue, one at a time, until the queue is empty or the worker is stopped.
+
+    Args:
+        queuePath (str): The folder of the queue, shared by all the workers.
+        outputRoot (str, optional): Folder in which the result folders are created. Defaults to the folder of each image.
+        threads (int, optional): Number of beads fitted at the same time. Defaults to the threads of a single worker.
+        cancellation (BatchCancellation, optional): Token stopping the worker. Defaults to None.
+        exitWhenEmpty (bool, optional): Whether to return once no job is pending nor claimed. Defaults to True, otherwise the worker waits for new jobs.
+        pollInterval (float, optional): Seconds between two looks at an empty queue. Defaults to POLL_INTERVAL.
+        leaseTime (float, optional): Seconds after which a lease which was not renewed expires. Defaults to LEASE_TIME.
+        maxAttempts (int, optional): Number of attempts before a job is given up. Defaults to MAX_ATTEMPTS.
+
+    Yields:
+        dict: The events of iterAnalysis for each claimed image, analysed with the parameters it was submitted with.
+    """
+    queue = WorkQueue(queuePath, leaseTime, maxAttempts)
+    # parameters of the jobs, by hash, read once per worker
+    parameters = {}
+    threads = getThreads(1) if threads is None else threads
+    while cancellation is None or not cancellation.stopRequested:
+        job = queue.claim()
+        if job is None:
+            counts = queue.getCounts()
+            if exitWhenEmpty and counts["pending"] == 0 and counts["claimed"] == 0:
+                return
+            time.sleep(pollInterval)
+            continue
+        parameterHash = job.data["parameterHash"]
+        try:
+            if parameterHash not in parameters:
+                parameters[parameterHash] = queue.getParameters(parameterHash)
+        except (OSError, ValueError) as error:
+            result = {"path": job.path, "outputDir": getOutputDir(job.path, outputRoot), "status": "failed", "error": f"{type(error).__name__}: {error}"}
+            job.fail(result)
+            yield {"event": "finished", "path": job.path, "result": result}
+            continue
+        try:
+            with job.keepLease():
+                for event in iterAnalysis(job.path, parameters[parameterHash], outputRoot, threads, cancellation):
+                    yield event
+        except BaseException:
+            # interrupted, or closed by the caller
+            job.release()
+            raise
+        result = event["result"]
+        if result["status"] == "cancelled":
+            job.release()
+        elif result["status"] in FINISHED_STATUSES:
+            job.complete(result)
+        else:
+            job.fail(result)
@@ -4,18 +4,51 @@ This module is an example of a barebones writer plugin for napari.
 It implements the Writer specification.
 see: https://napari.org/stable/plugins/building_a_plugin/guides.html#writers
 
-Replace code below according to your needs.
+Images saved with a ``.zarr`` extension are written as chunked, compressed
+OME-Zarr multiscale pyramids, which the reader of this plugin opens lazily.
+Several layers (the analysed image with its detected beads, ROIs, skeleton
+paths and isosurfaces) are saved together in a single zarr container, so
+that a finished analysis can be reloaded without running it again.
 """
 
 from __future__ import annotations
 
+import os
 from collections.abc import Sequence
 from typing import TYPE_CHECKING, Any, Union
 
+import numpy as np
+
 if TYPE_CHECKING:
     DataType = Union[Any, Sequence[Any]]
     FullLayerData = tuple[DataType, dict, str]
 
+OME_ZARR_EXTENSION = ".zarr"
+# size of the chunks along Y and X, the Z axis is kept in a single chunk
+# so that a bead's crop is read from a few chunks
+CHUNK_SIZE = 256
+# the pyramid is built until the smallest lateral axis is below this size
+MIN_LEVEL_SIZE = 256
+MAX_LEVELS = 6
+
+# attribute of the container root listing the layers it holds
+LAYERS_ATTRIBUTE = "napari_layers"
+# layer attributes saved along with the data of each layer type
+COMMON_KEYS = ("name", "scale", "translate", "opacity", "blending", "visible")
+STYLE_KEYS = {
+    "image": ("colormap", "contrast_limits", "gamma"),
+    "labels": (),
+    "points": ("face_color", "border_color", "size"),
+    "shapes": (
+        "shape_type",
+        "edge_width",
+        "edge_color",
+        "face_color",
+        "z_index",
+    ),
+    "surface": ("colormap", "contrast_limits"),
+}
+
 
 def write_single_image(path: str, data: Any, meta: dict) -> list[str]:
     """Writes a single image layer.
@@ -34,8 +67,11 @@ def write_single_image(path: str, data: Any, meta: dict) -> list[str]:
     -------
     [path] : A list containing the string path to the saved file.
     """
-
-    # implement your writer logic here ...
+    if meta.get("multiscale", False):
+        data = data[0]
+    if path.endswith(OME_ZARR_EXTENSION):
+        return write_ome_zarr(path, data, meta)
+    np.save(path, np.asarray(data))
 
     # return path to any file(s) that were successfully written
     return [path]
@@ -44,6 +80,10 @@ def write_single_image(path: str, data: Any, meta: dict) -> list[str]:
 def write_multiple(path: str, data: list[FullLayerData]) -> list[str]:
     """Writes multiple layers of different types.
 
+    All layers are saved in a single zarr container: images as OME-Zarr
+    pyramids, labels, points, shapes and surfaces as compressed arrays,
+    their display attributes and features in the container attributes.
+
     Parameters
     ----------
     path : str
@@ -59,8 +99,209 @@ def write_multiple(path: str, data: list[FullLayerData]) -> list[str]:
     -------
     [path] : A list containing (potentially multiple) string paths to the saved file(s).
     """
+    import zarr
 
-    # implement your writer logic here ...
+    if not path.endswith(OME_ZARR_EXTENSION):
+        path += OME_ZARR_EXTENSION
+    group = zarr.open_group(path, mode="w")
+    layers = []
+    for index, (layer_data, meta, layer_type) in enumerate(data):
+        key = str(index)
+        if layer_type == "image":
+            if meta.get("multiscale", False):
+                layer_data = layer_data[0]
+            write_ome_zarr(os.path.join(path, key), layer_data, meta)
+        elif layer_type in ("labels", "points"):
+            _write_array(group, key, layer_data)
+        elif layer_type == "shapes":
+            shapes = group.require_group(key)
+            counts = np.array([len(shape) for shape in layer_data])
+            vertices = (
+                np.concatenate(layer_data)
+                if len(layer_data)
+                else np.zeros((0, 0))
+            )
+            _write_array(shapes, "counts", counts.astype(np.int64))
+            _write_array(shapes, "vertices", vertices)
+        elif layer_type == "surface":
+            surface = group.require_group(key)
+            names = ("vertices", "faces", "values")
+            for name, array in zip(names, layer_data):
+                _write_array(surface, name, array)
+        else:
+            continue
+        layers.append(
+            {
+                "path": key,
+                "type": layer_type,
+                "meta": layer_attributes(meta, layer_type),
+            }
+        )
+    group.attrs.update({LAYERS_ATTRIBUTE: layers})
 
     # return path to any file(s) that were successfully written
     return [path]
+
+
+def _write_array(group, name, data):
+    """Write an in-memory array as a compressed array of a zarr group."""
+    data = np.asarray(data)
+    array = group.zeros(name=name, shape=data.shape, dtype=data.dtype)
+    if data.size:
+        array[...] = data
+    return array
+
+
+def _json_safe(value):
+    """Convert a napari layer attribute to a JSON serializable value."""
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return _json_safe(value.tolist())
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    # colormaps and enums are saved by name
+    return str(getattr(value, "name", value))
+
+
+def layer_attributes(meta, layer_type):
+    """Select the attributes of a layer worth saving with its data.
+
+    Parameters
+    ----------
+    meta : dict
+        Attributes of the napari layer.
+    layer_type : str
+        Type of the layer, eg: "image", "points", "shapes".
+
+    Returns
+    -------
+    dict
+        JSON serializable keyword arguments for the viewer.add_* method,
+        including the features of the layer and its text format.
+    """
+    attributes = {
+        key: _json_safe(meta[key])
+        for key in COMMON_KEYS + STYLE_KEYS.get(layer_type, ())
+        if meta.get(key) is not None
+    }
+    features = meta.get("features")
+    if features is not None and len(features.columns):
+        attributes["features"] = {
+            str(column): _json_safe(features[column].tolist())
+            for column in features.columns
+        }
+    text_format = (meta.get("text") or {}).get("string", {})
+    if isinstance(text_format, dict) and text_format.get("format"):
+        attributes["text"] = {"string": text_format["format"]}
+    return attributes
+
+
+def build_pyramid(data, min_size=MIN_LEVEL_SIZE, max_levels=MAX_LEVELS):
+    """Build the levels of a multiscale pyramid by 2x2 lateral averaging.
+
+    The Z axis is never downsampled, as bead stacks are usually much
+    thinner than wide.
+
+    Parameters
+    ----------
+    data : array-like
+        The full resolution (Z)YX image.
+    min_size : int
+        Levels are added while both lateral axes of the last level are
+        at least twice this size.
+    max_levels : int
+        Maximum number of levels, including the full resolution.
+
+    Returns
+    -------
+    list of dask.array.Array
+        The levels, from full to lowest resolution.
+    """
+    import dask.array as da
+
+    level = data if isinstance(data, da.Array) else da.from_array(data)
+    levels = [level]
+    while (
+        len(levels) < max_levels
+        and min(level.shape[-2:]) >= 2 * min_size
+    ):
+        axes = {level.ndim - 2: 2, level.ndim - 1: 2}
+        level = da.coarsen(np.mean, level, axes, trim_excess=True).astype(
+            data.dtype
+        )
+        levels.append(level)
+    return levels
+
+
+def write_ome_zarr(path: str, data: Any, meta: dict) -> list[str]:
+    """Write an image as an OME-Zarr multiscale pyramid.
+
+    Chunks are compressed and written in parallel by dask. The scale of
+    the layer is stored in the multiscales metadata of each level.
+
+    Parameters
+    ----------
+    path : str
+        Path of the ``.zarr`` folder to create (overwritten if it exists).
+    data : array-like
+        The full resolution (Z)YX image, in memory or lazy.
+    meta : dict
+        Attributes of the napari layer, only "scale" and "name" are used.
+
+    Returns
+    -------
+    [path] : A list containing the path to the saved container.
+    """
+    import zarr
+    import dask.array as da
+
+    group = zarr.open_group(path, mode="w")
+    scale = list(meta.get("scale", [1.0] * data.ndim))[-data.ndim :]
+    datasets = []
+    for index, level in enumerate(build_pyramid(data)):
+        chunks = level.shape[:-2] + tuple(
+            min(CHUNK_SIZE, size) for size in level.shape[-2:]
+        )
+        array = group.zeros(
+            name=str(index),
+            shape=level.shape,
+            chunks=chunks,
+            dtype=level.dtype,
+        )
+        da.store(level.rechunk(chunks), array, lock=False)
+        level_scale = [
+            size * data.shape[axis] / level.shape[axis]
+            for axis, size in enumerate(scale)
+        ]
+        datasets.append(
+            {
+                "path": str(index),
+                "coordinateTransformations": [
+                    {
+                        "type": "scale",
+                        "scale": [float(size) for size in level_scale],
+                    }
+                ],
+            }
+        )
+    axes = [
+        {"name": name, "type": "space", "unit": "micrometer"}
+        for name in "zyx"[-data.ndim :]
+    ]
+    multiscales = [
+        {"name": meta.get("name", "image"), "axes": axes, "datasets": datasets}
+    ]
+    if getattr(getattr(group, "metadata", None), "zarr_format", 2) == 3:
+        group.attrs.update(
+            {"ome": {"version": "0.5", "multiscales": multiscales}}
+        )
+    else:
+        multiscales[0]["version"] = "0.4"
+        group.attrs.update({"multiscales": multiscales})
+    return [path]
+
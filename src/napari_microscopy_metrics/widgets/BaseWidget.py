@@ -1,8 +1,46 @@
+import os
+import copy
+import json
+import threading
+
 import napari
 from qtpy.QtWidgets import QWidget
 from autooptions import Options
 
 
+# content of the options files already read, by path, with the modification time and size of the file when it was read
+_optionsFiles = {}
+_optionsLock = threading.Lock()
+
+
+def loadOptions(options):
+    """Loads the values saved in the file of an options object, as Options.load does.
+    The files are read once per session, and again only when they were saved since, so that the widgets sharing an options file do not each parse it.
+
+    Args:
+        options (Options): The options, with their default values.
+
+    Returns:
+        Options: The same options, with the saved values.
+    """
+    if not os.path.exists(options.optionsPath):
+        options.save()
+    with _optionsLock:
+        status = os.stat(options.optionsPath)
+        signature = (status.st_mtime_ns, status.st_size)
+        cached = _optionsFiles.get(options.optionsPath)
+        if cached is None or cached[0] != signature:
+            with open(options.optionsPath) as file:
+                cached = (signature, json.load(file))
+            _optionsFiles[options.optionsPath] = cached
+    for key, value in cached[1].items():
+        if value["transient"] or key not in options.items:
+            continue
+        # each options object gets its own copy, its values are modified in place
+        options.items[key] = copy.deepcopy(value)
+    return options
+
+
 class BaseWidget(QWidget):
     """A generic base widget for options-based widgets.
     
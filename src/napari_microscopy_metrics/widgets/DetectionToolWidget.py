@@ -14,7 +14,7 @@ from qtpy.QtWidgets import (
 from autooptions import Options, OptionsWidget
 from microscopy_metrics.detectionTools.detection_tool import DetectionTool
 
-from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget
+from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget, loadOptions
 
 
 class DetectionToolWidget(BaseWidget):
@@ -104,7 +104,7 @@ class DetectionToolWidget(BaseWidget):
             choices=[x for x in DetectionTool._detectionClasses],
             callback=self.selectedAction,
         )
-        options.load()
+        loadOptions(options)
         return options
 
     def getSliders(self):
@@ -116,7 +116,7 @@ class DetectionToolWidget(BaseWidget):
         optionsSliders = Options("Sliders value", "Store value of sliders")
         optionsSliders.addInt(name="Min dist", value=1)
         optionsSliders.addInt(name="Sigma", value=3)
-        optionsSliders.load()
+        loadOptions(optionsSliders)
         return optionsSliders
 
     def selectedAction(self, value):
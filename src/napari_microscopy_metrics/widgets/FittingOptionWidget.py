@@ -15,7 +15,8 @@ from qtpy.QtWidgets import (
 from autooptions import Options
 from autooptions import OptionsWidget
 
-from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget
+from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget, loadOptions
+from napari_microscopy_metrics._lazy import layerData
 from microscopy_metrics.fittingTools.fittingTool import FittingTool
 from microscopy_metrics.fittingTools import Prominence
 
@@ -116,7 +117,7 @@ class FittingOptionWidget(BaseWidget):
             or self.viewer.layers.selection.active is None
         ):
             return
-        image = self.viewer.layers.selection.active.data
+        image = layerData(self.viewer.layers.selection.active)
         meanFWHM = [0.0, 0.0, 0.0]
         total = 0
         for roi in ROIs:
@@ -125,11 +126,13 @@ class FittingOptionWidget(BaseWidget):
             index_min_distance = np.argmin(dist)
             prominence = Prominence()
             roi_int = roi.astype(int)
-            prominence._image = image[
-                ...,
-                roi_int[0][1] : roi_int[2][1],
-                roi_int[0][2] : roi_int[1][2],
-            ]
+            prominence._image = np.asarray(
+                image[
+                    ...,
+                    roi_int[0][1] : roi_int[2][1],
+                    roi_int[0][2] : roi_int[1][2],
+                ]
+            )
             prominence._roi = roi
             prominence._centroid = centroids[index_min_distance]
             prominence._prominenceRel = value / 100
@@ -169,7 +172,7 @@ class FittingOptionWidget(BaseWidget):
             callback=self.selectedAction,
         )
         options.addFloat(name="Threshold R2", value=0.95)
-        options.load()
+        loadOptions(options)
         if options.items["Fit type"]["choices"] != [
             x for x in FittingTool._fittingClasses.keys()
         ]:
@@ -187,7 +190,7 @@ class FittingOptionWidget(BaseWidget):
         """
         optionsSliders = Options("Sliders value", "Store value of sliders")
         optionsSliders.addInt(name="prominence", value=50)
-        optionsSliders.load()
+        loadOptions(optionsSliders)
         return optionsSliders
     
     def toDict(self):
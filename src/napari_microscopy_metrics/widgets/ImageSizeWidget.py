@@ -5,7 +5,7 @@ from qtpy.QtCore import Qt, Signal, QObject
 from qtpy.QtWidgets import QSizePolicy, QVBoxLayout, QPushButton
 from autooptions import Options, OptionsWidget
 
-from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget
+from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget, loadOptions
 
 
 class UpdateScaleSignal(QObject):
@@ -67,7 +67,7 @@ class ImageSizeWidget(BaseWidget):
         options.addFloat(name="Pixel size X", value=0.069)
         options.addFloat(name="Pixel size Y", value=0.069)
         options.addFloat(name="Pixel size Z", value=0.1)
-        options.load()
+        loadOptions(options)
         return options
 
     def apply(self):
@@ -86,4 +86,26 @@ class ImageSizeWidget(BaseWidget):
                 self.options.value("Pixel size Y"),
                 self.options.value("Pixel size X"),
             ]
-        )
\ No newline at end of file
+        )
+
+    def setPixelSize(self, pixelSize):
+        """Fills the scale entries with the pixel sizes read from an image file and emit signal to application for updating detection widget.
+        The values are not saved, so that the scale saved for next session is kept.
+
+        Args:
+            pixelSize (list): List of 3 values corresponding to pixel size in Z, Y and X of the image, None for uncalibrated axes.
+        """
+        for name, value in zip(
+            ["Pixel size Z", "Pixel size Y", "Pixel size X"], pixelSize
+        ):
+            if value is None:
+                continue
+            self.options.setValue(name, float(value))
+            self.widget.widgets[name][1].setText(str(float(value)))
+        self.signal.scaleUpdate.emit(
+            [
+                self.options.value("Pixel size Z"),
+                self.options.value("Pixel size Y"),
+                self.options.value("Pixel size X"),
+            ]
+        )
@@ -7,7 +7,7 @@ from napari.utils.notifications import show_warning
 from microscopy_metrics.resolutionTools.theoretical_resolution import (
     TheoreticalResolution,
 )
-from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget
+from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget, loadOptions
 
 
 class MicroscopeParametersWidget(BaseWidget):
@@ -64,7 +64,7 @@ class MicroscopeParametersWidget(BaseWidget):
         options.addInt(name="Excitation wavelength", value=225)
         options.addFloat(name="Refraction index", value=1.45)
         options.addFloat(name="Numerical aperture", value=1.0)
-        options.load()
+        loadOptions(options)
         return options
     
     def apply(self):
@@ -73,9 +73,8 @@ class MicroscopeParametersWidget(BaseWidget):
             show_warning("Numerical aperture should be lower than refraction index.")
             self.options.setValue("Numerical aperture", self.backupNumericalAperture)
             self.options.setValue("Refraction index", self.backupRefractionIndex)
-            print(self.options.value("Numerical aperture"), self.options.value("Refraction index"))
             self.options.save()
-            self.options.load()
+            loadOptions(self.options)
             self.widget.widgets["Numerical aperture"][1].setText(str(self.options.value("Numerical aperture")))
             self.widget.widgets["Refraction index"][1].setText(str(self.options.value("Refraction index")))
         else:
@@ -6,7 +6,7 @@ from qtpy.QtWidgets import QSizePolicy, QVBoxLayout, QPushButton, QSlider, QLabe
 
 from autooptions import Options, OptionsWidget
 
-from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget
+from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget, loadOptions
 from microscopy_metrics.utils import umToPx
 
 class RoiWidget(BaseWidget):
@@ -85,7 +85,7 @@ class RoiWidget(BaseWidget):
         options.addFloat(name="Z axis rejection margin (µm)", value=0.5)
         options.addFloat(name="Inner annulus distance to bead (µm)", value=1.0)
         options.addFloat(name="Annulus thickness (µm)", value=2.0)
-        options.load()
+        loadOptions(options)
         return options
 
     def getSliders(self):
@@ -100,7 +100,7 @@ class RoiWidget(BaseWidget):
         optionsSliders.addInt(name="crop factor", value=10)
         optionsSliders.addInt(name="threshold intensity", value=50)
         optionsSliders.addInt(name="ProminenceRel Double Pass", value=50)
-        optionsSliders.load()
+        loadOptions(optionsSliders)
         return optionsSliders
 
     def apply(self):
@@ -6,7 +6,7 @@ from qtpy.QtWidgets import QCheckBox, QHBoxLayout, QSizePolicy, QVBoxLayout, QPu
 
 from autooptions import Options
 
-from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget
+from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget, loadOptions
 
 
 class ReportWidget(BaseWidget):
@@ -27,6 +27,19 @@ class ReportWidget(BaseWidget):
         self.HTMLCheckbox = QCheckBox("Export report as HTML")
         self.HTMLCheckbox.setChecked(self.options.value("Export report as HTML"))
         layout.addWidget(self.HTMLCheckbox)
+        self.ParquetCheckbox = QCheckBox("Export results as Parquet")
+        self.ParquetCheckbox.setChecked(self.options.value("Export results as Parquet"))
+        layout.addWidget(self.ParquetCheckbox)
+        self.indexCheckbox = QCheckBox("Index results in the results database")
+        self.indexCheckbox.setToolTip(
+            "Add the results to the SQLite database shared by all the analyses, for trend queries.\n"
+            "The database must be on a local disk, set its path with the MICROSCOPY_METRICS_INDEX environment variable."
+        )
+        self.indexCheckbox.setChecked(self.options.value("Index results in the results database"))
+        layout.addWidget(self.indexCheckbox)
+        self.cropContainerCheckbox = QCheckBox("Save bead crops in a single container")
+        self.cropContainerCheckbox.setChecked(self.options.value("Save bead crops in a single container"))
+        layout.addWidget(self.cropContainerCheckbox)
         self.ButtonLayout = QHBoxLayout()
         self.applyButton = QPushButton("Apply")
         self.applyButton.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
@@ -47,7 +60,10 @@ class ReportWidget(BaseWidget):
         options.addBool(name="Export report as PDF", value=True)
         options.addBool(name="Export report as CSV", value=False)
         options.addBool(name="Export report as HTML", value=False)
-        options.load()
+        options.addBool(name="Export results as Parquet", value=False)
+        options.addBool(name="Index results in the results database", value=False)
+        options.addBool(name="Save bead crops in a single container", value=False)
+        loadOptions(options)
         return options
 
     def apply(self):
@@ -55,6 +71,9 @@ class ReportWidget(BaseWidget):
         self.options.setValue("Export report as PDF", self.PDFCheckbox.isChecked())
         self.options.setValue("Export report as CSV", self.CSVCheckbox.isChecked())
         self.options.setValue("Export report as HTML", self.HTMLCheckbox.isChecked())
+        self.options.setValue("Export results as Parquet", self.ParquetCheckbox.isChecked())
+        self.options.setValue("Index results in the results database", self.indexCheckbox.isChecked())
+        self.options.setValue("Save bead crops in a single container", self.cropContainerCheckbox.isChecked())
         self.options.save()
 
     def openDocumentation(self):
@@ -1,8 +1,6 @@
 import napari
 import webbrowser
-import numpy as np
 
-from napari.layers import Image
 from qtpy.QtCore import Qt
 from qtpy.QtWidgets import (
     QVBoxLayout,
@@ -16,7 +14,8 @@ from qtpy.QtWidgets import (
 from autooptions import Options, OptionsWidget
 from microscopy_metrics.thresholdTools.threshold_tool import Threshold
 
-from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget
+from napari_microscopy_metrics.widgets.BaseWidget import BaseWidget, loadOptions
+from napari_microscopy_metrics._lazy import arrayMin, layerData, thresholdSample
 
 
 class ThresholdWidget(BaseWidget):
@@ -89,7 +88,7 @@ class ThresholdWidget(BaseWidget):
             choices=[x for x in Threshold._thresholdClasses],
             callback=self.selectedAction,
         )
-        options.load()
+        loadOptions(options)
         return options
 
     def getSliders(self):
@@ -100,7 +99,9 @@ class ThresholdWidget(BaseWidget):
         """
         optionsSliders = Options("Sliders value", "Store value of sliders")
         optionsSliders.addInt(name="threshold", value=50)
-        optionsSliders.load()
+        loadOptions(optionsSliders)
+        # values saved when the slider ranged up to the maximum of the image are brought back in the 0-100 range
+        optionsSliders.items["threshold"]["value"] = min(max(optionsSliders.value("threshold"), 0), 100)
         return optionsSliders
 
     def selectedAction(self, value):
@@ -123,24 +124,16 @@ class ThresholdWidget(BaseWidget):
 
     def updateThreshold(self, value):
         """Updates the label for relative threshold, assign the value in optionSliders and update the view with new thresholded image.
+        The slider ranges from 0 to 100 whatever the image, the relative threshold previewed being its value divided by 100, as in the analysis.
 
         Args:
             value (int): The actual value of the slider.
         """
-        if self.viewer.layers.selection.active is not None and isinstance(self.viewer.layers.selection.active, Image):
-            if self.thresholdRel.maximum() != self.viewer.layers.selection.active.data.max():
-                self.thresholdRel.setMaximum(self.viewer.layers.selection.active.data.max())
-            self.thresholdRelLabel.setText(
-                "Relative threshold: " + str(round(value / self.viewer.layers.selection.active.data.max(), 4))
-            )
-            self.optionsSliders.items["threshold"]["value"] = value
-            self.displayThreshold("manual", value=value / self.viewer.layers.selection.active.data.max())
-        else :
-            self.thresholdRelLabel.setText(
-                "Relative threshold: " + str(round(value / self.thresholdRel.maximum(), 4))
-            )
-            self.optionsSliders.items["threshold"]["value"] = value
-            self.displayThreshold("manual", value=value / self.thresholdRel.maximum())
+        self.thresholdRelLabel.setText(
+            "Relative threshold: " + str(round(value / 100, 4))
+        )
+        self.optionsSliders.items["threshold"]["value"] = value
+        self.displayThreshold("manual", value=value / 100)
 
     def displayThreshold(self, thresholdStr, value=0.5):
         """A method to change layer properties to display (or not) a render view of the thresholded image with actual properties.
@@ -166,11 +159,11 @@ class ThresholdWidget(BaseWidget):
             threshold = Threshold.getInstance(thresholdStr)
             if thresholdStr == "manual":
                 threshold._relThreshold = value
-            valueThreshold = threshold.getThreshold(self.layer.data)
+            valueThreshold = threshold.getThreshold(thresholdSample(layerData(self.layer)))
             self.layer.contrast_limits = [
                 max(
                     min(
-                        valueThreshold + np.min(self.layer.data),
+                        valueThreshold + arrayMin(layerData(self.layer)),
                         self.oldContrastLimits[1] - 1,
                     ),
                     self.oldContrastLimits[0],
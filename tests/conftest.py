@@ -0,0 +1,45 @@
+# microscopy_metrics turns all warnings into errors when it is imported,
+# napari is imported first so that its own deprecation warnings stay warnings
+# now that importing the plugin does not import napari anymore
+import napari.layers  # noqa: F401
+import pytest
+
+
+def makeBatchParameters():
+    """Builds the parameters of the batches of the tests, with the Parquet report only."""
+    return {
+        "detectionMethod": "Difference of Gaussian",
+        "Sigma": 3,
+        "minDistance": 1,
+        "thresholdMethod": "otsu",
+        "relThreshold": 0.5,
+        "TheoreticalBeadSize": 0.2,
+        "ZRejectionMargin": 0.5,
+        "cropFactor": 10,
+        "prominenceDoublePass": 0.5,
+        "thresholdIntensity": 0.5,
+        "pixelSize": [0.1, 0.069, 0.069],
+        "annulusInnerDistance": 1.0,
+        "annulusThickness": 2.0,
+        "MicroscopeType": "widefield",
+        "numericalAperture": 1.0,
+        "emissionWavelength": 450,
+        "excitationWavelength": 225,
+        "refractionIndex": 1.45,
+        "FitType": "1D",
+        "prominenceRel": 0.5,
+        "thresholdRSquared": 0.95,
+        "listReports": ["Parquet"],
+        "detectionDatas": {},
+        "thresholdDatas": {},
+        "roiDatas": {},
+        "fittingDatas": {},
+        "microscopeDatas": {},
+        "cropContainer": False,
+    }
+
+
+@pytest.fixture
+def batchParameters():
+    """Gives a function building the parameters of a batch, a new dict on each call."""
+    return makeBatchParameters
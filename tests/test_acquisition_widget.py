@@ -42,3 +42,16 @@ def test_signal_connection(qapp,mock_viewer):
     widget = AcquisitionToolPage(mock_viewer)
     mock_viewer.layers.selection.events.active.connect.assert_called_once_with(widget.onLayerChanged)
 
+
+def test_on_layer_changed_with_pixel_size_metadata(qapp,mock_viewer):
+    mock_layer = MagicMock(spec=napari.layers.Image)
+    mock_layer.data = np.zeros((10,5,20))
+    mock_layer.metadata = {"pixel_size": [0.3, None, 0.05]}
+    mock_viewer.layers.selection.active = mock_layer
+    widget = AcquisitionToolPage(mock_viewer)
+    scales = []
+    widget.pixelSizeWidget.signal.scaleUpdate.connect(scales.append)
+    widget.onLayerChanged()
+    assert widget.pixelSizeWidget.options.value("Pixel size Z") == 0.3
+    assert widget.pixelSizeWidget.options.value("Pixel size X") == 0.05
+    assert scales[-1][0] == 0.3 and scales[-1][2] == 0.05
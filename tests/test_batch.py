@@ -0,0 +1,212 @@
+import os
+import json
+import multiprocessing
+
+import numpy as np
+import pyarrow.parquet as pq
+
+from unittest.mock import patch
+
+from napari_microscopy_metrics._batch import (
+    BatchCancellation,
+    BatchManifest,
+    BatchProgress,
+    canLoadImage,
+    findImages,
+    getOutputDir,
+    getThreads,
+    hashParameters,
+    listImages,
+    runBatch,
+    runBatchEvents,
+    scanImages,
+)
+from napari_microscopy_metrics._config import CONFIG_FILE_NAME, AnalysisConfig
+from napari_microscopy_metrics._prefetch import ImagePrefetcher
+from napari_microscopy_metrics._sample_data import make_bead_field
+from napari_microscopy_metrics._timing import TIMING_FILE_NAME
+
+
+def test_list_images_and_output_dir(tmp_path):
+    for name in ("b.tif", "a.npy", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    (tmp_path / "c.zarr").mkdir()
+    images = listImages(str(tmp_path))
+    assert [os.path.basename(path) for path in images] == ["a.npy", "b.tif", "c.zarr"]
+    assert getOutputDir(images[1]) == str(tmp_path / "b_analysis")
+    assert getOutputDir(images[2], "results") == os.path.join("results", "c_analysis")
+    assert getThreads(os.cpu_count() * 4) == 1
+    # the files loadImage opens, as the sweep widget checks before giving it the path of a layer
+    (tmp_path / "d.zarr").write_bytes(b"")
+    assert [canLoadImage(str(tmp_path / name)) for name in ("a.npy", "b.tif", "c.zarr", "d.zarr", "notes.txt", "missing.npy")] == [
+        True, True, True, False, False, False,
+    ]
+
+
+def test_recursive_scan_and_header_sniffing(tmp_path):
+    for folder in ("plate1", "plate2/well", "plate1/a_analysis", ".hidden", "calibration"):
+        (tmp_path / folder).mkdir(parents=True, exist_ok=True)
+    image = np.zeros((4, 16, 16), dtype=np.uint16)
+    for name in ("plate1/a.npy", "plate2/well/b.npy", "plate1/a_analysis/crop.npy", ".hidden/c.npy", "calibration/d.npy"):
+        np.save(tmp_path / name, image)
+    np.save(tmp_path / "plane.npy", image[0])
+    (tmp_path / "broken.npy").write_bytes(b"not an image")
+    # the header is valid, the voxels are only read by the analysis
+    np.save(tmp_path / "truncated.npy", image)
+    with open(tmp_path / "truncated.npy", "r+b") as file:
+        file.truncate(200)
+    (tmp_path / "stack.zarr").mkdir()
+
+    names = lambda paths: [os.path.relpath(path, tmp_path).replace(os.sep, "/") for path in paths]
+    assert names(scanImages(str(tmp_path), recursive=False)) == ["broken.npy", "plane.npy", "stack.zarr", "truncated.npy"]
+    assert names(scanImages(str(tmp_path), include=["plate*/*"])) == ["plate1/a.npy", "plate2/well/b.npy"]
+    assert names(scanImages(str(tmp_path), include=["*.npy"], exclude=["calibration", "plate2/*", "t*"])) == [
+        "broken.npy",
+        "plane.npy",
+        "plate1/a.npy",
+    ]
+    paths, rejected = findImages(str(tmp_path), exclude=["*.zarr"])
+    assert names(paths) == ["calibration/d.npy", "plate1/a.npy", "plate2/well/b.npy", "truncated.npy"]
+    assert names(rejected) == ["broken.npy", "plane.npy"]
+    assert rejected[str(tmp_path / "plane.npy")].startswith("Not a 3D image")
+
+
+def test_batch_analyzes_images_and_reports_failures(tmp_path, batchParameters):
+    image = make_bead_field(n_beads=4, shape=(40, 128, 128), seed=1)[0][0]
+    np.save(tmp_path / "beads.npy", image)
+    (tmp_path / "broken.npy").write_bytes(b"not an image")
+
+    results = {
+        os.path.basename(result["path"]): result
+        for result in runBatch(listImages(str(tmp_path)), batchParameters(), workers=1)
+    }
+    assert results["broken.npy"]["status"] == "failed"
+    assert "error" in results["broken.npy"]
+    beads = results["beads.npy"]
+    assert beads["status"] == "done"
+    assert beads["validBeads"] > 0
+    table = pq.read_table(os.path.join(beads["outputDir"], "PSF_analysis_result.parquet"), columns=["image"])
+    assert set(table.column("image").to_pylist()) == {str(tmp_path / "beads.npy")}
+    with open(os.path.join(beads["outputDir"], TIMING_FILE_NAME)) as file:
+        stages = [stage["stage"] for stage in json.load(file)["stages"]]
+    assert stages == ["loading", "detection", "prefitting", "mesh saving", "fitting", "final metrics", "figures", "report Parquet"]
+
+
+def test_manifest_skips_finished_images(tmp_path, batchParameters):
+    images = tmp_path / "images"
+    images.mkdir()
+    (images / "a.npy").write_bytes(b"a")
+    (images / "b.npy").write_bytes(b"b")
+    paths = listImages(str(images))
+    parameters = batchParameters()
+    parameterHash = hashParameters(parameters)
+    manifestPath = str(tmp_path / BatchManifest.fileName)
+    manifest = BatchManifest(manifestPath)
+    for path, status in zip(paths, ("done", "failed")):
+        os.makedirs(getOutputDir(path))
+        manifest.record({"path": path, "outputDir": getOutputDir(path), "status": status}, parameterHash)
+    with open(manifestPath, "a") as file:
+        file.write('{"path": "trunc')
+
+    reopened = BatchManifest(manifestPath)
+    assert reopened.getPendingImages(paths, parameterHash) == [paths[1]]
+    assert hashParameters(dict(reversed(list(parameters.items())))) == parameterHash
+    parameters["Sigma"] = 2
+    assert reopened.getPendingImages(paths, hashParameters(parameters)) == paths
+    (images / "a.npy").write_bytes(b"modified")
+    assert reopened.getPendingImages(paths, parameterHash) == paths
+    reopened.record({"path": paths[1], "outputDir": getOutputDir(paths[1]), "status": "done"}, parameterHash)
+    assert BatchManifest(manifestPath).getPendingImages(paths, parameterHash) == [paths[0]]
+
+
+def test_batch_events_and_throughput(tmp_path, batchParameters):
+    paths = [str(tmp_path / "a.npy"), str(tmp_path / "b.npy")]
+    for path in paths:
+        with open(path, "wb") as file:
+            file.write(b"not an image")
+    events = list(runBatchEvents(paths, batchParameters(), workers=1))
+    assert [event["event"] for event in events] == ["stage", "finished", "stage", "finished"]
+    assert events[1]["result"]["status"] == "failed"
+    assert events[1]["result"]["duration"] >= 0
+
+    progress = BatchProgress(paths + ["c.npy"], start=0.0)
+    assert progress.getThroughput(now=10.0)["eta"] is None
+    progress.update({"event": "stage", "path": paths[0], "desc": "Detecting beads..."})
+    assert progress.getImage(paths[0])["status"] == "running"
+    result = {"path": paths[0], "status": "done", "beads": 30, "duration": 20.0}
+    progress.update({"event": "finished", "path": paths[0], "result": result})
+    progress.update({"event": "stage", "path": paths[0], "desc": "late step"})
+    assert progress.getImage(paths[0])["status"] == "done"
+    throughput = progress.getThroughput(now=30.0)
+    assert throughput["imagesPerMinute"] == 2.0
+    assert throughput["beadsPerSecond"] == 1.0
+    assert throughput["eta"] == 60.0
+
+
+def test_aborted_batch_leaves_consistent_results(tmp_path, batchParameters):
+    image = make_bead_field(n_beads=4, shape=(40, 128, 128), seed=1)[0][0]
+    paths = [str(tmp_path / "a.npy"), str(tmp_path / "b.npy")]
+    for path in paths:
+        np.save(path, image)
+    manifest = BatchManifest(str(tmp_path / BatchManifest.fileName))
+    cancellation = BatchCancellation()
+    events = []
+    for event in runBatchEvents(paths, batchParameters(), manifest=manifest, cancellation=cancellation):
+        events.append(event)
+        cancellation.abort()
+
+    assert [event["event"] for event in events] == ["stage", "finished", "cancelled"]
+    assert events[1]["result"]["status"] == "cancelled"
+    assert not os.path.exists(getOutputDir(paths[0]))
+    assert manifest.getEntry(paths[0])["status"] == "cancelled"
+    assert manifest.getEntry(paths[1]) is None
+    assert manifest.getPendingImages(paths, hashParameters(batchParameters())) == paths
+
+
+def test_parallel_batch_schedules_images_and_reports_failures(tmp_path, batchParameters):
+    image = make_bead_field(n_beads=4, shape=(40, 128, 128), seed=1)[0][0]
+    paths = [str(tmp_path / "beads.npy"), str(tmp_path / "broken.npy")]
+    np.save(paths[0], image)
+    (tmp_path / "broken.npy").write_bytes(b"not an image")
+    outputRoot = str(tmp_path / "results")
+    os.makedirs(outputRoot)
+    manifest = BatchManifest(str(tmp_path / BatchManifest.fileName))
+    prefetched = []
+    with patch.object(ImagePrefetcher, "update", autospec=True, side_effect=lambda prefetcher, paths: prefetched.append(list(paths))):
+        # a budget of one byte lets a single image run at a time, the other one waiting in the queue is read ahead
+        events = list(runBatchEvents(paths, batchParameters(), workers=2, outputRoot=outputRoot, manifest=manifest, memoryBudget=1))
+
+    order = [event["path"] for event in events]
+    assert order == sorted(order, key=paths.index)
+    assert [paths[1]] in prefetched
+    results = {event["path"]: event["result"] for event in events if event["event"] == "finished"}
+    assert results[paths[0]]["status"] == "done" and results[paths[0]]["validBeads"] > 0
+    assert results[paths[1]]["status"] == "failed" and results[paths[1]]["error"]
+    # the workers received the parameters and the result folder of the batch
+    with open(os.path.join(getOutputDir(paths[0], outputRoot), CONFIG_FILE_NAME)) as file:
+        assert AnalysisConfig.fromJson(file.read()).hash == hashParameters(batchParameters())
+    assert manifest.getEntry(paths[0])["status"] == "done"
+    assert manifest.getEntry(paths[1])["status"] == "failed"
+
+
+def test_parallel_batch_survives_a_killed_worker(tmp_path, batchParameters):
+    image = make_bead_field(n_beads=4, shape=(40, 128, 128), seed=1)[0][0]
+    paths = [str(tmp_path / f"{name}.npy") for name in "abc"]
+    for path in paths:
+        np.save(path, image)
+    manifest = BatchManifest(str(tmp_path / BatchManifest.fileName))
+    events = []
+    for event in runBatchEvents(paths, batchParameters(), workers=2, manifest=manifest, memoryBudget=2**40, prefetch=0):
+        if not events:
+            # a worker killed by the system, as when running out of memory
+            multiprocessing.active_children()[0].kill()
+        events.append(event)
+
+    results = {event["path"]: event["result"] for event in events if event["event"] == "finished"}
+    assert set(results) == set(paths)
+    # the images of the broken pool are failed, the queued image is analysed by a new pool
+    for path in paths[:2]:
+        assert results[path]["status"] == "failed" and "BrokenProcessPool" in results[path]["error"]
+        assert manifest.getEntry(path)["status"] == "failed"
+    assert results[paths[2]]["status"] == "done"
+    assert manifest.getPendingImages(paths, hashParameters(batchParameters())) == paths[:2]
@@ -0,0 +1,49 @@
+import sys
+import json
+import subprocess
+
+import numpy as np
+
+from napari_microscopy_metrics._batch import BatchManifest, PARAMETER_KEYS, loadParameters, saveParameters
+from napari_microscopy_metrics._cli import main
+
+
+def test_parameters_round_trip(tmp_path, batchParameters):
+    path = str(tmp_path / "parameters.json")
+    saveParameters(path, batchParameters())
+    assert loadParameters(path) == batchParameters()
+    parameters = batchParameters()
+    del parameters["Sigma"]
+    with open(path, "w") as file:
+        json.dump(parameters, file)
+    assert main([str(tmp_path), "--parameters", path]) == 2
+    assert set(PARAMETER_KEYS) == set(batchParameters())
+
+
+def test_cli_runs_batch_and_resumes(tmp_path, capsys, batchParameters):
+    images = tmp_path / "images"
+    images.mkdir()
+    (images / "broken.npy").write_bytes(b"not an image")
+    np.save(images / "truncated.npy", np.zeros((4, 16, 16)))
+    with open(images / "truncated.npy", "r+b") as file:
+        file.truncate(200)
+    parameters = str(tmp_path / "parameters.json")
+    saveParameters(parameters, batchParameters())
+
+    assert main([str(images), "-p", parameters]) == 1
+    output = capsys.readouterr().out
+    assert "Skipped broken.npy: Unreadable" in output
+    assert "truncated.npy: failed" in output
+    manifest = BatchManifest(str(images / BatchManifest.fileName))
+    assert manifest.getEntry(str(images / "truncated.npy"))["status"] == "failed"
+    assert manifest.getEntry(str(images / "broken.npy")) is None
+
+
+def test_cli_does_not_import_qt():
+    code = (
+        "import sys, napari_microscopy_metrics._cli as cli; cli.parseArguments(['folder', '-p', 'file']);"
+        "import napari_microscopy_metrics._batch;"
+        "print(sorted(name for name in ('napari', 'qtpy', 'PyQt5', 'PyQt6', 'PySide2', 'PySide6') if name in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
@@ -0,0 +1,64 @@
+import json
+import pickle
+import dataclasses
+
+import pytest
+
+from napari_microscopy_metrics._batch import hashParameters
+from napari_microscopy_metrics._config import AnalysisConfig
+
+
+def test_config_is_frozen_and_hashable(batchParameters):
+    parameters = batchParameters()
+    parameters["roiDatas"] = {"beadSize": 0.2, "cropFactor": 10}
+    config = AnalysisConfig.fromParameters(parameters)
+    parameters["pixelSize"][0] = 1.0
+    parameters["roiDatas"]["cropFactor"] = 20
+    assert config.pixelSize == (0.1, 0.069, 0.069)
+    assert config.getReportDatas("roiDatas") == {"beadSize": 0.2, "cropFactor": 10}
+    assert config["cropFactor"] == config.cropFactor == 10
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        config.cropFactor = 5
+    with pytest.raises(KeyError):
+        config["hash"]
+
+    same = AnalysisConfig.fromParameters(dict(reversed(list(config.toParameters().items()))))
+    other = dataclasses.replace(config, cropFactor=5)
+    assert same == config and same.hash == config.hash
+    assert len({config, same, other}) == 2
+    assert other.hash != config.hash
+    # the hash of the parameter dicts recorded in existing manifests is kept
+    assert hashParameters(batchParameters()) == AnalysisConfig.fromParameters(batchParameters()).hash
+    # a parameter dict written before the crop container option keeps its hash, the option changes it
+    parameters = batchParameters()
+    del parameters["cropContainer"]
+    default = AnalysisConfig.fromParameters(batchParameters())
+    assert AnalysisConfig.fromParameters(parameters) == default
+    assert hashParameters(parameters) == default.hash
+    assert dataclasses.replace(default, cropContainer=True).hash != default.hash
+
+
+def test_config_serialization(batchParameters):
+    config = AnalysisConfig.fromParameters(dict(batchParameters(), extra="ignored"))
+    assert config.toParameters() == batchParameters()
+    text = config.toJson()
+    assert " " not in text.replace("Difference of Gaussian", "")
+    assert AnalysisConfig.fromJson(text) == config
+    assert json.loads(text) == batchParameters()
+    assert pickle.loads(pickle.dumps(config)) == config
+    parameters = batchParameters()
+    del parameters["FitType"]
+    with pytest.raises(ValueError, match="FitType"):
+        AnalysisConfig.fromParameters(parameters)
+
+
+def test_config_numbers_take_the_type_of_their_field(batchParameters):
+    config = AnalysisConfig.fromParameters(batchParameters())
+    # a slider gives integers, a swept range or a hand-edited file may give floats
+    edited = AnalysisConfig.fromParameters(dict(batchParameters(), Sigma=3.0, cropFactor=10.0, pixelSize=[0.1, 0.069, 0.069]))
+    assert edited == config and edited.hash == config.hash
+    assert isinstance(config.Sigma, float) and isinstance(config.emissionWavelength, float)
+    assert isinstance(edited.cropFactor, int) and isinstance(edited.minDistance, int)
+    assert dataclasses.replace(config, Sigma=3).hash == config.hash
+    with pytest.raises(ValueError):
+        AnalysisConfig.fromParameters(dict(batchParameters(), Sigma="wide"))
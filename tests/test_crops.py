@@ -0,0 +1,49 @@
+import dataclasses
+
+import numpy as np
+
+from microscopy_metrics.BeadAnalyzer import BeadAnalyzer
+from napari_microscopy_metrics._batch import createDetection
+from napari_microscopy_metrics._config import AnalysisConfig
+from napari_microscopy_metrics._crops import BeadCropStore
+
+
+def test_crop_store_random_access_by_bead_id(tmp_path):
+    path = str(tmp_path / BeadCropStore.fileName)
+    store = BeadCropStore(path, mode="w")
+    first = np.random.randint(0, 100, (5, 8, 8)).astype(np.uint16)
+    larger = np.random.randint(0, 100, (5, 10, 9)).astype(np.uint16)
+    store.append(3, first, origin=[0, 10, 20], centroid=[2, 14, 24])
+    store.append(1, larger)
+
+    reopened = BeadCropStore(path, mode="r")
+    assert reopened.beadIds == [1, 3]
+    assert 0 not in reopened and 3 in reopened
+    np.testing.assert_array_equal(reopened[3], first)
+    np.testing.assert_array_equal(reopened[1], larger)
+    np.testing.assert_array_equal(reopened.getOrigin(3), [0, 10, 20])
+    np.testing.assert_array_equal(reopened.getCentroid(3), [2, 14, 24])
+    # the larger crop is still stored in a single chunk
+    assert reopened._array("crops").chunks == (1, 5, 10, 9)
+
+
+def test_crop_store_keeps_only_valid_beads(tmp_path):
+    image = np.random.rand(4, 6, 6)
+    roi = np.array([[2, 0, 0], [2, 0, 6], [2, 6, 6], [2, 6, 0]])
+    valid = BeadAnalyzer(id=0, image=image, roi=roi, centroid=[2, 3, 3])
+    rejected = BeadAnalyzer(id=1, image=image, roi=roi, centroid=[2, 3, 3])
+    rejected._rejected = True
+    store = BeadCropStore(str(tmp_path / BeadCropStore.fileName), mode="w")
+    larger = BeadAnalyzer(id=2, image=np.random.rand(4, 8, 7), roi=roi, centroid=[2, 4, 3])
+    store.appendBeads([valid, rejected, larger])
+    assert store.beadIds == [0, 2]
+    np.testing.assert_array_equal(store[0], image)
+    np.testing.assert_array_equal(store[2], larger._image)
+    assert store._array("crops").chunks == (1, 4, 8, 7)
+
+
+def test_crop_container_is_set_by_the_configuration(batchParameters):
+    config = AnalysisConfig.fromParameters(batchParameters())
+    image = np.zeros((4, 6, 6))
+    assert not createDetection(image, config)._cropContainer
+    assert createDetection(image, dataclasses.replace(config, cropContainer=True))._cropContainer
@@ -0,0 +1,31 @@
+import sys
+import json
+import subprocess
+
+import numpy as np
+
+# modules which take most of the import time of the plugin, and which napari does not import at startup
+HEAVY_MODULES = ("dask", "zarr", "tifffile", "scipy", "pandas", "matplotlib", "microscopy_metrics", "napari", "qtpy")
+# seconds the plugin may add to the startup of napari, numpy being already imported by napari
+MAX_IMPORT_TIME = 0.25
+
+
+def test_plugin_discovery_and_reader_sniffing_are_fast(tmp_path):
+    path = str(tmp_path / "image.npy")
+    np.save(path, np.zeros((2, 8, 8), dtype=int))
+    code = (
+        "import sys, json, time, numpy\n"
+        "start = time.perf_counter()\n"
+        "import napari_microscopy_metrics\n"
+        "from napari_microscopy_metrics import _reader, _sample_data, _writer\n"
+        "reader = napari_microscopy_metrics.napari_get_reader(sys.argv[1])\n"
+        "duration = time.perf_counter() - start\n"
+        f"heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]\n"
+        "print(json.dumps({'duration': duration, 'reader': reader is not None, 'heavy': heavy}))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code, path], capture_output=True, text=True, check=True).stdout
+    result = json.loads(output)
+    print(f"plugin import and reader sniffing: {result['duration'] * 1000:.1f} ms")
+    assert result["reader"]
+    assert result["heavy"] == []
+    assert result["duration"] < MAX_IMPORT_TIME
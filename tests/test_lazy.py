@@ -0,0 +1,75 @@
+import numpy as np
+import dask.array as da
+
+from microscopy_metrics.detectionTools.detection_tool import DetectionTool
+from microscopy_metrics.thresholdTools.threshold_tool import Threshold
+from napari_microscopy_metrics._lazy import (
+    ChunkedDetection,
+    arrayMax,
+    arrayMin,
+    isLazyArray,
+    maxProjection,
+    thresholdSample,
+)
+
+
+def makeBeads(shape=(20, 96, 96), centroids=((10, 20, 20), (10, 50, 70), (10, 75, 30))):
+    zz, yy, xx = np.indices(shape)
+    image = np.zeros(shape, dtype=np.float32)
+    for z, y, x in centroids:
+        image += 1000 * np.exp(
+            -((zz - z) ** 2 / 8.0 + (yy - y) ** 2 / 4.0 + (xx - x) ** 2 / 4.0)
+        )
+    return image
+
+
+def test_statistics_on_lazy_array(tmp_path):
+    data = np.arange(4 * 6 * 6).reshape((4, 6, 6))
+    lazy = da.from_array(data, chunks=(2, 3, 3))
+    assert isLazyArray(lazy)
+    assert not isLazyArray(data)
+    np.save(tmp_path / "data.npy", data)
+    mapped = np.load(tmp_path / "data.npy", mmap_mode="r")
+    assert isLazyArray(mapped)
+    assert arrayMax(mapped) == data.max()
+    assert arrayMax(lazy) == data.max()
+    assert arrayMin(lazy) == data.min()
+    np.testing.assert_array_equal(maxProjection(lazy), data.max(axis=0))
+    assert thresholdSample(lazy, maxVoxels=20).size <= 4 * 6 * 6
+
+
+def test_chunked_detection_matches_in_memory_detection(tmp_path):
+    image = makeBeads()
+    results = []
+    np.save(tmp_path / "beads.npy", image)
+    mapped = np.load(tmp_path / "beads.npy", mmap_mode="r")
+    for data in (image, da.from_array(image, chunks=(20, 32, 32)), mapped):
+        detection = ChunkedDetection()
+        detection.image = data
+        detection._tileSize = 40
+        detection._pixelSize = [0.1, 0.1, 0.1]
+        detection._beadSize = 0.6
+        detection._cropFactor = 3
+        detection._detectionTool = DetectionTool.getInstance("peak local maxima")
+        detection._detectionTool._minDistance = 5
+        detection._detectionTool._thresholdTool = Threshold.getInstance("otsu")
+        for _ in detection.run(cropPsf=False):
+            pass
+        results.append(
+            sorted(tuple(bead._centroid) for bead in detection._imageAnalyzer._beadAnalyzer)
+        )
+    assert results[0] == results[1] == results[2]
+    assert len(results[1]) == 3
+
+
+def test_chunked_detection_skips_empty_tiles_of_overview():
+    image = makeBeads(centroids=((10, 20, 20),))
+    detection = ChunkedDetection()
+    detection.image = da.from_array(image, chunks=(20, 32, 32))
+    detection._tileSize = 32
+    detection._overview = image[:, ::2, ::2]
+    detection._overviewFactor = 2
+    detection._detectionTool = DetectionTool.getInstance("peak local maxima")
+    detection._detectionTool._thresholdTool = Threshold.getInstance("otsu")
+    tiles = detection.getCandidateTiles(margin=4)
+    assert tiles == [(0, 32, 0, 32)]
@@ -0,0 +1,39 @@
+import numpy as np
+
+from napari_microscopy_metrics._batch import estimateMemory
+from napari_microscopy_metrics._memory import PROCESS_MEMORY, MemoryScheduler, estimateWorkingSet
+
+
+def test_memory_estimate_grows_with_image_size(tmp_path, batchParameters):
+    parameters = batchParameters()
+    np.save(tmp_path / "small.npy", np.zeros((10, 64, 64), dtype=np.uint16))
+    np.save(tmp_path / "large.npy", np.zeros((40, 128, 128), dtype=np.uint16))
+    (tmp_path / "broken.npy").write_bytes(b"not an image")
+    small = estimateMemory(str(tmp_path / "small.npy"), parameters)
+    large = estimateMemory(str(tmp_path / "large.npy"), parameters)
+    assert PROCESS_MEMORY < small < large
+    # npy files are memory-mapped, and read tile by tile as lazy images
+    assert small == estimateWorkingSet((10, 64, 64), np.uint16, True, parameters)
+    assert estimateMemory(str(tmp_path / "broken.npy"), parameters) == PROCESS_MEMORY
+    # lazy images are read tile by tile
+    shape = (100, 4096, 4096)
+    assert estimateWorkingSet(shape, np.uint16, True, parameters) < estimateWorkingSet(shape, np.uint16, False, parameters)
+
+
+def test_scheduler_keeps_large_images_on_fewer_workers():
+    scheduler = MemoryScheduler(10)
+    queued = [("large1", 6), ("large2", 6), ("small1", 3), ("small2", 3), ("huge", 20)]
+    assert scheduler.admit(queued) == "large1"
+    # the second large image waits, the small ones fill the memory left
+    assert scheduler.admit(queued) == "small1"
+    assert scheduler.admit(queued) is None
+    assert scheduler.used == 9
+    scheduler.release("small1")
+    assert scheduler.admit(queued) == "small2"
+    scheduler.release("large1")
+    scheduler.release("small2")
+    assert scheduler.admit(queued) == "large2"
+    scheduler.release("large2")
+    # an image larger than the budget runs alone
+    assert scheduler.admit(queued) == "huge"
+    assert queued == []
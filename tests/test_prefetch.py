@@ -0,0 +1,33 @@
+import threading
+
+from napari_microscopy_metrics._prefetch import ImagePrefetcher, readAhead
+
+
+def test_read_ahead_reads_files_but_not_chunked_folders(tmp_path):
+    (tmp_path / "image.npy").write_bytes(b"x" * 1000)
+    chunks = tmp_path / "image.zarr" / "0"
+    chunks.mkdir(parents=True)
+    (chunks / "0.0").write_bytes(b"x" * 300)
+    (chunks / "0.1").write_bytes(b"x" * 200)
+    assert readAhead(str(tmp_path / "image.npy")) == 1000
+    # chunked images are only read around their beads by the analysis
+    assert readAhead(str(tmp_path / "image.zarr")) == 0
+    assert readAhead(str(tmp_path / "missing.npy")) == 0
+    stop = threading.Event()
+    stop.set()
+    assert readAhead(str(tmp_path / "image.npy"), stop) == 0
+
+
+def test_prefetcher_reads_only_the_next_images(tmp_path):
+    paths = []
+    for index in range(4):
+        path = tmp_path / f"image{index}.npy"
+        path.write_bytes(b"x" * 100)
+        paths.append(str(path))
+    with ImagePrefetcher(depth=2) as prefetcher:
+        prefetcher.update(paths[1:])
+        prefetcher.update(paths[1:])
+    assert [prefetcher.isPrefetched(path) for path in paths] == [False, True, True, False]
+    with ImagePrefetcher(depth=0) as disabled:
+        disabled.update(paths)
+    assert not any(disabled.isPrefetched(path) for path in paths)
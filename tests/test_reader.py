@@ -37,3 +37,65 @@ def test_get_reader_pass(tmp_path):
 
     reader = napari_get_reader(my_test_file)
     assert reader is None
+
+
+def test_tiff_reader_memory_maps_with_pixel_size(tmp_path):
+    import tifffile
+
+    my_test_file = str(tmp_path / "beads.tif")
+    original_data = np.random.randint(0, 1000, (5, 30, 40)).astype(np.uint16)
+    tifffile.imwrite(
+        my_test_file,
+        original_data,
+        imagej=True,
+        resolution=(1 / 0.069, 1 / 0.069),
+        metadata={"spacing": 0.2, "unit": "um", "axes": "ZYX"},
+    )
+
+    reader = napari_get_reader(my_test_file)
+    assert callable(reader)
+    data, add_kwargs, layer_type = reader(my_test_file)[0]
+    assert isinstance(data, np.memmap)
+    np.testing.assert_array_equal(original_data, data)
+    np.testing.assert_allclose(add_kwargs["scale"], [0.2, 0.069, 0.069])
+    np.testing.assert_allclose(
+        add_kwargs["metadata"]["pixel_size"], [0.2, 0.069, 0.069]
+    )
+
+
+def test_ome_tiff_reader_compressed(tmp_path):
+    import tifffile
+
+    my_test_file = str(tmp_path / "beads.ome.tif")
+    original_data = np.random.randint(0, 1000, (5, 30, 40)).astype(np.uint16)
+    tifffile.imwrite(
+        my_test_file,
+        original_data,
+        ome=True,
+        compression="zlib",
+        metadata={
+            "axes": "ZYX",
+            "PhysicalSizeX": 0.07,
+            "PhysicalSizeY": 0.08,
+            "PhysicalSizeZ": 0.3,
+        },
+    )
+
+    data, add_kwargs, _ = napari_get_reader(my_test_file)(my_test_file)[0]
+    assert not isinstance(data, np.ndarray)
+    np.testing.assert_array_equal(original_data, np.asarray(data))
+    np.testing.assert_allclose(add_kwargs["metadata"]["pixel_size"], [0.3, 0.08, 0.07])
+
+
+def test_directory_of_planes_is_stacked_lazily(tmp_path):
+    planes = [np.full((20, 30), index, dtype=np.int_) for index in range(11)]
+    for index, plane in enumerate(planes):
+        np.save(tmp_path / f"plane_{index}.npy", plane)
+
+    reader = napari_get_reader(str(tmp_path))
+    assert callable(reader)
+    data, add_kwargs, layer_type = reader(str(tmp_path))[0]
+    assert not isinstance(data, np.ndarray)
+    assert data.shape == (11, 20, 30)
+    # planes are ordered naturally, plane_10 coming after plane_9
+    np.testing.assert_array_equal(np.asarray(data), np.stack(planes))
@@ -0,0 +1,41 @@
+import json
+import numpy as np
+import pyarrow.parquet as pq
+
+from types import SimpleNamespace
+from microscopy_metrics.BeadAnalyzer import BeadAnalyzer
+from microscopy_metrics.report_generator import ReportGenerator
+from napari_microscopy_metrics._report_parquet import ReportParquet
+
+
+def test_parquet_report_has_one_row_per_bead(tmp_path):
+    analyzed = BeadAnalyzer(
+        id=0,
+        centroid=np.array([5, 20, 30]),
+        roi=np.array([[0, 10, 20], [0, 10, 40], [0, 30, 40], [0, 30, 20]]),
+    )
+    analyzed._fitTool = SimpleNamespace(fwhms=[0.6, 0.2, 0.21], determinations=[0.99, 0.98, 0.97])
+    analyzed._metricTool = SimpleNamespace(_SBR=12.5)
+    rejected = BeadAnalyzer(id=1, centroid=np.array([1, 2, 3]))
+    rejected._rejected = True
+    rejected._rejectionDesc = "Too close to Z border"
+    report = ReportGenerator.getInstance("Parquet")
+    assert isinstance(report, ReportParquet)
+    # the image analyzer holds the result folder, as set by the analysis, the report is written in it by default
+    outputDir = tmp_path / "beads_analysis"
+    outputDir.mkdir()
+    report._imageAnalyzer = SimpleNamespace(_path=str(outputDir), _pixelSize=[0.1, 0.07, 0.07], _beadAnalyzer=[analyzed, rejected])
+    report._imagePath = str(tmp_path / "beads.tif")
+    report._detectionDatas = {"Detection tool": "peak local maxima", "Sigma": 3}
+    report.generateReport()
+
+    table = pq.read_table(outputDir / ReportParquet.fileName, columns=["image", "bead_id", "fwhm_y", "sbr", "rejected"])
+    assert table.column("image").to_pylist() == [str(tmp_path / "beads.tif")] * 2
+    assert table.column("bead_id").to_pylist() == [0, 1]
+    assert table.column("fwhm_y").to_pylist()[0] == 0.2
+    assert np.isnan(table.column("sbr").to_pylist()[1])
+    assert table.column("rejected").to_pylist() == [False, True]
+    metadata = pq.read_schema(outputDir / ReportParquet.fileName).metadata
+    assert json.loads(metadata[b"detection"]) == {"Detection tool": "peak local maxima", "Sigma": 3}
+    # the reports of the library are still registered
+    assert ReportGenerator.getInstance("CSV") is not None
@@ -0,0 +1,56 @@
+import numpy as np
+
+from types import SimpleNamespace
+from microscopy_metrics.BeadAnalyzer import BeadAnalyzer
+from microscopy_metrics.report_generator import ReportGenerator
+from napari_microscopy_metrics._config import CONFIG_FILE_NAME, AnalysisConfig
+from napari_microscopy_metrics._results_index import INDEX_PATH_VARIABLE, ReportIndex, ResultsIndex, toColumnName
+
+
+def indexReport(fwhmZ, numericalAperture):
+    bead = BeadAnalyzer(
+        id=0,
+        centroid=np.array([5, 20, 30]),
+        roi=np.array([[0, 10, 20], [0, 10, 40], [0, 30, 40], [0, 30, 20]]),
+    )
+    bead._fitTool = SimpleNamespace(fwhms=[fwhmZ, 0.2, 0.21], determinations=[0.99, 0.98, 0.97])
+    bead._metricTool = SimpleNamespace(_SBR=12.5)
+    report = ReportGenerator.getInstance("SQLite index")
+    report._imageAnalyzer = SimpleNamespace(
+        _path="beads_analysis",
+        _pixelSize=[0.1, 0.07, 0.07],
+        _beadAnalyzer=[bead],
+        _meanFWHM=[fwhmZ, 0.2, 0.21],
+        _meanDetermination=[0.99, 0.98, 0.97],
+        _meanSBR=12.5,
+    )
+    report._microscopeDatas = {"microscopeType": "widefield", "numericalAperture": numericalAperture}
+    return report
+
+
+def test_index_upserts_images_and_queries_trends(tmp_path, monkeypatch, batchParameters):
+    monkeypatch.setenv(INDEX_PATH_VARIABLE, str(tmp_path / "results.sqlite"))
+    config = AnalysisConfig.fromParameters(batchParameters())
+    (tmp_path / "day1_analysis").mkdir()
+    config.save(str(tmp_path / "day1_analysis" / CONFIG_FILE_NAME))
+    assert isinstance(indexReport(0.6, 1.4), ReportIndex)
+    indexReport(0.6, 1.4).generateReport(str(tmp_path / "day1_analysis"))
+    indexReport(0.7, 1.4).generateReport(str(tmp_path / "day2_analysis"))
+    indexReport(0.9, 1.0).generateReport(str(tmp_path / "other_analysis"))
+    # analysing an image again replaces its results
+    indexReport(0.65, 1.4).generateReport(str(tmp_path / "day1_analysis"))
+
+    with ResultsIndex() as index:
+        assert "numerical_aperture" in index.getColumns()
+        trend = index.getTrend("mean_fwhm_z", numerical_aperture=1.4)
+        assert [(name, value) for _, name, value in trend] == [("day2", 0.7), ("day1", 0.65)]
+        assert index.query("SELECT COUNT(*) FROM beads") == [(3,)]
+        assert index.query("SELECT fwhm_y, rejected FROM beads LIMIT 1") == [(0.2, 0)]
+        # the rows of an analysis are joined to its configuration by its hash
+        assert index.query("SELECT image_name FROM images WHERE parameter_hash = ?", (config.hash,)) == [("day1",)]
+        assert index.query("PRAGMA journal_mode") == [("delete",)]
+
+
+def test_column_names():
+    assert toColumnName("numericalAperture") == "numerical_aperture"
+    assert toColumnName("Emission wavelength") == "emission_wavelength"
@@ -1,7 +1,36 @@
-# from napari_microscopy_metrics import make_sample_data
+import numpy as np
 
-# add your tests here...
+from napari_microscopy_metrics._sample_data import make_bead_field
 
 
-def test_something():
-    pass
+def test_bead_field_with_ground_truth():
+    layers = make_bead_field(
+        n_beads=4, shape=(24, 96, 96), kernel_size=17, noise_std=0, seed=1
+    )
+    (image, image_kwargs, image_type), (points, points_kwargs, points_type) = layers
+    assert image_type == "image" and points_type == "points"
+    assert image.shape == (24, 96, 96) and image.dtype == np.uint16
+    assert points.shape == (4, 3)
+    assert image_kwargs["scale"] == points_kwargs["scale"]
+    features = points_kwargs["features"]
+    assert list(features["bead_id"]) == [0, 1, 2, 3]
+    assert features["fwhm_z"][0] > features["fwhm_x"][0] > 0
+    # each bead is the brightest spot of its neighbourhood
+    for z, y, x in np.round(points).astype(int):
+        neighbourhood = image[max(z - 3, 0) : z + 4, y - 3 : y + 4, x - 3 : x + 4]
+        assert image[z, y, x] >= 0.8 * neighbourhood.max()
+    # fields are reproducible
+    np.testing.assert_array_equal(
+        make_bead_field(n_beads=4, shape=(24, 96, 96), kernel_size=17, noise_std=0, seed=1)[0][0],
+        image,
+    )
+
+
+def test_psf_kernels_are_cached_by_parameters():
+    from napari_microscopy_metrics._sample_data import cached_psf_kernel
+
+    kernel = cached_psf_kernel(17, 0.07, 0.1, 1.45, 0.5, 1.0, "spherical")
+    assert cached_psf_kernel(17, 0.07, 0.1, 1.45, 0.5, 1.0, "spherical") is kernel
+    assert cached_psf_kernel(17, 0.07, 0.1, 1.45, 0.5, 1.0, None) is not kernel
+    assert kernel.shape == (17, 17, 17)
+    assert not kernel.flags.writeable
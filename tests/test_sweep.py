@@ -0,0 +1,92 @@
+import csv
+import dataclasses
+
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+from napari_microscopy_metrics import _sweep
+from napari_microscopy_metrics._batch import runAnalysis
+from napari_microscopy_metrics._config import AnalysisConfig
+from napari_microscopy_metrics._sample_data import make_bead_field
+
+
+def test_parse_values_and_expand_grid(batchParameters):
+    assert _sweep.parseValues("1, 2, 4", "Sigma") == [1.0, 2.0, 4.0]
+    assert _sweep.parseValues("1:2:0.25", "Sigma") == [1.0, 1.25, 1.5, 1.75, 2.0]
+    assert _sweep.parseValues("4:8:2, 8, 9.6", "cropFactor") == [4, 6, 8, 10]
+    with pytest.raises(ValueError):
+        _sweep.parseValues("1:2:0", "Sigma")
+    with pytest.raises(ValueError):
+        _sweep.parseValues("one", "Sigma")
+
+    config = AnalysisConfig.fromParameters(batchParameters())
+    configs = _sweep.expandGrid(config, {"cropFactor": [8, 10], "thresholdRSquared": [0.5, 0.9, 0.95]})
+    assert [(config.cropFactor, config.thresholdRSquared) for config in configs[:3]] == [(8, 0.5), (8, 0.9), (8, 0.95)]
+    groups = _sweep.groupByDetection(configs)
+    assert [len(group) for group in groups] == [3, 3]
+    with pytest.raises(ValueError):
+        _sweep.expandGrid(config, {"sigma": [1]})
+
+
+def test_sweep_shares_detection_between_fit_settings(tmp_path, batchParameters):
+    image = make_bead_field(n_beads=4, shape=(40, 128, 128), seed=1)[0][0]
+    np.save(tmp_path / "beads.npy", image)
+    config = AnalysisConfig.fromParameters(batchParameters())
+    ranges = {"cropFactor": [8, 10], "FitType": ["1D", "2D"], "thresholdRSquared": [0.5, 0.95]}
+    with patch.object(_sweep, "createDetection", wraps=_sweep.createDetection) as detection, patch.object(
+        _sweep, "createMetrics", wraps=_sweep.createMetrics
+    ) as metrics:
+        rows = _sweep.runSweep(str(tmp_path / "beads.npy"), config, ranges)
+    # the beads are detected and measured once per crop factor, and fitted for each combination
+    assert detection.call_count == 2 and metrics.call_count == 2
+    assert [(row["cropFactor"], row["FitType"], row["thresholdRSquared"]) for row in rows] == [
+        (8, "1D", 0.5), (8, "1D", 0.95), (8, "2D", 0.5), (8, "2D", 0.95),
+        (10, "1D", 0.5), (10, "1D", 0.95), (10, "2D", 0.5), (10, "2D", 0.95),
+    ]
+    assert all(row["status"] == "done" and row["validBeads"] > 0 for row in rows)
+
+    # a fit setting evaluated on shared beads measures the same as a full analysis
+    result = runAnalysis(
+        str(tmp_path / "beads.npy"),
+        dataclasses.replace(config, cropFactor=10, FitType="2D", listReports=()),
+        str(tmp_path / "results"),
+    )
+    row = rows[6]
+    assert row["validBeads"] == result["validBeads"]
+    assert [row["FWHM Z"], row["FWHM Y"], row["FWHM X"]] == pytest.approx(result["meanFWHM"])
+
+    tablePath = _sweep.getSweepTablePath(str(tmp_path / "beads.npy"))
+    assert tablePath == str(tmp_path / "beads_sweep.csv")
+    _sweep.saveSweepTable(tablePath, rows)
+    with open(tablePath, newline="") as file:
+        table = list(csv.DictReader(file))
+    assert len(table) == 8 and list(table[0])[:4] == ["cropFactor", "FitType", "thresholdRSquared", "beads"]
+
+
+def test_sweep_spreads_the_fits_of_a_group_over_the_workers(tmp_path, batchParameters):
+    image = make_bead_field(n_beads=4, shape=(40, 128, 128), seed=1)[0][0]
+    np.save(tmp_path / "beads.npy", image)
+    config = AnalysisConfig.fromParameters(batchParameters())
+    ranges = {"FitType": ["1D", "2D"], "thresholdRSquared": [0.5, 0.95]}
+    # a single detection group, larger than the share of each worker, is detected once and fitted by both workers
+    rows = _sweep.runSweep(str(tmp_path / "beads.npy"), config, ranges, workers=2)
+    assert rows == _sweep.runSweep(str(tmp_path / "beads.npy"), config, ranges)
+    assert all(row["status"] == "done" for row in rows)
+
+
+def test_intensity_range_is_computed_once_for_in_memory_images(tmp_path, batchParameters):
+    image = make_bead_field(n_beads=4, shape=(40, 128, 128), seed=1)[0][0]
+    np.save(tmp_path / "beads.npy", image)
+    assert _sweep.getIntensityRange(np.load(tmp_path / "beads.npy", mmap_mode="r")) is None
+    intensityRange = _sweep.getIntensityRange(image)
+    assert intensityRange == (float(image.min()), float(image.max()))
+
+    config = AnalysisConfig.fromParameters(batchParameters())
+    ranges = {"cropFactor": [8, 10], "thresholdRSquared": [0.5, 0.95]}
+    with patch.object(_sweep, "getIntensityRange", wraps=_sweep.getIntensityRange) as getRange:
+        _sweep.runSweep(image, config, ranges)
+    assert getRange.call_count == 1
+    # the detection normalizing the image with the shared range measures the beads as with the range of the image
+    configs = _sweep.expandGrid(config, {"thresholdRSquared": [0.5, 0.95]})
+    assert _sweep.evaluateDetectionGroup(image, configs, intensityRange=intensityRange) == _sweep.evaluateDetectionGroup(image, configs)
@@ -0,0 +1,56 @@
+import json
+import inspect
+
+import pytest
+
+from napari_microscopy_metrics._timing import TIMING_FILE_NAME, StageTimer
+
+
+def test_stage_timer_records_beads_and_output_bytes(tmp_path):
+    (tmp_path / "config.json").write_bytes(b"0" * 100)
+    timer = StageTimer(str(tmp_path))
+    beads = []
+    with timer.stage("detection"):
+        beads.extend(range(4))
+        (tmp_path / "crops.bin").write_bytes(b"0" * 1000)
+    # the beads entering a stage are counted when it starts
+    with timer.stage("prefitting", lambda: len(beads)):
+        beads.pop()
+    imageAnalyzer = None
+    with timer.stage("mesh saving", lambda: len(imageAnalyzer._beadAnalyzer)):
+        pass
+
+    def fit(count):
+        return count * 2
+
+    def generateReport():
+        yield {"desc": "Generating report..."}
+        (tmp_path / "report.pdf").write_bytes(b"0" * 500)
+        return "done"
+
+    assert timer.wrap("fitting", fit, 4)(3) == 6
+    report = timer.wrap("report PDF", generateReport)
+    assert inspect.isgeneratorfunction(report)
+    assert list(report()) == [{"desc": "Generating report..."}]
+    with pytest.raises(RuntimeError):
+        with timer.stage("figures"):
+            raise RuntimeError("failed")
+
+    stages = {stage["stage"]: stage for stage in timer.stages}
+    assert list(stages) == ["detection", "prefitting", "mesh saving", "fitting", "report PDF", "figures"]
+    assert stages["detection"]["beads"] is None and stages["detection"]["beadsPerSecond"] is None
+    assert stages["prefitting"]["beads"] == 4 and stages["prefitting"]["beadsPerSecond"] > 0
+    assert stages["mesh saving"]["beads"] is None
+    assert stages["fitting"]["beads"] == 4
+    assert stages["figures"]["beadsPerSecond"] is None
+
+    path = timer.save()
+    assert path == str(tmp_path / TIMING_FILE_NAME)
+    with open(path) as file:
+        saved = json.load(file)
+    # the files written before the first stage are not counted, the timing report is measured once
+    assert saved["outputBytes"] == 1500 and len(saved["stages"]) == 6
+    (tmp_path / "later.bin").write_bytes(b"0" * 10)
+    assert timer.toDict()["outputBytes"] == 1500
+    summary = timer.formatSummary().splitlines()
+    assert summary[0].startswith("Total:") and len(summary) == 7
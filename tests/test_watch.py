@@ -0,0 +1,42 @@
+import os
+
+from napari_microscopy_metrics._batch import BatchCancellation, BatchManifest, hashParameters
+from napari_microscopy_metrics._watch import FolderWatcher, WatchQueue, watchFolder
+
+
+def test_watcher_waits_for_images_to_settle(tmp_path, batchParameters):
+    image = tmp_path / "beads.npy"
+    image.write_bytes(b"partial")
+    queue = WatchQueue(str(tmp_path / WatchQueue.fileName))
+    manifest = BatchManifest(str(tmp_path / BatchManifest.fileName))
+    watcher = FolderWatcher(str(tmp_path), manifest, queue, settleTime=10)
+    parameterHash = hashParameters(batchParameters())
+
+    assert watcher.poll(parameterHash, now=0) == []
+    image.write_bytes(b"partial, still written")
+    assert watcher.poll(parameterHash, now=8) == []
+    assert watcher.poll(parameterHash, now=15) == []
+    assert watcher.poll(parameterHash, now=18) == [str(image)]
+    assert watcher.poll(parameterHash, now=60) == []
+    assert WatchQueue(str(tmp_path / WatchQueue.fileName)).paths == [str(image)]
+
+    queue.remove(str(image))
+    manifest.record({"path": str(image), "outputDir": str(tmp_path), "status": "failed"}, parameterHash)
+    assert watcher.poll(parameterHash, now=100) == []
+    assert watcher.poll(parameterHash, now=200) == []
+
+
+def test_watch_folder_analyzes_queued_images(tmp_path, batchParameters):
+    (tmp_path / "broken.npy").write_bytes(b"not an image")
+    WatchQueue(str(tmp_path / WatchQueue.fileName)).push(str(tmp_path / "left.npy"))
+    cancellation = BatchCancellation()
+    events = []
+    for event in watchFolder(str(tmp_path), batchParameters(), cancellation=cancellation, interval=0.01, settleTime=0):
+        events.append(event)
+        if event["event"] == "finished" and event["path"].endswith("broken.npy"):
+            cancellation.stop()
+
+    finished = {os.path.basename(event["path"]) for event in events if event["event"] == "finished"}
+    assert finished == {"left.npy", "broken.npy"}
+    assert events[0] == {"event": "queued", "path": str(tmp_path / "left.npy")}
+    assert len(WatchQueue(str(tmp_path / WatchQueue.fileName))) == 0
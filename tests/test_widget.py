@@ -1,3 +1,4 @@
+import json
 import pytest
 from qtpy.QtWidgets import QApplication
 from napari_microscopy_metrics._widget import *
@@ -9,4 +10,99 @@ def test_widget_initialize(qapp):
     mock_viewer.layers.selection = MagicMock()
     mock_viewer.layers.selection.active = None
     widget = Microscopy_Metrics_QWidget(mock_viewer)
-    assert widget.runButton.text() == "Run analysis"
\ No newline at end of file
+    assert widget.runButton.text() == "Run analysis"
+
+def test_widget_builds_tabs_when_shown(qapp):
+    mock_viewer = Mock()
+    mock_viewer.layers = MagicMock()
+    mock_viewer.layers.selection = MagicMock()
+    mock_viewer.layers.selection.active = None
+    widget = Microscopy_Metrics_QWidget(mock_viewer)
+    assert widget.tabs["acquisition"].isBuilt
+    assert not any(widget.tabs[name].isBuilt for name in ("detection", "metrics", "report", "batch"))
+    widget.tab.setCurrentIndex(2)
+    assert widget.tabs["metrics"].isBuilt
+    assert widget.metricsToolPage.spacing == widget.getPixelSize()
+    assert widget.detectionToolPage._detectionParameters is None
+    assert widget.detectionToolPage.detectionParameters is widget.detectionToolPage.detectionParameters
+
+
+def test_load_options_reads_each_file_once(tmp_path):
+    from autooptions import Options
+    from napari_microscopy_metrics.widgets.BaseWidget import loadOptions
+
+    def createOptions():
+        options = Options("Microscopy metrics tests", "Options")
+        options.optionsPath = str(tmp_path / "options.json")
+        options.addInt(name="value", value=1)
+        return options
+
+    first = loadOptions(createOptions())
+    first.setValue("value", 2)
+    first.save()
+    with patch("napari_microscopy_metrics.widgets.BaseWidget.json.load", wraps=json.load) as load:
+        assert loadOptions(createOptions()).value("value") == 2
+        assert loadOptions(createOptions()).value("value") == 2
+    assert load.call_count == 1
+    second = loadOptions(createOptions())
+    second.setValue("value", 3)
+    assert first.value("value") == 2
+
+
+def test_batch_widget_plans_the_batch_in_its_worker(qapp, tmp_path, batchParameters):
+    import numpy as np
+    from napari_microscopy_metrics import _batch_widget
+    from napari_microscopy_metrics._batch import BatchManifest, hashParameters
+
+    for name in ("a.npy", "b.npy"):
+        np.save(tmp_path / name, np.zeros((4, 16, 16), dtype=np.uint16))
+    (tmp_path / "broken.npy").write_bytes(b"not an image")
+    manifest = BatchManifest(str(tmp_path / BatchManifest.fileName))
+    manifest.record({"path": str(tmp_path / "a.npy"), "status": "done", "outputDir": str(tmp_path)}, hashParameters(batchParameters()))
+    widget = _batch_widget.BatchWidget(Mock())
+    with patch.object(_batch_widget, "runBatchEvents", return_value=iter(())) as runBatchEvents:
+        events = list(widget.analyzeBatch(str(tmp_path), None, None, True, batchParameters(), 1, manifest, True, None))
+    assert events == [{"event": "planned", "paths": [str(tmp_path / "b.npy")], "rejected": 1, "skipped": 1}]
+    # the images left are not signed again
+    assert runBatchEvents.call_args.args[0] == [str(tmp_path / "b.npy")]
+    assert runBatchEvents.call_args.kwargs["resume"] is False
+
+
+def test_opening_the_widget_imports_only_the_acquisition_page():
+    import sys
+    import subprocess
+
+    code = (
+        "import sys, json\n"
+        "import napari.layers\n"
+        "from unittest.mock import MagicMock\n"
+        "from qtpy.QtWidgets import QApplication\n"
+        "application = QApplication([])\n"
+        "from napari_microscopy_metrics._widget import Microscopy_Metrics_QWidget\n"
+        "viewer = MagicMock()\n"
+        "viewer.layers.selection.active = None\n"
+        "widget = Microscopy_Metrics_QWidget(viewer)\n"
+        "print(json.dumps(sorted(sys.modules)))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    modules = json.loads(output.splitlines()[-1])
+    deferred = ["_batch", "_batch_widget", "_sweep_widget", "_lazy", "_sample_data", "_detection_tool_widget", "_metrics_widget", "_report_widget"]
+    assert [name for name in deferred if f"napari_microscopy_metrics.{name}" in modules] == []
+    assert [name for name in ("detection", "metrics", "fitting") if f"microscopy_metrics.{name}" in modules] == []
+
+
+def test_threshold_preview_and_analysis_use_the_same_value(qapp):
+    import numpy as np
+
+    mock_viewer = Mock()
+    mock_viewer.layers = MagicMock()
+    mock_viewer.layers.selection = MagicMock()
+    mock_viewer.layers.selection.active = napari.layers.Image(np.linspace(0, 655, 4 * 8 * 8).reshape(4, 8, 8))
+    widget = Microscopy_Metrics_QWidget(mock_viewer)
+    threshold = widget.detectionToolPage.detectionParameters.widgetThreshold
+    threshold.thresholdRel.setValue(40)
+    # the slider keeps its 0-100 range whatever the maximum of the image
+    assert threshold.thresholdRel.maximum() == 100
+    assert threshold.thresholdRelLabel.text() == "Relative threshold: 0.4"
+    assert widget.getAnalysisConfig().relThreshold == 0.4
+    assert threshold.toDict()["thresholdRel"] == 0.4
@@ -0,0 +1,124 @@
+import os
+import sys
+import json
+import time
+import subprocess
+
+import numpy as np
+
+from napari_microscopy_metrics import _work_queue
+from napari_microscopy_metrics._batch import hashParameters, saveParameters
+from napari_microscopy_metrics._work_queue import WorkQueue, runWorker
+
+
+def writeImages(folder, names):
+    """Writes images whose header is valid but whose voxels are missing, so that their analysis fails at once."""
+    folder.mkdir()
+    for name in names:
+        np.save(folder / name, np.zeros((4, 16, 16)))
+        with open(folder / name, "r+b") as file:
+            file.truncate(200)
+    return [str(folder / name) for name in names]
+
+
+def test_queue_claims_retries_and_expires_leases(tmp_path, batchParameters):
+    paths = writeImages(tmp_path / "images", ["a.npy", "b.npy"])
+    queue = WorkQueue(str(tmp_path / "queue"), leaseTime=60, maxAttempts=2)
+    assert queue.submit(paths, batchParameters()) == paths
+    assert queue.submit(paths, batchParameters()) == []
+    assert queue.getParameters(hashParameters(batchParameters())) == batchParameters()
+
+    first = queue.claim()
+    second = queue.claim()
+    assert {first.path, second.path} == set(paths)
+    assert queue.claim() is None
+    assert first.complete({"path": first.path, "status": "done"})
+    assert not first.renew()
+
+    # the worker of the second job died, its lease expires
+    assert queue.reclaimExpired(now=time.time() + 30) == []
+    assert len(queue.reclaimExpired(now=time.time() + 120)) == 1
+    assert not second.complete({"path": second.path, "status": "done"})
+    retry = queue.claim()
+    assert (retry.path, retry.attempt) == (second.path, 1)
+    assert retry.fail({"status": "failed", "error": "boom"})
+    assert queue.getCounts() == {"pending": 0, "claimed": 0, "done": 1, "failed": 1}
+    with open(os.path.join(queue.getFolder("failed"), f"{queue.getKey(second.path)}.json")) as file:
+        assert json.load(file)["attempts"] == 2
+
+    # done images are only submitted again once modified, failed ones are retried
+    assert queue.submit(paths, batchParameters()) == [second.path]
+    with open(first.path, "wb") as file:
+        file.write(b"modified image")
+    assert queue.submit(paths, batchParameters()) == [first.path]
+    assert queue.getCounts()["pending"] == 2
+
+
+def test_jobs_keep_their_parameters_and_lease(tmp_path, batchParameters, monkeypatch):
+    paths = writeImages(tmp_path / "images", ["a.npy", "b.npy"])
+    queue = WorkQueue(str(tmp_path / "queue"), leaseTime=60)
+    other = dict(batchParameters(), cropFactor=5)
+    assert queue.submit(paths[:1], batchParameters()) == paths[:1]
+    assert queue.submit(paths, other) == paths[1:]
+
+    # a job which waited longer than a lease is not expired by another host as soon as it is claimed
+    for name in os.listdir(queue.getFolder("pending")):
+        os.utime(os.path.join(queue.getFolder("pending"), name), (0, 0))
+    rename = os.rename
+    reclaimed = []
+
+    def renameThenReclaim(source, destination):
+        rename(source, destination)
+        if not reclaimed:
+            reclaimed.append(WorkQueue(queue._path, leaseTime=60).reclaimExpired())
+
+    monkeypatch.setattr(os, "rename", renameThenReclaim)
+    job = queue.claim()
+    monkeypatch.setattr(os, "rename", rename)
+    assert reclaimed == [[]] and job.attempt == 0
+    job.release()
+
+    analysed = {}
+
+    def analyse(path, parameters, *args):
+        analysed[path] = parameters["cropFactor"]
+        yield {"event": "finished", "path": path, "result": {"path": path, "status": "done"}}
+
+    monkeypatch.setattr(_work_queue, "iterAnalysis", analyse)
+    list(runWorker(queue._path))
+    # each image is analysed with the parameters it was submitted with
+    assert analysed == {paths[0]: 10, paths[1]: 5}
+    with open(os.path.join(queue.getFolder("done"), f"{queue.getKey(paths[1])}.json")) as file:
+        assert json.load(file)["parameterHash"] == hashParameters(other)
+
+
+def test_worker_releases_interrupted_job(tmp_path, batchParameters):
+    paths = writeImages(tmp_path / "images", ["a.npy"])
+    queuePath = str(tmp_path / "queue")
+    WorkQueue(queuePath).submit(paths, batchParameters())
+    worker = runWorker(queuePath)
+    assert next(worker)["event"] == "stage"
+    worker.close()
+    assert WorkQueue(queuePath).getCounts()["pending"] == 1
+
+
+def test_several_workers_share_the_queue(tmp_path, batchParameters):
+    names = [f"image{index}.npy" for index in range(6)]
+    paths = writeImages(tmp_path / "images", names)
+    parameters = str(tmp_path / "parameters.json")
+    saveParameters(parameters, batchParameters())
+    queuePath = str(tmp_path / "queue")
+    command = [sys.executable, "-m", "napari_microscopy_metrics._cli"]
+    subprocess.run(command + [str(tmp_path / "images"), "-p", parameters, "--queue", queuePath, "--submit-only"], check=True)
+
+    # one process per node, each running two workers
+    nodes = [
+        subprocess.Popen(command + ["--queue", queuePath, "--workers", "2"], stdout=subprocess.PIPE, text=True)
+        for _ in range(2)
+    ]
+    outputs = [node.communicate(timeout=600)[0] for node in nodes]
+    assert [node.returncode for node in nodes] == [1, 1]
+    # every attempt of every image was made exactly once, by one of the workers
+    lines = [line for output in outputs for line in output.splitlines() if ": failed" in line]
+    assert sorted(line.split(":")[0] for line in lines) == sorted(names * 3)
+    assert WorkQueue(queuePath).getCounts() == {"pending": 0, "claimed": 0, "done": 0, "failed": len(paths)}
@@ -1,7 +1,87 @@
-# from napari_microscopy_metrics import write_single_image, write_multiple
+import numpy as np
 
-# add your tests here...
+from napari_microscopy_metrics import (
+    napari_get_reader,
+    write_multiple,
+    write_single_image,
+)
 
 
-def test_something():
-    pass
+def test_write_ome_zarr_round_trip(tmp_path):
+    path = str(tmp_path / "beads.zarr")
+    data = np.random.randint(0, 1000, size=(4, 1024, 600)).astype(np.uint16)
+    meta = {"scale": [0.5, 0.1, 0.1], "name": "beads"}
+    assert write_single_image(path, data, meta) == [path]
+
+    reader = napari_get_reader(path)
+    assert callable(reader)
+    levels, add_kwargs, layer_type = reader(path)[0]
+    assert layer_type == "image"
+    assert add_kwargs["multiscale"]
+    assert add_kwargs["scale"] == [0.5, 0.1, 0.1]
+    assert add_kwargs["metadata"]["pixel_size"] == [0.5, 0.1, 0.1]
+    assert levels[1].shape == (4, 512, 300)
+    np.testing.assert_array_equal(np.asarray(levels[0]), data)
+
+
+def test_write_npy(tmp_path):
+    path = str(tmp_path / "beads.npy")
+    data = np.arange(12).reshape((3, 4))
+    write_single_image(path, data, {})
+    np.testing.assert_array_equal(np.load(path), data)
+
+
+def test_write_multiple_analysis_round_trip(tmp_path):
+    import pandas as pd
+
+    path = str(tmp_path / "analysis")
+    image = np.random.randint(0, 1000, size=(4, 64, 64)).astype(np.uint16)
+    centroids = np.array([[2.0, 10.0, 10.0], [2.0, 40.0, 50.0]])
+    rois = [
+        np.array([[0, 5, 5], [0, 5, 15], [0, 15, 15], [0, 15, 5]], float),
+        np.array([[0, 35, 45], [0, 35, 55], [0, 45, 55], [0, 45, 45]], float),
+    ]
+    skeleton = [np.array([[0, 1, 1], [1, 2, 2], [2, 3, 3]], float)]
+    surface = (
+        np.random.rand(4, 3),
+        np.array([[0, 1, 2], [1, 2, 3]]),
+        np.random.rand(4),
+    )
+    layers = [
+        (image, {"name": "beads", "scale": [0.1, 0.07, 0.07]}, "image"),
+        (centroids, {"name": "PSF detected", "size": [2, 2]}, "points"),
+        (
+            rois,
+            {
+                "name": "ROI",
+                "shape_type": ["rectangle", "rectangle"],
+                "features": pd.DataFrame({"label": ["bead_0", "bead_1"]}),
+                "text": {"string": {"format": "{label}"}},
+            },
+            "shapes",
+        ),
+        (skeleton, {"name": "PSF skeleton paths"}, "shapes"),
+        (surface, {"name": "PSF_Isosurfaces.obj"}, "surface"),
+    ]
+    written = write_multiple(path, layers)
+    assert written == [path + ".zarr"]
+
+    layer_data = napari_get_reader(written[0])(written[0])
+    assert [layer[2] for layer in layer_data] == [
+        "image",
+        "points",
+        "shapes",
+        "shapes",
+        "surface",
+    ]
+    np.testing.assert_array_equal(np.asarray(layer_data[0][0]), image)
+    assert layer_data[0][1]["name"] == "beads"
+    np.testing.assert_array_equal(layer_data[1][0], centroids)
+    assert layer_data[1][1]["size"] == [2, 2]
+    for read, original in zip(layer_data[2][0], rois):
+        np.testing.assert_array_equal(read, original)
+    assert layer_data[2][1]["features"] == {"label": ["bead_0", "bead_1"]}
+    assert layer_data[2][1]["text"] == {"string": "{label}"}
+    np.testing.assert_array_equal(layer_data[3][0][0], skeleton[0])
+    for read, original in zip(layer_data[4][0], surface):
+        np.testing.assert_array_equal(read, original)